@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+r"""
+util.json_diff 在大存档上的耗时
+
+用法: python -m benchmark.bench_json_diff [--sizes 1,8,32] [--change 0.01] [--repeat 3]
+生成一对存档：后者修改、删除、新增一部分卡牌并打乱顺序，rite 数组中间插入若干项。
+与 util.save_history.diff（按位置比较）对照。
+"""
+import argparse
+import copy
+import json
+import random
+import time
+
+from util.json_diff import diff, summarize
+from util.save_history import diff as positional_diff
+
+
+def make_pair(size_mb: float, change: float):
+    rnd = random.Random(size_mb)
+    cards = []
+    target = int(size_mb * 1024 * 1024)
+    approx = 0
+    while approx < target:
+        cards.append(
+            {
+                "uid": len(cards),
+                "id": rnd.randint(1000, 9999),
+                "tag": {f"t{i}": rnd.randint(0, 9) for i in range(8)},
+                "text": "卡牌描述" * 8,
+            }
+        )
+        approx += 200
+    old = {
+        "name": "苏丹",
+        "round": 10,
+        "cards": cards,
+        "rite": [[i, i * 2] for i in range(5000)],
+    }
+    new = copy.deepcopy(old)
+    new["round"] = 11
+    count = max(1, int(len(cards) * change))
+    for card in rnd.sample(new["cards"], count):
+        card["tag"]["t0"] += 1
+    for _ in range(count):
+        del new["cards"][rnd.randrange(len(new["cards"]))]
+    for i in range(count):
+        new["cards"].append(dict(old["cards"][0], uid=len(cards) + i))
+    rnd.shuffle(new["cards"])
+    new["rite"][2500:2500] = [[-1, -1]] * 10
+    return old, new
+
+
+def timeit(func, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="1,8,32")
+    parser.add_argument("--change", type=float, default=0.01)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    for size in (float(s) for s in args.sizes.split(",")):
+        old, new = make_pair(size, args.change)
+        changes = diff(old, new)
+        mb = len(json.dumps(old)) / 1048576
+        print(f"存档 {mb:.1f} MB，卡牌 {len(old['cards'])} 张，变化 {len(changes)} 处")
+        print(f"  {summarize(changes)}")
+        print(f"  json_diff: {timeit(lambda: diff(old, new), args.repeat) * 1000:8.1f} ms")
+        ops = positional_diff(old, new)
+        elapsed = timeit(lambda: positional_diff(old, new), args.repeat) * 1000
+        print(f"  按位置比较: {elapsed:8.1f} ms（{len(ops)} 个操作）")
+
+
+if __name__ == "__main__":
+    main()
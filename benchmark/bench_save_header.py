@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+r"""
+对比 util.save_header.read_header 与 json.load 读取存档头部的耗时
+
+用法: python -m benchmark.bench_save_header [--sizes 1,8,32] [--repeat 5]
+sizes 为生成的存档大小（MB），头部字段分别放在文件开头和末尾各测一次。
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+from util.save_header import read_header
+from util.save_index import HEADER_KEYS
+
+
+def make_save(file_path: str, size_mb: float, header_first: bool):
+    rnd = random.Random(size_mb)
+    header = {
+        "name": "苏丹",
+        "difficulty": 2,
+        "round": rnd.randint(1, 200),
+        "saveTime": "2025-04-26T12:00:00.000Z",
+    }
+    cards = []
+    target = int(size_mb * 1024 * 1024)
+    approx = 0
+    while approx < target:
+        card = {
+            "id": len(cards),
+            "uid": rnd.getrandbits(48),
+            "tag": {f"t{i}": rnd.randint(0, 9) for i in range(8)},
+            "text": "卡牌描述\\\"引号\"" * 4,
+        }
+        cards.append(card)
+        approx += 260
+    world = {"cards": cards, "rite": [[i, i * 2] for i in range(1000)]}
+    data = dict(header, **world) if header_first else dict(world, **header)
+    with open(file_path, "w", encoding="utf8") as f:
+        json.dump(data, f, ensure_ascii=False)
+
+
+def full_parse(file_path: str) -> dict:
+    with open(file_path, "r", encoding="utf8") as f:
+        save_data = json.load(f)
+    return {key: save_data[key] for key in HEADER_KEYS if key in save_data}
+
+
+def timeit(func, file_path: str, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(file_path)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="1,8,32")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'大小':>8} {'位置':>6} {'json.load':>12} {'read_header':>12} {'加速':>8}")
+        for size in (float(s) for s in args.sizes.split(",")):
+            for header_first in (True, False):
+                file_path = os.path.join(tmp, "save.json")
+                make_save(file_path, size, header_first)
+                assert read_header(file_path, HEADER_KEYS) == full_parse(file_path)
+                full = timeit(full_parse, file_path, args.repeat)
+                stream = timeit(
+                    lambda p: read_header(p, HEADER_KEYS), file_path, args.repeat
+                )
+                print(
+                    f"{os.path.getsize(file_path) / 1048576:>7.1f}M"
+                    f" {'开头' if header_first else '末尾':>6}"
+                    f" {full * 1000:>10.2f}ms {stream * 1000:>10.2f}ms"
+                    f" {full / stream:>7.1f}x"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+r"""
+util.search_index 的建立与查询耗时
+
+用法: python -m benchmark.bench_search_index [--saves 3000] [--cards 300]
+在内存中生成存档并建立索引，再与逐个遍历存档字符串的查询方式对比。
+"""
+import argparse
+import random
+import time
+
+from util.search_index import SearchIndex
+
+_words = ["苏丹", "卡牌", "美酒", "征服", "纵欲", "杀戮", "奢靡", "knight", "rite"]
+
+
+def make_doc(rnd: random.Random, i: int, cards: int) -> dict:
+    return {
+        "name": f"hero{i % 97}",
+        "difficulty": rnd.randint(0, 3),
+        "round": rnd.randint(1, 200),
+        "saveTime": f"2025-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}T12:00:00Z",
+        "cards": [
+            {
+                "id": rnd.getrandbits(32),
+                "text": f"{rnd.choice(_words)}{rnd.choice(_words)} item{rnd.randint(0, 5000)}",
+            }
+            for _ in range(cards)
+        ],
+    }
+
+
+def linear_search(docs: dict, text: str) -> set:
+    # 对照：不建索引，逐个存档遍历所有字符串
+    return {
+        path
+        for path, doc in docs.items()
+        if any(text in card["text"] for card in doc["cards"])
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--saves", type=int, default=3000)
+    parser.add_argument("--cards", type=int, default=300)
+    args = parser.parse_args()
+
+    rnd = random.Random(0)
+    docs = {f"save{i}.json": make_doc(rnd, i, args.cards) for i in range(args.saves)}
+    index = SearchIndex()
+    start = time.perf_counter()
+    for path, doc in docs.items():
+        index.add(path, doc)
+    print(f"建立索引: {args.saves} 个存档 {time.perf_counter() - start:.2f} s")
+
+    queries = ["item123", "征服", "美酒纵欲", "角色:hero5 难度:2", "回合:50-60 时间:2025-04"]
+    for query in queries:
+        start = time.perf_counter()
+        result = index.search(query)
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"{query:>24}: {len(result):5d} 个 {elapsed:8.2f} ms")
+
+    start = time.perf_counter()
+    result = linear_search(docs, "item123")
+    elapsed = (time.perf_counter() - start) * 1000
+    print(f"{'遍历对照 item123':>24}: {len(result):5d} 个 {elapsed:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+r"""
+测量快照存储的去重比和还原耗时
+
+用法: python -m benchmark.bench_snapshot_store [--snapshots 50] [--cards 20000]
+模拟同一局游戏连续多个回合的存档：每回合修改少量卡牌并新增一张卡牌。
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+from util.snapshot_store import SnapshotStore
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--snapshots", type=int, default=50)
+    parser.add_argument("--cards", type=int, default=20000)
+    parser.add_argument("--compression", default="zlib")
+    args = parser.parse_args()
+
+    rnd = random.Random(0)
+    save_data = {
+        "name": "苏丹",
+        "difficulty": 2,
+        "round": 0,
+        "saveTime": "2025-04-26T12:00:00.000Z",
+        "cards": [
+            {
+                "id": i,
+                "uid": rnd.getrandbits(48),
+                "tag": {f"t{j}": rnd.randint(0, 9) for j in range(8)},
+                "text": "卡牌描述" * 4,
+            }
+            for i in range(args.cards)
+        ],
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SnapshotStore(os.path.join(tmp, "snapshots"), args.compression)
+        save_path = os.path.join(tmp, "round.json")
+        put_time = 0.0
+        for round_ in range(args.snapshots):
+            save_data["round"] = round_
+            for _ in range(20):
+                card = rnd.choice(save_data["cards"])
+                card["uid"] = rnd.getrandbits(48)
+            save_data["cards"].insert(
+                rnd.randrange(len(save_data["cards"])),
+                {"id": args.cards + round_, "uid": 0, "tag": {}, "text": ""},
+            )
+            with open(save_path, "w", encoding="utf8") as f:
+                json.dump(save_data, f, ensure_ascii=False)
+            start = time.perf_counter()
+            store.put("bench", f"round_{round_}", save_path)
+            put_time += time.perf_counter() - start
+
+        stats = store.stats()
+        materialize_time = store.materialize(
+            "bench", f"round_{args.snapshots - 1}", os.path.join(tmp, "auto_save.json")
+        )
+        print(f"快照数量: {stats['snapshots']}")
+        print(f"原始大小: {stats['logical_bytes'] / 1048576:.2f} MB")
+        print(f"实际占用: {stats['stored_bytes'] / 1048576:.2f} MB")
+        print(f"去重压缩比: {stats['dedup_ratio']:.1f}x")
+        print(f"平均保存耗时: {put_time / args.snapshots * 1000:.1f} ms")
+        print(f"还原耗时: {materialize_time * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+r"""
+启动耗时测试
+
+用法:
+    python -m benchmark.bench_startup [--repeat 5] [--top 15]
+
+以 --startup-bench 模式多次启动 main.py，统计从启动进程到主窗口第一次绘制的时间，
+并用 python -X importtime 列出最慢的导入。需要在有 config.json 的目录下运行，
+默认使用 offscreen 平台，不会弹出窗口。
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+MAIN = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "main.py")
+
+
+def parse_importtime(stderr: str) -> list:
+    r"""
+    解析 -X importtime 的输出，返回 [(累计微秒, 模块名)]
+    """
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|", 2)
+        imports.append((int(cumulative), name.rstrip()))
+    return imports
+
+
+def run_once(platform: str):
+    env = dict(os.environ, QT_QPA_PLATFORM=platform)
+    start = time.time()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", MAIN, "--startup-bench"],
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+    first_paint = None
+    for line in proc.stdout.splitlines():
+        if line.startswith("first_paint "):
+            first_paint = float(line.split()[1]) - start
+    if first_paint is None:
+        raise RuntimeError(f"没有检测到第一次绘制:\n{proc.stderr[-2000:]}")
+    return first_paint, parse_importtime(proc.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--platform", default="offscreen")
+    args = parser.parse_args()
+
+    times = []
+    imports = []
+    for _ in range(args.repeat):
+        first_paint, imports = run_once(args.platform)
+        times.append(first_paint)
+    print(
+        f"首次绘制: 中位数 {statistics.median(times) * 1000:.0f} ms，"
+        f"最快 {min(times) * 1000:.0f} ms（{args.repeat} 次）"
+    )
+    print(f"最慢的导入（累计，最后一次运行）:")
+    for cumulative, name in sorted(imports, reverse=True)[: args.top]:
+        print(f"{cumulative / 1000:8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
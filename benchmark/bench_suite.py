@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+r"""
+在模拟存档目录上测试主窗口各项操作的耗时
+
+用法:
+    python -m benchmark.bench_suite [--counts 10,1000,10000] [--size-kb 64]
+        [--keys-last] [--storm 200] [--memory-fs] [--output bench_results.json]
+
+对每个存档数量生成一个存档目录（见 benchmark.synthetic），依次测试:
+    scan            目录扫描（SaveLibrary.scan）
+    metadata        逐个解析存档头部
+    populate_*      offscreen 平台下创建主窗口，到列表出现第一批行 / 头部全部填入
+    sort_*          按各列和多列重新排序
+    save_as / load  另存为和加载存档
+    event_storm     短时间内反复写入大量存档，到列表全部更新
+结果写入JSON文件，包含环境信息和每项的耗时（秒），可以与之前的结果对比。
+配置、索引和日志都写在临时工作目录中，不影响当前目录。
+--memory-fs 把存档放在内存文件系统（util.fs.MemoryFS）中，结果不受磁盘速度影响。
+"""
+import argparse
+from datetime import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=PACKAGE_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def timeit(func, repeat: int = 1) -> dict:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return {"best": min(times), "median": statistics.median(times), "repeat": repeat}
+
+
+def wait_until(app, condition, timeout: float = 600) -> float:
+    r"""
+    处理Qt事件直到 condition() 成立，返回等待的秒数，超时抛出 TimeoutError
+    """
+    start = time.perf_counter()
+    while not condition():
+        if time.perf_counter() - start > timeout:
+            raise TimeoutError("等待超时")
+        app.processEvents()
+        time.sleep(0.001)
+    return time.perf_counter() - start
+
+
+def run(app, workdir: str, count: int, args) -> dict:
+    from PyQt5.QtCore import Qt
+    from benchmark.synthetic import STEAM_ID, make_save_folder, write_global
+    from core.library import SaveLibrary
+    from gui.main import MainWindow
+    from gui.save_model import COL_DIFFICULTY, COL_ROUND
+    from util.config import Config
+    from util.fs import MemoryFS, local_fs
+    from util.save_index import parse_header
+
+    result = {
+        "count": count,
+        "size_kb": args.size_kb,
+        "keys_last": args.keys_last,
+        "memory_fs": args.memory_fs,
+    }
+    fs = MemoryFS() if args.memory_fs else local_fs
+    root = os.path.join(workdir, f"saves_{count}")
+    start = time.perf_counter()
+    save_dir = make_save_folder(root, count, args.size_kb, args.keys_last, fs=fs)
+    result["generate"] = time.perf_counter() - start
+
+    library = SaveLibrary(save_dir, fsync=False, fs=fs)
+    result["scan"] = timeit(lambda: list(library.scan()), 3)
+    paths = [path for path, _ in library.scan()]
+    result["metadata"] = timeit(lambda: [parse_header(p, fs) for p in paths])
+
+    # 主窗口：从创建到列表填满
+    Config.set("SaveDataDir", os.path.join(root, "SAVEDATA"))
+    Config.set("steam_id", STEAM_ID)
+    Config.set("fsync", False)
+    finished = []
+    start = time.perf_counter()
+    window = MainWindow(app, fs)
+    window.workers.scan_finished.connect(lambda *_: finished.append(1))
+    wait_until(app, lambda: window.profile is not None)
+    wait_until(app, lambda: window.save_model.rowCount() > 0)
+    result["populate_first_rows"] = time.perf_counter() - start
+    wait_until(app, lambda: finished)
+    result["populate_all"] = time.perf_counter() - start
+
+    proxy = window.proxy_model
+    for column in range(proxy.columnCount()):
+        name = window.save_model.headerData(column, Qt.Horizontal)
+        result[f"sort_{column}_{name}"] = timeit(
+            lambda: proxy.set_sort_keys([(column, Qt.AscendingOrder)]), 3
+        )
+    result["sort_multi"] = timeit(
+        lambda: proxy.set_sort_keys(
+            [(COL_DIFFICULTY, Qt.AscendingOrder), (COL_ROUND, Qt.DescendingOrder)]
+        ),
+        3,
+    )
+
+    source = paths[0]
+    result["save_as"] = timeit(
+        lambda: window.library.save_as(source, "bench_copy", overwrite=True), 10
+    )
+
+    def load():
+        write_global(save_dir, in_game=False, fs=fs)
+        window.library.load(source)
+
+    result["load"] = timeit(load, 10)
+
+    # 文件事件风暴：每个存档连续写三次，到合并后的变化全部应用到列表
+    wait_until(app, lambda: window.monitor is not None)
+    storm = min(args.storm, len(paths))
+    received = window.coalescer.received
+    coalesced = window.coalescer.coalesced
+    applied = []
+    window.event_timer.timeout.connect(lambda: applied.append(time.perf_counter()))
+    start = time.perf_counter()
+    for path in paths[:storm]:
+        with fs.open(path, "rb") as f:
+            data = f.read()
+        for _ in range(3):
+            with fs.open(path, "wb") as f:
+                f.write(data)
+    written = time.perf_counter() - start
+    # 事件停止并且合并窗口内的变化都已应用后结束
+    last = [window.coalescer.received, time.perf_counter()]
+
+    def settled():
+        if window.coalescer.received != last[0]:
+            last[:] = [window.coalescer.received, time.perf_counter()]
+        return (
+            time.perf_counter() - last[1] > 1.0
+            and not window.event_timer.isActive()
+        )
+
+    wait_until(app, settled)
+    result["event_storm"] = {
+        "files": storm,
+        "write": written,
+        "events_received": window.coalescer.received - received,
+        "events_coalesced": window.coalescer.coalesced - coalesced,
+        "applied": (applied[-1] - start) if applied else None,
+    }
+
+    # 关闭窗口时停止监控并等待后台任务
+    window.close()
+    window.deleteLater()
+    app.processEvents()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--counts", default="10,1000,10000")
+    parser.add_argument("--size-kb", type=int, default=64)
+    parser.add_argument("--keys-last", action="store_true")
+    parser.add_argument("--storm", type=int, default=200)
+    parser.add_argument("--memory-fs", action="store_true")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--workdir", help="默认使用临时目录")
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output)
+    workdir = args.workdir or tempfile.mkdtemp(prefix="sultan_bench_")
+    os.makedirs(workdir, exist_ok=True)
+    # 配置、索引和日志都使用相对路径，在导入程序模块之前切换目录
+    os.chdir(workdir)
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    sys.path.insert(0, PACKAGE_DIR)
+    from PyQt5.QtCore import QT_VERSION_STR
+    from PyQt5.QtWidgets import QApplication
+
+    app = QApplication([sys.argv[0]])
+    results = {
+        "meta": {
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "qt": QT_VERSION_STR,
+            "workdir": workdir,
+        },
+        "runs": [],
+    }
+    for count in (int(c) for c in args.counts.split(",")):
+        print(f"存档数量 {count} ...", flush=True)
+        run_result = run(app, workdir, count, args)
+        results["runs"].append(run_result)
+        for key in ("scan", "metadata", "save_as", "load"):
+            print(f"  {key}: {run_result[key]['best'] * 1000:.1f} ms")
+        print(f"  populate_all: {run_result['populate_all'] * 1000:.1f} ms")
+        storm = run_result["event_storm"]
+        print(
+            f"  event_storm: {storm['files']} 个文件 {storm['events_received']} 个事件，"
+            f"合并 {storm['events_coalesced']} 个"
+        )
+    with open(output, "w", encoding="utf8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"结果已写入 {output}")
+
+
+if __name__ == "__main__":
+    main()
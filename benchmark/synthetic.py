@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+r"""
+生成模拟的《苏丹的游戏》存档目录
+
+用法: python -m benchmark.synthetic <输出目录> [--count 1000] [--size-kb 200] [--keys-last]
+在 <输出目录>/SAVEDATA/<steam_id>/ 下生成 round_<n>.json 存档，以及 global.json 和 auto_save.json。
+存档包含 name、difficulty、round、saveTime 四个顶层字段，其余内容为卡牌和世界状态，
+填充到指定大小。--keys-last 把这四个字段放在文件末尾，是解析头部最慢的情况。
+"""
+import argparse
+from datetime import datetime, timedelta
+import json
+import os
+import random
+
+from util.fs import local_fs
+
+STEAM_ID = "76561198000000000"
+
+_names = ["苏丹", "王子", "祭司", "将军", "商人", "刺客", "诗人", "公主"]
+_words = ["美酒", "征服", "纵欲", "杀戮", "奢靡", "knight", "rite", "gold"]
+# 一张卡牌序列化后的大致字节数
+_CARD_BYTES = 260
+
+
+def make_card(rnd: random.Random, uid: int) -> dict:
+    return {
+        "uid": uid,
+        "id": rnd.randint(100000, 999999),
+        "count": rnd.randint(1, 5),
+        "tag": {f"t{i}": rnd.randint(0, 9) for i in range(6)},
+        "text": f"{rnd.choice(_words)}{rnd.choice(_words)} item{rnd.randint(0, 5000)}",
+    }
+
+
+def make_save(rnd: random.Random, i: int, size_kb: int, keys_last: bool) -> dict:
+    header = {
+        "name": f"{rnd.choice(_names)}{i % 7}",
+        "difficulty": rnd.randint(0, 3),
+        "round": i % 300 + 1,
+        "saveTime": (datetime(2025, 1, 1) + timedelta(minutes=17 * i)).isoformat()
+        + "Z",
+    }
+    cards = max(1, size_kb * 1024 // _CARD_BYTES)
+    body = {
+        "cards": [make_card(rnd, uid) for uid in range(cards)],
+        "world": {"rite": [[j, j * 2] for j in range(50)], "flags": {"a": 1}},
+    }
+    if keys_last:
+        return {**body, **header}
+    return {**header, **body}
+
+
+def make_save_folder(
+    root: str,
+    count: int,
+    size_kb: int = 200,
+    keys_last: bool = False,
+    steam_id: str = STEAM_ID,
+    seed: int = 0,
+    fs=local_fs,
+) -> str:
+    r"""
+    生成一个账号的存档目录，返回该目录路径
+
+    存档的修改时间依次递增，和游戏中逐回合保存的顺序一致；fs 可以是 util.fs.MemoryFS
+    """
+    save_dir = os.path.join(root, "SAVEDATA", steam_id)
+    fs.makedirs(save_dir)
+    rnd = random.Random(seed)
+    # 相同大小的存档只生成几个模板，写入时只改头部字段，生成大量文件时更快
+    templates = [make_save(rnd, i, size_kb, keys_last) for i in range(4)]
+    base_time = datetime(2025, 1, 1).timestamp()
+    for i in range(count):
+        save = dict(templates[i % len(templates)])
+        save.update(
+            {
+                "name": f"{_names[i % len(_names)]}{i % 7}",
+                "difficulty": i % 4,
+                "round": i % 300 + 1,
+                "saveTime": (datetime(2025, 1, 1) + timedelta(minutes=17 * i))
+                .isoformat()
+                + "Z",
+            }
+        )
+        path = os.path.join(save_dir, f"round_{i}.json")
+        with fs.open(path, "w", encoding="utf8") as f:
+            json.dump(save, f, ensure_ascii=False)
+        fs.set_mtime(path, base_time + i * 60)
+    with fs.open(os.path.join(save_dir, "auto_save.json"), "w", encoding="utf8") as f:
+        json.dump(templates[0], f, ensure_ascii=False)
+    write_global(save_dir, in_game=False, fs=fs)
+    return save_dir
+
+
+def write_global(save_dir: str, in_game: bool, fs=local_fs):
+    with fs.open(os.path.join(save_dir, "global.json"), "w", encoding="utf8") as f:
+        json.dump({"inGame": in_game}, f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("root")
+    parser.add_argument("--count", type=int, default=1000)
+    parser.add_argument("--size-kb", type=int, default=200)
+    parser.add_argument("--keys-last", action="store_true")
+    args = parser.parse_args()
+    save_dir = make_save_folder(args.root, args.count, args.size_kb, args.keys_last)
+    print(f"已生成 {args.count} 个存档: {save_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,11 @@
+# -*- coding: utf-8 -*-
+from core.library import SaveLibrary, is_save_file, format_save_time, list_profiles
+from core.retention import RetentionPolicy
+
+__all__ = [
+    "SaveLibrary",
+    "is_save_file",
+    "format_save_time",
+    "list_profiles",
+    "RetentionPolicy",
+]
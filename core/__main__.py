@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+r"""
+命令行工具，不需要启动图形界面
+
+用法:
+    python -m core list [--header]
+    python -m core info <存档名>
+    python -m core snapshot <存档名> <新存档名> [--overwrite] [--store]
+    python -m core load <存档名> [--store]
+    python -m core prune [--keep <数量>] [--keep-every <回合数>] [--max-mb <大小>] [--dry-run]
+    python -m core diff <旧存档名> <新存档名> [--summary]
+    python -m core export <存档包.zip> [存档名 ...]
+    python -m core import <存档包.zip>
+    python -m core records [--endings]
+    python -m core extract <序号> <新存档名> [--endings] [--overwrite]
+    python -m core store <存档名> [--name <记录名>]
+
+默认操作 config.json 中记录的存档目录，可用一个或多个 --dir 指定其他目录。
+结果以JSON输出到标准输出。
+"""
+import argparse
+import json
+import os
+import sys
+
+from core.library import SaveLibrary, list_profiles
+from core.locate import default_save_data_dir
+from core.retention import RetentionPolicy, is_enabled
+from util.config import Config
+
+
+def _snapshot_store():
+    from util.snapshot_store import SnapshotStore
+
+    return SnapshotStore(compression=Config.get("snapshot_compression", "zlib"))
+
+
+def _profile(library: SaveLibrary) -> str:
+    return os.path.basename(os.path.normpath(library.save_dir))
+
+
+def cmd_list(library: SaveLibrary, args):
+    saves = library.list()
+    if args.header:
+        for save in saves:
+            try:
+                save.update(library.info(save["path"]))
+            except (OSError, ValueError) as e:
+                save["error"] = str(e)
+    return saves
+
+
+def cmd_info(library: SaveLibrary, args):
+    return library.info(args.name)
+
+
+def cmd_snapshot(library: SaveLibrary, args):
+    if args.store:
+        return _snapshot_store().put(
+            _profile(library), args.new_name, library.resolve(args.name)
+        )
+    path = library.save_as(args.name, args.new_name, overwrite=args.overwrite)
+    return {"path": path}
+
+
+def cmd_load(library: SaveLibrary, args):
+    if args.store:
+        store = _snapshot_store()
+        in_game_set = library.load_with(
+            lambda dest: store.materialize(
+                _profile(library), args.name, dest, fsync=library.fsync
+            )
+        )
+    else:
+        in_game_set = library.load(args.name)
+    return {"path": library.auto_save_path, "in_game_set": in_game_set}
+
+
+def cmd_prune(library: SaveLibrary, args):
+    policy = RetentionPolicy(
+        keep_last=args.keep,
+        every_rounds=args.keep_every,
+        max_bytes=int(args.max_mb * 1048576) if args.max_mb else None,
+    )
+    if not is_enabled(policy):
+        raise ValueError("请至少指定 --keep、--keep-every、--max-mb 之一")
+    removed = library.prune(policy, dry_run=args.dry_run)
+    return {"removed": removed, "dry_run": args.dry_run}
+
+
+def cmd_diff(library: SaveLibrary, args):
+    from util.json_diff import diff_files, format_path, summarize
+
+    changes = diff_files(
+        library.resolve(args.old), library.resolve(args.new), library.fs
+    )
+    if args.summary:
+        return summarize(changes)
+    return [
+        {"kind": c.kind, "path": format_path(c.path), "old": c.old, "new": c.new}
+        for c in changes
+    ]
+
+
+def cmd_export(library: SaveLibrary, args):
+    from util.archive import export_saves
+
+    if args.names:
+        paths = [library.resolve(name) for name in args.names]
+    else:
+        paths = [save["path"] for save in library.list()]
+    manifest = export_saves(args.archive, paths)
+    return {"archive": args.archive, "saves": len(manifest["saves"])}
+
+
+def cmd_import(library: SaveLibrary, args):
+    from util.archive import import_saves
+
+    result = import_saves(args.archive, library.save_dir)
+    library.mark_named(result["imported"])
+    return result
+
+
+def _record_file(args) -> str:
+    from util.record_file import OVER_RECORD, USER_ARCHIVE
+
+    return OVER_RECORD if args.endings else USER_ARCHIVE
+
+
+def cmd_records(library: SaveLibrary, args):
+    index = library.index_records(_record_file(args))
+    return [
+        dict(entry.header, index=entry.index, size=entry.length)
+        for entry in index.entries
+    ]
+
+
+def cmd_extract(library: SaveLibrary, args):
+    index = library.index_records(_record_file(args))
+    path = library.extract_record(
+        index, args.index, args.new_name, overwrite=args.overwrite
+    )
+    return {"path": path}
+
+
+def cmd_store(library: SaveLibrary, args):
+    index = library.store_record(args.name, args.record_name)
+    return {"path": index.path, "records": len(index)}
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m core", description=__doc__)
+    parser.add_argument(
+        "--dir",
+        action="append",
+        help="存档目录（SAVEDATA/<steam_id>），可重复指定",
+    )
+    parser.add_argument("--no-fsync", action="store_true", help="写入后不同步到磁盘")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("list", help="列出存档")
+    p.add_argument("--header", action="store_true", help="同时输出存档头部信息")
+    p.set_defaults(func=cmd_list)
+
+    p = sub.add_parser("info", help="查看存档信息")
+    p.add_argument("name")
+    p.set_defaults(func=cmd_info)
+
+    p = sub.add_parser("snapshot", help="另存为新存档")
+    p.add_argument("name")
+    p.add_argument("new_name")
+    p.add_argument("--overwrite", action="store_true")
+    p.add_argument("--store", action="store_true", help="保存到去重快照存储")
+    p.set_defaults(func=cmd_snapshot)
+
+    p = sub.add_parser("load", help="加载存档到auto_save.json")
+    p.add_argument("name")
+    p.add_argument("--store", action="store_true", help="从去重快照存储加载")
+    p.set_defaults(func=cmd_load)
+
+    p = sub.add_parser("prune", help="按保留策略清理旧存档")
+    p.add_argument("--keep", type=int, help="每局游戏保留最新的存档数量")
+    p.add_argument("--keep-every", type=int, help="每局游戏每隔多少回合保留一个存档")
+    p.add_argument("--max-mb", type=float, help="存档总大小上限（MB）")
+    p.add_argument("--dry-run", action="store_true")
+    p.set_defaults(func=cmd_prune)
+
+    p = sub.add_parser("diff", help="对比两个存档")
+    p.add_argument("old")
+    p.add_argument("new")
+    p.add_argument("--summary", action="store_true", help="只输出各字段的变化数量")
+    p.set_defaults(func=cmd_diff)
+
+    p = sub.add_parser("export", help="把存档导出为存档包（zip）")
+    p.add_argument("archive")
+    p.add_argument("names", nargs="*", help="要导出的存档名，默认导出全部")
+    p.set_defaults(func=cmd_export)
+
+    p = sub.add_parser("import", help="导入存档包，已有的相同存档会跳过")
+    p.add_argument("archive")
+    p.set_defaults(func=cmd_import)
+
+    p = sub.add_parser("records", help="列出官方存档中的记录")
+    p.add_argument("--endings", action="store_true", help="列出结局记录")
+    p.set_defaults(func=cmd_records)
+
+    p = sub.add_parser("extract", help="把官方存档中的一条记录提取为存档")
+    p.add_argument("index", type=int, help="记录序号（从0开始）")
+    p.add_argument("new_name")
+    p.add_argument("--endings", action="store_true", help="从结局记录中提取")
+    p.add_argument("--overwrite", action="store_true")
+    p.set_defaults(func=cmd_extract)
+
+    p = sub.add_parser("store", help="把存档存入官方存档")
+    p.add_argument("name")
+    p.add_argument("--name", dest="record_name", help="记录名")
+    p.set_defaults(func=cmd_store)
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    save_dirs = args.dir
+    if not save_dirs:
+        # 没有配置时和图形界面一样自动寻找存档目录，使用最近修改的账号
+        save_data_dir = Config.get("SaveDataDir") or default_save_data_dir()
+        steam_id = Config.get("steam_id")
+        if save_data_dir and not steam_id:
+            steam_id = next(iter(list_profiles(save_data_dir)), None)
+        if not save_data_dir or not steam_id:
+            print(json.dumps({"error": "未配置存档目录，请使用 --dir 指定"}))
+            return 1
+        save_dirs = [os.path.join(save_data_dir, steam_id)]
+
+    results = {}
+    code = 0
+    for save_dir in save_dirs:
+        library = SaveLibrary(save_dir, fsync=not args.no_fsync)
+        try:
+            results[save_dir] = args.func(library, args)
+        except Exception as e:
+            results[save_dir] = {"error": str(e)}
+            code = 1
+    output = results[save_dirs[0]] if len(save_dirs) == 1 else results
+    json.dump(output, sys.stdout, ensure_ascii=False, indent=2)
+    print()
+    return code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,308 @@
+# -*- coding: utf-8 -*-
+r"""
+存档库
+
+不依赖Qt的存档操作：列出、查看、另存为、加载到auto_save.json、删除和清理，
+以及从官方存档和结局记录中提取存档、把存档存入官方存档。
+图形界面和命令行都通过这里操作存档目录，文件读写都经过 util.fs 的文件系统接口。
+"""
+from datetime import datetime
+import json
+import os
+
+import util.logger
+from core import retention
+from core.retention import RetentionPolicy
+from util.config import Config
+from util.fs import local_fs
+from util.save_index import save_index
+from util import record_file
+
+log = util.logger.logger(__name__)
+
+AUTO_SAVE = "auto_save.json"
+GLOBAL_JSON = "global.json"
+
+_ignore_json = [
+    "global.json",
+    "global.json.bak.json",
+    record_file.USER_ARCHIVE,  # 官方存档
+    record_file.OVER_RECORD,  # 结局存档
+]
+
+
+def is_save_file(file_path: str) -> bool:
+    return file_path.endswith(".json") and os.path.basename(file_path) not in _ignore_json
+
+
+def list_profiles(save_data_dir: str, fs=local_fs) -> list:
+    r"""
+    列出 SAVEDATA 目录下的所有账号（steam_id 文件夹），最近修改的在前
+    """
+    try:
+        with fs.scandir(save_data_dir) as it:
+            dirs = [(e.stat().st_mtime, e.name) for e in it if e.is_dir()]
+    except OSError:
+        return []
+    return [name for _, name in sorted(dirs, reverse=True)]
+
+
+def format_save_time(save_time_str: str) -> str:
+    r"""
+    把存档中的ISO时间转换为本地显示格式，无法解析时返回"未知"
+    """
+    try:
+        if save_time_str:
+            save_time_dt = datetime.fromisoformat(save_time_str.replace("Z", "+00:00"))
+            return save_time_dt.strftime("%Y-%m-%d %H:%M:%S")
+    except ValueError:
+        pass
+    return "未知"
+
+
+class SaveLibrary:
+    def __init__(self, save_dir: str, fsync: bool = True, fs=None):
+        self.save_dir = save_dir
+        # 写入游戏目录的文件是否同步到磁盘
+        self.fsync = fsync
+        self.fs = fs or local_fs
+
+    @property
+    def auto_save_path(self) -> str:
+        return os.path.join(self.save_dir, AUTO_SAVE)
+
+    def resolve(self, name: str) -> str:
+        r"""
+        存档名（不带.json）或文件名转换为完整路径
+        """
+        if os.path.isabs(name):
+            return name
+        if not name.endswith(".json"):
+            name = f"{name}.json"
+        return os.path.join(self.save_dir, name)
+
+    def scan(self):
+        r"""
+        扫描存档目录，逐个返回 (文件路径, os.stat_result)
+        """
+        with self.fs.scandir(self.save_dir) as it:
+            for entry in it:
+                if not is_save_file(entry.name):
+                    continue
+                try:
+                    if not entry.is_file():
+                        continue
+                    # 目录扫描时一并取得文件信息，不再逐个stat
+                    yield entry.path, entry.stat()
+                except OSError:
+                    # 扫描过程中文件可能已被删除
+                    continue
+
+    def list(self) -> list:
+        r"""
+        列出所有存档，按修改时间倒序
+        """
+        saves = [
+            {
+                "name": os.path.splitext(os.path.basename(path))[0],
+                "path": path,
+                "size": stat.st_size,
+                "mtime": stat.st_mtime,
+            }
+            for path, stat in self.scan()
+        ]
+        saves.sort(key=lambda x: x["mtime"], reverse=True)
+        return saves
+
+    def header(self, name: str) -> dict:
+        r"""
+        读取存档头部（主角名、难度、回合、保存时间），使用元数据索引
+        """
+        return save_index.get_header(self.resolve(name), fs=self.fs)
+
+    def info(self, name: str) -> dict:
+        path = self.resolve(name)
+        stat = self.fs.stat(path)
+        header = save_index.get_header(path, stat, self.fs)
+        return {
+            "name": os.path.splitext(os.path.basename(path))[0],
+            "path": path,
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "character": header.get("name"),
+            "difficulty": header.get("difficulty"),
+            "round": header.get("round"),
+            "saveTime": header.get("saveTime"),
+        }
+
+    @property
+    def steam_id(self) -> str:
+        return os.path.basename(os.path.normpath(self.save_dir))
+
+    def named_saves(self) -> set:
+        r"""
+        用户通过另存为、提取记录、导入存档包命名的存档名，按保留策略清理时不会删除
+        """
+        return set(Config.get_profile(self.steam_id, "named_saves") or [])
+
+    def mark_named(self, paths, named: bool = True):
+        names = {os.path.splitext(os.path.basename(path))[0] for path in paths}
+        current = self.named_saves()
+        updated = current | names if named else current - names
+        if updated != current:
+            Config.set_profile(self.steam_id, "named_saves", sorted(updated))
+
+    def save_as(self, name: str, new_name: str, overwrite: bool = False) -> str:
+        r"""
+        把存档复制为新名字，返回新存档路径；同名存档已存在且不覆盖时抛出 FileExistsError
+        """
+        src = self.resolve(name)
+        dst = self.resolve(new_name)
+        if self.fs.exists(dst) and not overwrite:
+            raise FileExistsError(f"同名存档已存在: {os.path.basename(dst)}")
+        # 复制而不是重命名文件，新存档使用当前时间作为修改时间
+        self.fs.copy(src, dst, copy_stat=False)
+        self.mark_named([dst])
+        log.info(f"另存为: {src} -> {dst}")
+        return dst
+
+    def set_in_game(self) -> bool:
+        r"""
+        修改global.json中的inGame字段，已经在游戏中时返回False
+        """
+        global_path = os.path.join(self.save_dir, GLOBAL_JSON)
+        if self.fs.exists(global_path):
+            with self.fs.open(global_path, "r", encoding="utf-8") as f:
+                global_data = json.load(f)
+            if global_data["inGame"] == True:
+                return False  # 如果已经在游戏中，则不修改
+            global_data["inGame"] = True
+            # 整体替换而不是原地改写，游戏不会读到写了一半的文件
+            self.fs.write_json(global_path, global_data, fsync=self.fsync)
+        return True
+
+    def load_with(self, write) -> bool:
+        r"""
+        用 write(auto_save_path) 写入auto_save.json，然后修改global.json
+
+        返回False表示游戏已经处于游戏中状态，global.json未修改
+        """
+        write(self.auto_save_path)
+        return self.set_in_game()
+
+    def load(self, name: str) -> bool:
+        r"""
+        把存档加载到auto_save.json，返回值同 load_with
+        """
+        src = self.resolve(name)
+        log.info(f"加载存档: {src}")
+        # 直接复制文件到auto_save.json
+        return self.load_with(lambda dest: self.fs.copy(src, dest, fsync=self.fsync))
+
+    def load_data(self, save_data) -> bool:
+        r"""
+        把存档数据写入auto_save.json，返回值同 load_with
+        """
+        return self.load_with(
+            lambda dest: self.fs.write_json(dest, save_data, fsync=self.fsync)
+        )
+
+    def record_path(self, file_name: str = record_file.USER_ARCHIVE) -> str:
+        r"""
+        官方存档（默认）或结局记录文件的路径
+        """
+        return os.path.join(self.save_dir, file_name)
+
+    def index_records(self, file_name: str = record_file.USER_ARCHIVE):
+        return record_file.index_records(self.record_path(file_name), fs=self.fs)
+
+    def extract_record(
+        self, index, i: int, new_name: str, overwrite: bool = False
+    ) -> str:
+        r"""
+        把记录文件中的第 i 条记录提取为一个新存档，返回新存档路径
+        """
+        dst = self.resolve(new_name)
+        if self.fs.exists(dst) and not overwrite:
+            raise FileExistsError(f"同名存档已存在: {os.path.basename(dst)}")
+        save_data = record_file.record_save(record_file.read_record(index, i))
+        self.fs.write_json(dst, save_data, fsync=self.fsync)
+        self.mark_named([dst])
+        log.info(f"提取记录: {index.path} 第{i}条 -> {dst}")
+        return dst
+
+    def store_record(self, name: str, record_name: str = None, index=None):
+        r"""
+        把存档追加到官方存档中，返回更新后的官方存档索引
+        """
+        src = self.resolve(name)
+        with self.fs.open(src, "r", encoding="utf-8") as f:
+            save_data = json.load(f)
+        if index is None:
+            index = self.index_records()
+        index = record_file.append_record(index, save_data, record_name, self.fsync)
+        log.info(f"存入官方存档: {src} -> {index.path}")
+        return index
+
+    def delete(self, name: str):
+        path = self.resolve(name)
+        self.fs.remove(path)
+        save_index.discard(path)
+        self.mark_named([path], named=False)
+        log.warning(f"删除存档: {path}")
+
+    def infos(self) -> list:
+        r"""
+        列出所有存档及其头部信息，头部读取失败的存档回合和主角名为None
+        """
+        infos = []
+        for path, stat in self.scan():
+            try:
+                header = save_index.get_header(path, stat, self.fs)
+            except (OSError, ValueError):
+                header = {}
+            infos.append(
+                {
+                    "name": os.path.splitext(os.path.basename(path))[0],
+                    "path": path,
+                    "size": stat.st_size,
+                    "mtime": stat.st_mtime,
+                    "character": header.get("name"),
+                    "round": header.get("round"),
+                }
+            )
+        return infos
+
+    def prune(
+        self, policy: RetentionPolicy, dry_run: bool = False, saves: list = None
+    ) -> list:
+        r"""
+        按保留策略删除旧存档，返回被删除的路径
+
+        auto_save.json、用户命名的存档（见 named_saves）和还不知道属于哪一局的存档
+        （头部没有读取或读取失败）始终保留，只计入总大小。
+        saves 为 infos() 形式的存档列表，界面可以传入内存中的记录，不再重新扫描目录
+        """
+        if saves is None:
+            saves = self.infos()
+        named = self.named_saves()
+        candidates = []
+        reserved = 0
+        for save in saves:
+            file_name = os.path.basename(save["path"])
+            if (
+                file_name == AUTO_SAVE
+                or os.path.splitext(file_name)[0] in named
+                or save["character"] is None
+            ):
+                reserved += save["size"]
+            else:
+                candidates.append(save)
+        removed = retention.plan(candidates, policy, reserved)
+        if not dry_run:
+            for path in removed:
+                try:
+                    self.delete(path)
+                except FileNotFoundError:
+                    pass
+        return removed
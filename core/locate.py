@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+r"""
+寻找游戏的存档根目录（SAVEDATA，其下每个账号一个 steam_id 文件夹）
+
+Windows 上存档在 %USERPROFILE%\AppData\LocalLow\DoubleCross\SultansGame\SAVEDATA。
+Linux 上通过 Steam Proton 运行时，存档在游戏的 Proton 前缀中:
+    <Steam库>/steamapps/compatdata/<appid>/pfx/drive_c/users/steamuser/
+    AppData/LocalLow/...
+Steam库包括 ~/.steam/steam、~/.local/share/Steam、Flatpak 版 Steam 的目录，
+以及 libraryfolders.vdf 中登记的其他库；这里不依赖游戏的 appid，检查所有前缀。
+直接用 Wine 运行时存档在 WINEPREFIX（默认 ~/.wine）中各个用户的 LocalLow 下。
+"""
+import os
+import re
+import sys
+
+from util.fs import local_fs
+
+GAME_DIR = ("DoubleCross", "SultansGame", "SAVEDATA")
+LOCAL_LOW = ("AppData", "LocalLow")
+
+_STEAM_ROOTS = (
+    (".steam", "steam"),
+    (".local", "share", "Steam"),
+    (".var", "app", "com.valvesoftware.Steam", ".local", "share", "Steam"),
+    (".var", "app", "com.valvesoftware.Steam", "data", "Steam"),
+)
+_library_path = re.compile(r'"path"\s+"((?:[^"\\]|\\.)*)"')
+
+
+def _subdirs(path: str, fs) -> list:
+    try:
+        with fs.scandir(path) as it:
+            return [entry.path for entry in it if entry.is_dir()]
+    except OSError:
+        return []
+
+
+def windows_save_data_dir(env=os.environ) -> str:
+    r"""
+    Windows 上的存档根目录（不检查是否存在），无法确定时返回None
+    """
+    if env.get("LOCALAPPDATA"):
+        # LocalLow 与 Local 在同一个目录下
+        return os.path.join(env["LOCALAPPDATA"] + "Low", *GAME_DIR)
+    if env.get("USERPROFILE"):
+        return os.path.join(env["USERPROFILE"], *LOCAL_LOW, *GAME_DIR)
+    return None
+
+
+def steam_libraries(home: str, fs=local_fs) -> list:
+    r"""
+    Steam 的安装目录和 libraryfolders.vdf 中登记的其他库，去掉重复
+    """
+    libraries = []
+    for parts in _STEAM_ROOTS:
+        root = os.path.join(home, *parts)
+        if not fs.isdir(root):
+            continue
+        libraries.append(root)
+        vdf = os.path.join(root, "steamapps", "libraryfolders.vdf")
+        try:
+            with fs.open(vdf, "r", encoding="utf8") as f:
+                text = f.read()
+        except (OSError, ValueError):
+            continue
+        for match in _library_path.finditer(text):
+            libraries.append(match.group(1).replace("\\\\", "\\"))
+    seen = set()
+    unique = []
+    for library in libraries:
+        key = os.path.realpath(library) if fs.local else os.path.normpath(library)
+        if key not in seen:
+            seen.add(key)
+            unique.append(library)
+    return unique
+
+
+def proton_save_data_dirs(home: str, fs=local_fs) -> list:
+    found = []
+    for library in steam_libraries(home, fs):
+        compatdata = os.path.join(library, "steamapps", "compatdata")
+        for prefix in _subdirs(compatdata, fs):
+            path = os.path.join(
+                prefix, "pfx", "drive_c", "users", "steamuser", *LOCAL_LOW, *GAME_DIR
+            )
+            if fs.isdir(path):
+                found.append(path)
+    return found
+
+
+def wine_save_data_dirs(home: str, env=os.environ, fs=local_fs) -> list:
+    prefix = env.get("WINEPREFIX") or os.path.join(home, ".wine")
+    found = []
+    for user in _subdirs(os.path.join(prefix, "drive_c", "users"), fs):
+        path = os.path.join(user, *LOCAL_LOW, *GAME_DIR)
+        if fs.isdir(path):
+            found.append(path)
+    return found
+
+
+def find_save_data_dirs(env=os.environ, fs=local_fs) -> list:
+    r"""
+    本机上所有存在的存档根目录，最近修改的在前
+    """
+    if sys.platform == "win32":
+        path = windows_save_data_dir(env)
+        return [path] if path and fs.isdir(path) else []
+    home = env.get("HOME") or os.path.expanduser("~")
+    found = proton_save_data_dirs(home, fs) + wine_save_data_dirs(home, env, fs)
+
+    def mtime(path):
+        try:
+            return fs.stat(path).st_mtime
+        except OSError:
+            return 0
+
+    return sorted(found, key=mtime, reverse=True)
+
+
+def default_save_data_dir(env=os.environ, fs=local_fs) -> str:
+    r"""
+    找到的第一个存档根目录；都不存在时返回本平台的默认位置，没有默认位置时返回None
+    """
+    found = find_save_data_dirs(env, fs)
+    if found:
+        return found[0]
+    if sys.platform == "win32":
+        return windows_save_data_dir(env)
+    return None
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+r"""
+存档保留策略
+
+根据存档头部信息决定哪些旧存档可以删除:
+    keep_last       每局游戏（按主角名区分）保留最新的 N 个存档
+    every_rounds    每局游戏每 X 回合保留一个存档（该区间内最新的一个）
+    max_bytes       所有存档总大小的上限，超出时从最旧的存档开始删除
+
+keep_last 和 every_rounds 保留的存档取并集；都没有设置时不按数量删除。
+"""
+from collections import namedtuple
+
+RetentionPolicy = namedtuple(
+    "RetentionPolicy", "keep_last every_rounds max_bytes", defaults=(None, None, None)
+)
+
+
+def is_enabled(policy: RetentionPolicy) -> bool:
+    return any(value for value in policy)
+
+
+def run_key(save: dict) -> str:
+    r"""
+    存档所属的一局游戏，使用主角名区分
+    """
+    return save.get("character") or ""
+
+
+def plan(saves: list, policy: RetentionPolicy, reserved_bytes: int = 0) -> list:
+    r"""
+    计算需要删除的存档
+
+    saves 为可以删除的存档，SaveLibrary.info 形式的字典列表
+    （需要 path、mtime、size、round、character）；
+    reserved_bytes 为不参与清理但计入总大小的文件大小（如auto_save.json）。
+    返回需要删除的路径，按修改时间从旧到新排列
+    """
+    candidates = sorted(saves, key=lambda s: s["mtime"], reverse=True)
+
+    if policy.keep_last or policy.every_rounds:
+        kept = set()
+        seen = {}  # 一局游戏 -> [已保留数量, 已保留的回合区间]
+        for save in candidates:
+            state = seen.setdefault(run_key(save), [0, set()])
+            keep = False
+            if policy.keep_last and state[0] < policy.keep_last:
+                keep = True
+            round_ = save.get("round")
+            if policy.every_rounds and isinstance(round_, int):
+                bucket = round_ // policy.every_rounds
+                if bucket not in state[1]:
+                    state[1].add(bucket)
+                    keep = True
+            if keep:
+                state[0] += 1
+                kept.add(save["path"])
+    else:
+        kept = {s["path"] for s in candidates}
+
+    if policy.max_bytes:
+        total = reserved_bytes
+        total += sum(s["size"] for s in candidates if s["path"] in kept)
+        # 从最旧的开始删除，直到总大小不超过上限
+        for save in reversed(candidates):
+            if total <= policy.max_bytes:
+                break
+            if save["path"] in kept:
+                kept.discard(save["path"])
+                total -= save["size"]
+
+    return [s["path"] for s in reversed(candidates) if s["path"] not in kept]
@@ -1,34 +1,43 @@
 # -*- coding: utf-8 -*-
 from PyQt5.QtWidgets import QApplication
+from PyQt5.QtCore import QObject, QEvent, QTimer
 import sys
 import os
+import time
 
-from gui.main import MainWindow
 from util.config import Config
 
+# 启动测速模式：第一次绘制后输出时间戳并退出，由 benchmark/bench_startup.py 使用
+STARTUP_BENCH = "--startup-bench" in sys.argv
+
 def find_save_data() -> str | list[str]:
     r"""
     寻找存档数据位置
     """
-    save_data_dir = Config.getset("SaveDataDir",os.path.join(
-        os.getenv("LOCALAPPDATA")+"Low",
-        "DoubleCross",
-        "SultansGame",
-        "SAVEDATA",
-    ))
+    from core.locate import default_save_data_dir, find_save_data_dirs
+
+    save_data_dir = Config.get("SaveDataDir")
+    if not save_data_dir or not os.path.isdir(save_data_dir):
+        # 没有配置或配置的目录不存在（例如从另一台机器复制来的配置），
+        # 在 Windows 的 LocalLow 和 Linux 的 Proton/Wine 前缀中寻找
+        found = find_save_data_dirs()
+        save_data_dir = found[0] if found else save_data_dir or default_save_data_dir()
+        if save_data_dir:
+            Config.set("SaveDataDir", save_data_dir)
     steam_id = Config.getset("steam_id")
-    if not os.path.exists(save_data_dir):
+    if not save_data_dir or not os.path.exists(save_data_dir):
         # 如果目录不存在，则返回空列表
         return []
-    if steam_id is None:
-        # 没有steam_id，先看一下目录里是否有唯一文件夹
-        dirs = os.listdir(save_data_dir)
-        if len(dirs) == 1:
-            # 如果只有一个文件夹，则返回这个文件夹
+    if steam_id is None or not os.path.isdir(os.path.join(save_data_dir, steam_id)):
+        # 没有steam_id或该账号不在这个目录中，默认使用最近修改过的账号，其他账号可以在窗口中切换
+        from core.library import list_profiles
+
+        dirs = list_profiles(save_data_dir)
+        if dirs:
             Config.set("steam_id", dirs[0])
             return os.path.join(save_data_dir, dirs[0])
         else:
-            # 如果有多个文件夹，则返回空列表
+            # 没有任何账号文件夹，则返回空列表
             return []
     # 如果有steam_id，则返回这个文件夹
     save_data_path = os.path.join(save_data_dir, Config.get("steam_id"))
@@ -37,22 +46,44 @@ def find_save_data() -> str | list[str]:
     else:
         return []
 
+class _FirstPaintProbe(QObject):
+    def __init__(self, app):
+        super().__init__(app)
+        self.app = app
+
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Paint:
+            print(f"first_paint {time.time()}", flush=True)
+            self.app.removeEventFilter(self)
+            QTimer.singleShot(0, self.app.quit)
+        return False
+
 def mainloop():
     app = QApplication(sys.argv)
+    if STARTUP_BENCH:
+        app.installEventFilter(_FirstPaintProbe(app))
     
     # 先找到存档目录
     save_dir = find_save_data()
     if save_dir is None or isinstance(save_dir, list):
         # 如果有多个存档目录，则弹出文件夹选择框
         from PyQt5.QtWidgets import QFileDialog
-        save_dir = QFileDialog.getExistingDirectory(None, "选择存档目录", Config.get("SaveDataDir"))
+        save_dir = QFileDialog.getExistingDirectory(None, "选择存档目录", Config.get("SaveDataDir") or "")
         if not save_dir:
             # 如果用户取消了选择，则退出程序
             sys.exit(0)
         # 取出最后的steam_id
-        steam_id = os.path.basename(save_dir)
+        steam_id = os.path.basename(os.path.normpath(save_dir))
         Config.set("steam_id", steam_id)
-    # 再创建窗口    
+        Config.set("SaveDataDir", os.path.dirname(os.path.normpath(save_dir)))
+    if "--profile" in sys.argv:
+        # 性能记录从创建窗口之前开始
+        from util.profiler import profiler
+
+        profiler.start()
+    # 再创建窗口，主窗口模块在这里才导入
+    from gui.main import MainWindow
+
     window = MainWindow(app)
     window.show()
     sys.exit(app.exec_())
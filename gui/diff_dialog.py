@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+from PyQt5.QtWidgets import (
+    QDialog,
+    QVBoxLayout,
+    QLabel,
+    QTreeWidget,
+    QTreeWidgetItem,
+)
+from PyQt5.QtGui import QBrush, QColor
+import json
+
+from util.json_diff import ADDED, REMOVED, CHANGED, ItemId, format_path
+
+# 树中最多显示的变化数量，过多时界面会卡顿
+MAX_CHANGES = 5000
+# 值的显示长度
+MAX_VALUE_LEN = 200
+
+_kind_text = {ADDED: "增加", REMOVED: "删除", CHANGED: "修改"}
+_kind_color = {
+    ADDED: QColor(0, 128, 0),
+    REMOVED: QColor(192, 0, 0),
+    CHANGED: QColor(0, 64, 192),
+}
+
+
+def _value_text(value) -> str:
+    if value is None:
+        return ""
+    text = json.dumps(value, ensure_ascii=False)
+    if len(text) > MAX_VALUE_LEN:
+        text = text[:MAX_VALUE_LEN] + "…"
+    return text
+
+
+def _key_text(key) -> str:
+    if isinstance(key, ItemId):
+        return f"[{key.key}={key.value}]"
+    if isinstance(key, int):
+        return f"[{key}]"
+    return str(key)
+
+
+class DiffDialog(QDialog):
+    r"""
+    以树的形式显示两个存档的差异，相同前缀的路径合并为同一个节点
+    """
+
+    def __init__(self, parent, old_name: str, new_name: str, changes: list):
+        super().__init__(parent)
+        self.setWindowTitle(f"对比存档: {old_name} → {new_name}")
+        self.resize(900, 600)
+        layout = QVBoxLayout(self)
+
+        summary = f"共 {len(changes)} 处变化"
+        if len(changes) > MAX_CHANGES:
+            summary += f"，只显示前 {MAX_CHANGES} 处"
+        layout.addWidget(QLabel(summary, self))
+
+        self.tree = QTreeWidget(self)
+        self.tree.setHeaderLabels(["字段", "变化", old_name, new_name])
+        self.tree.setColumnWidth(0, 280)
+        self.tree.setColumnWidth(1, 60)
+        self.tree.setColumnWidth(2, 250)
+        layout.addWidget(self.tree)
+        self._build(changes[:MAX_CHANGES])
+
+    def _build(self, changes):
+        nodes = {(): self.tree.invisibleRootItem()}
+        for change in changes:
+            parent = self.tree.invisibleRootItem()
+            for depth in range(1, len(change.path)):
+                prefix = change.path[:depth]
+                node = nodes.get(prefix)
+                if node is None:
+                    node = QTreeWidgetItem(parent, [_key_text(prefix[-1])])
+                    nodes[prefix] = node
+                parent = node
+            key = _key_text(change.path[-1]) if change.path else format_path(())
+            item = QTreeWidgetItem(
+                parent,
+                [
+                    key,
+                    _kind_text[change.kind],
+                    _value_text(change.old),
+                    _value_text(change.new),
+                ],
+            )
+            item.setToolTip(0, format_path(change.path))
+            brush = QBrush(_kind_color[change.kind])
+            for column in range(4):
+                item.setForeground(column, brush)
+        # 变化不多时全部展开
+        if len(changes) <= 200:
+            self.tree.expandAll()
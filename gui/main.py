@@ -1,10 +1,12 @@
 # -*- coding: utf-8 -*-
 from PyQt5.QtWidgets import (
+    QApplication,
     QWidget,
     QMainWindow,
     QHBoxLayout,
-    QTableWidget,
-    QTableWidgetItem,
+    QTableView,
+    QAbstractItemView,
+    QHeaderView,
     QVBoxLayout,
     QFrame,
     QFileDialog,
@@ -12,184 +14,415 @@ from PyQt5.QtWidgets import (
     QPushButton,
     QTextEdit,
     QLabel,
+    QInputDialog,
+    QLineEdit,
+    QComboBox,
 )
-from PyQt5.QtGui import QPixmap, QIcon
-from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QDesktopServices, QPixmap, QIcon
+from PyQt5.QtCore import Qt, QByteArray, QTimer, QUrl, pyqtSignal
+from functools import partial
 import os
-
-import json
-
-from watchdog.observers import Observer
-from watchdog.events import (
-    FileSystemEventHandler,
-    FileCreatedEvent,
-    FileModifiedEvent,
-    FileSystemEvent,
-    FileDeletedEvent,
-)
+import sys
+import time
 
 from util.config import Config
-from datetime import datetime
-import shutil
 import util.logger
 import util.version
-
-_ignore_json = [
-    "global.json",
-    "global.json.bak.json",
-    "user_archive.json",  # 官方存档
-    "over_record_excerpt.json",  # 结局存档
-]
+from gui.save_model import (
+    SaveTableModel,
+    SaveSortProxyModel,
+    COL_NAME,
+    COL_MTIME,
+    COL_CHARACTER,
+    COL_ROUND,
+    COL_DIFFICULTY,
+    COL_SAVETIME,
+)
+from gui.workers import SaveWorkers
+from util.save_index import save_index
+from util.event_coalescer import EventCoalescer, CREATED, MODIFIED, DELETED
+from util.snapshot_store import SnapshotStore
+from util.save_history import SaveHistory
+from gui.profiles import Profile
+from core.library import SaveLibrary, format_save_time, is_save_file, list_profiles
+from core.retention import RetentionPolicy, is_enabled
+from util.fs import local_fs
+from util.record_file import USER_ARCHIVE, OVER_RECORD
+from util.counters import counters
+from util.doc_cache import DocumentCache
+from util.profiler import profiled, profiler
 
 log = util.logger.logger(__name__)
 
 
-class MainWindow(QMainWindow, FileSystemEventHandler):
-    def __init__(self, app):
+def resource_path(name: str) -> str:
+    # 打包后的资源文件在 PyInstaller 的解压目录中
+    return os.path.join(getattr(sys, "_MEIPASS", os.path.abspath(".")), name)
+
+
+def _reverse(order):
+    if order == Qt.AscendingOrder:
+        return Qt.DescendingOrder
+    return Qt.AscendingOrder
+
+
+def _normalize(path):
+    return os.path.normcase(os.path.normpath(path)) if path else None
+
+
+# 没有保存过排序的账号按修改时间倒序
+DEFAULT_SORT_KEYS = [(COL_MTIME, Qt.DescendingOrder)]
+
+
+class MainWindow(QMainWindow):
+    # 监控线程中收到一个窗口内的第一个文件事件时发出，由界面线程安排合并处理
+    events_pending = pyqtSignal()
+    # 后台建立搜索索引的进度: 账号, 已完成数量, 总数
+    index_progress = pyqtSignal(str, int, int)
+    # 存档对比完成: 旧存档路径, 新存档路径, 变化列表, 错误信息
+    diff_ready = pyqtSignal(str, str, object, str)
+    # 批量操作完成: 账号, 操作名称, 成功的路径, 错误信息
+    bulk_done = pyqtSignal(object, str, list, list)
+    # 清理计划计算完成: 账号, 需要删除的路径
+    prune_planned = pyqtSignal(object, list)
+    # 存档包导出或导入完成: 操作名称, 结果, 错误信息
+    archive_done = pyqtSignal(str, object, str)
+    # 存档根目录或账号的配置改变，可能在任意线程中发出
+    save_dir_config_changed = pyqtSignal()
+
+    def __init__(self, app, fs=None):
         super().__init__()
         self.app = app
+        # 存档目录所在的文件系统，所有存档读写都经过它；测试和基准测试可以换成 MemoryFS
+        self.fs = fs or local_fs
+        # 文件事件先在合并器中缓存，窗口结束后整批更新列表
+        self.coalescer = EventCoalescer()
+        self.event_timer = QTimer(self)
+        self.event_timer.setSingleShot(True)
+        self.event_timer.timeout.connect(self.apply_file_events)
+        self.events_pending.connect(self.schedule_file_events)
+        # 去重快照存储
+        self.snapshots = SnapshotStore(
+            compression=Config.getset("snapshot_compression", "zlib")
+        )
+        # 存档历史，开启后记录每次覆盖前后的差异
+        self.history = SaveHistory(
+            keyframe_interval=Config.getset("history_keyframe_interval", 10)
+        )
+        # 解析后的存档，对比存档时使用，空闲时预先读取选中行附近的存档
+        self.doc_cache = DocumentCache(
+            Config.getset("doc_cache_mb", 64) * 1048576, self.fs
+        )
+        self.prefetch_timer = QTimer(self)
+        self.prefetch_timer.setSingleShot(True)
+        self.prefetch_timer.timeout.connect(self.prefetch_neighbors)
+        self.workers = SaveWorkers(self)
+        self.workers.scanned.connect(self.on_scanned)
+        self.workers.headers_loaded.connect(self.on_headers_loaded)
+        self.workers.scan_finished.connect(self.on_scan_finished)
+        self.workers.scan_failed.connect(self.on_scan_failed)
+        self.workers.header_ready.connect(self.on_header_ready)
+        self.index_progress.connect(self.on_index_progress)
+        self.diff_ready.connect(self.show_diff)
+        self.bulk_done.connect(self.on_bulk_done)
+        self.prune_planned.connect(self.confirm_prune)
+        self.archive_done.connect(self.on_archive_done)
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.timeout.connect(self.apply_search)
+        # 所有账号同时加载和监控，当前显示的是 self.profile
+        self.profiles = {}  # steam_id -> Profile
+        self.profile = None
+        self.monitor = None
+        self._closed = False
+        self._auto_pruning = set()  # 正在自动清理的账号，每个账号同时只清理一次
+        self._loaded_root = None  # 已加载的存档根目录
         self.init_ui()
+        self.restore_geometry(Config.get("steam_id"))
+        # 存档根目录或账号改变时（包括其他地方修改配置）重新加载或切换账号
+        self.config_timer = QTimer(self)
+        self.config_timer.setSingleShot(True)
+        self.config_timer.timeout.connect(self.apply_save_dir_config)
+        # 订阅者在调用 Config.set 的线程中执行，通过排队的信号回到界面线程再操作定时器
+        self.save_dir_config_changed.connect(
+            self.schedule_save_dir_config, Qt.QueuedConnection
+        )
+        Config.subscribe("SaveDataDir", self.on_save_dir_config_changed)
+        Config.subscribe("steam_id", self.on_save_dir_config_changed)
+
+        # 先显示窗口，第一次扫描和启动监控放到事件循环开始之后
+        QTimer.singleShot(0, self.init_saves)
+
+    @property
+    def save_dir(self) -> str:
+        return self.profile.save_dir
+
+    @property
+    def library(self) -> SaveLibrary:
+        return self.profile.library
 
-        self.observer = None
-        self.init_saves()
+    @property
+    def save_model(self) -> SaveTableModel:
+        return self.profile.save_model
 
+    @profiled()
     def init_saves(self):
-        if self.observer is not None:
+        r"""
+        加载存档根目录下的所有账号，只在启动和修改存档根目录时调用
+        """
+        if self.monitor is not None:
             # 停止之前的监控
             log.warning("正在停止之前的监控。")
-            self.observer.stop()
-            self.observer.join()
-        # 初始化存档
-        self.save_dir = os.path.join(Config.get("SaveDataDir"), Config.get("steam_id"))
-        self.round_raw_files = []
-        for file in os.listdir(self.save_dir):
-            if file.endswith(".json"):
-                self.round_raw_files.append(os.path.join(self.save_dir, file))
-        log.info(f"找到 {len(self.round_raw_files)} 个存档文件。")
-        # 按照修改时间排序倒序
-        self.round_raw_files.sort(key=lambda x: os.path.getmtime(x), reverse=True)
-        # 然后开始监控
-        self.observer = Observer()
-        self.observer.schedule(self, self.save_dir, recursive=False)
-        self.observer.start()
-        log.info(f"开始监控存档目录: {self.save_dir}")
-        # 刷新存档列表
-        self.refresh_save_list()
-
-    def handle_header_clicked(self, column):
-        # 如果点击的是当前排序列，则反转排序方向
-        if column == self.sort_column:
-            self.sort_order = not self.sort_order
-        else:
-            # 否则设置为新列，默认升序
-            self.sort_column = column
-            self.sort_order = False
-
-        # 根据列类型进行排序
-        if self.sort_column == 0:  # 存档名称(字符串)
-            self.round_raw_files.sort(
-                key=lambda x: os.path.basename(x).lower(), reverse=self.sort_order
-            )
-        else:  # 修改时间(日期)
-            self.round_raw_files.sort(
-                key=lambda x: os.path.getmtime(x), reverse=self.sort_order
+            self.monitor.stop()
+            self.monitor = None
+        for profile in self.profiles.values():
+            # 停止旧账号还在进行的索引
+            profile.search_index.clear()
+        save_data_dir = Config.get("SaveDataDir")
+        self._loaded_root = _normalize(save_data_dir)
+        steam_ids = list_profiles(save_data_dir, self.fs)
+        current = Config.get("steam_id")
+        if current in steam_ids:
+            steam_ids.remove(current)
+        steam_ids.insert(0, current)
+
+        # 每个账号在后台扫描，结果分批加入各自的列表，当前账号最先开始
+        fsync = Config.getset("fsync", True)
+        self.profiles = {}
+        for steam_id in steam_ids:
+            save_dir = os.path.join(save_data_dir, steam_id)
+            profile = Profile(steam_id, save_dir, fsync, self, self.fs)
+            profile.scan_generation = self.workers.scan(profile.library)
+            self.profiles[steam_id] = profile
+        self._profile_of_dir = {
+            os.path.normcase(os.path.normpath(p.save_dir)): p
+            for p in self.profiles.values()
+        }
+        # 索引中其他存档根目录和已删除账号的条目不会再用到
+        save_index.retain_dirs(p.save_dir for p in self.profiles.values())
+        self.profile_combo.blockSignals(True)
+        self.profile_combo.clear()
+        self.profile_combo.addItems(steam_ids)
+        self.profile_combo.blockSignals(False)
+        self.switch_profile(current)
+        # 然后开始监控，watchdog导入较慢，等窗口绘制之后再导入
+        QTimer.singleShot(0, self.start_monitor)
+
+    def start_monitor(self):
+        if self.monitor is not None or self._closed:
+            # 已经在监控，或窗口在启动监控之前就被关闭
+            return
+        if self.fs.local:
+            from gui.monitor import SaveMonitor
+
+            # 所有账号共用监控线程，监控方式见 gui.monitor
+            self.monitor = SaveMonitor(
+                self.push_file_event,
+                Config.get("watch_strategy"),
+                Config.get("watch_poll_interval"),
             )
+        else:
+            # 内存文件系统在写入时直接发出文件事件
+            self.monitor = self.fs.monitor(self.push_file_event, is_save_file)
+        # 先启动再添加目录，无法使用系统通知的目录在添加时就能改用轮询
+        self.monitor.start()
+        for profile in self.profiles.values():
+            if self.fs.isdir(profile.save_dir):
+                self.monitor.watch(profile.save_dir)
+
+    def on_save_dir_config_changed(self, key, value):
+        self.save_dir_config_changed.emit()
+
+    def schedule_save_dir_config(self):
+        # 两个配置项常常一起修改，合并到事件循环中处理一次
+        self.config_timer.start(0)
+
+    def apply_save_dir_config(self):
+        r"""
+        按配置中的存档根目录和账号更新窗口：根目录变了或账号还没有加载时重新加载，
+        否则直接切换账号
+        """
+        steam_id = Config.get("steam_id")
+        if (
+            _normalize(Config.get("SaveDataDir")) != self._loaded_root
+            or steam_id not in self.profiles
+        ):
+            self.init_saves()
+        else:
+            self.switch_profile(steam_id)
+
+    def switch_profile(self, steam_id):
+        r"""
+        切换当前显示的账号，直接换用常驻内存的列表和索引
+        """
+        profile = self.profiles.get(steam_id)
+        if profile is None or profile is self.profile:
+            return
+        self.profile = profile
+        Config.set("steam_id", steam_id)
+        self.proxy_model.setSourceModel(profile.save_model)
+        self.restore_view(steam_id)
+        self.setWindowTitle(f"苏丹的存档（{steam_id}）")
+        self.profile_combo.setCurrentText(steam_id)
+        self.save_info_text.clear()
+        self.start_index(profile)
+        self.apply_search()
+        log.info(f"切换到账号: {steam_id}")
+
+    def profile_of_path(self, file_path: str):
+        return self._profile_of_dir.get(
+            os.path.normcase(os.path.normpath(os.path.dirname(file_path)))
+        )
 
-        self.refresh_save_list()
+    def profile_of_generation(self, generation: int):
+        for profile in self.profiles.values():
+            if profile.scan_generation == generation:
+                return profile
+        # 旧目录的扫描结果
+        return None
+
+    def on_header_ready(self, save_path, header, error):
+        # 后台解析出的头部信息同时更新列表中的记录
+        profile = self.profile_of_path(save_path)
+        if header is not None and profile is not None:
+            profile.save_model.set_header(save_path, header)
+        self.show_save_info(save_path, header, error)
+
+    @profiled()
+    def on_scanned(self, generation, records):
+        profile = self.profile_of_generation(generation)
+        if profile is not None:
+            profile.save_model.add_records(records)
+
+    def on_headers_loaded(self, generation, headers):
+        profile = self.profile_of_generation(generation)
+        if profile is not None:
+            profile.save_model.set_headers(headers)
+
+    def on_scan_finished(self, generation, count):
+        profile = self.profile_of_generation(generation)
+        if profile is None:
+            return
+        log.info(f"账号 {profile.steam_id} 找到 {count} 个存档文件。")
+        profile.scanned = True
+        if profile is self.profile:
+            self.start_index(profile)
+
+    def on_scan_failed(self, generation, error):
+        profile = self.profile_of_generation(generation)
+        if profile is None:
+            return
+        log.error(f"扫描存档目录失败: {error}")
+        if profile is self.profile:
+            QMessageBox.warning(self, "错误", f"扫描存档目录失败: {error}")
+
+    def start_index(self, profile):
+        r"""
+        为账号的全部存档建立搜索索引，只在扫描完成后、账号第一次显示时开始一次
+        """
+        if profile.scanned and not profile.indexed:
+            profile.indexed = True
+            self.index_files(profile, profile.save_model.paths())
+
+    def index_files(self, profile, paths):
+        # 在后台为账号的一批存档建立搜索索引
+        self.workers.submit(
+            profile.search_index.build,
+            paths,
+            profile.search_index.generation,
+            lambda done, total: self.index_progress.emit(profile.steam_id, done, total),
+        )
 
-    def refresh_save_list(self):
-        # 刷新存档列表
-        self.table_widget.setRowCount(0)
-        for file_path in self.round_raw_files:
-            if (
-                file_path.endswith(".json")
-                and os.path.basename(file_path) not in _ignore_json
-            ):
-                file_name = os.path.basename(file_path)
-                display_name = os.path.splitext(file_name)[0]
-                mod_time = os.path.getmtime(file_path)
-                time_str = datetime.fromtimestamp(mod_time).strftime(
-                    "%Y-%m-%d %H:%M:%S"
-                )
+    def schedule_file_events(self):
+        if not self.event_timer.isActive():
+            self.event_timer.start(Config.getset("event_debounce_ms", 300))
 
-                row = self.table_widget.rowCount()
-                self.table_widget.insertRow(row)
-
-                # 添加存档名称
-                name_item = QTableWidgetItem(display_name)
-                name_item.setData(1, file_path)  # 保持文件路径存储方式不变
-                self.table_widget.setItem(row, 0, name_item)
-
-                # 添加修改时间
-                time_item = QTableWidgetItem(time_str)
-                self.table_widget.setItem(row, 1, time_item)
-
-    def __del__(self):
-        log.info("正在关闭监控。")
-        self.observer.stop()
-        self.observer.join()
-
-    def on_created(self, event):
-        log.debug(f"触发了创建事件: {type(event)}")
-        if not isinstance(event, FileCreatedEvent):
-            # 忽略非文件创建事件
-            return
-        log.info(f"创建文件: {event.src_path}")
-        # if os.path.basename(event.src_path) == "auto_save.json":
-        #     self.on_auto_save(self)
-        #     return
-        if os.path.basename(
-            event.src_path
-        ) not in _ignore_json and event.src_path.endswith(".json"):
-            # 如果是回合存档文件，在列表最前面增加
-            self.round_raw_files.insert(0, event.src_path)
-            # 刷新存档列表
-            self.refresh_save_list()
-
-    def on_modified(self, event):
-        log.debug(f"触发了修改事件: {type(event)}")
-        if not isinstance(event, FileModifiedEvent):
-            # 忽略非文件创建事件
-            return
-        log.info(f"修改文件: {event.src_path}")
-        # if os.path.basename(event.src_path) == "auto_save.json":
-        #     self.on_auto_save(self)
-        #     return
-        if os.path.basename(
-            event.src_path
-        ) not in _ignore_json and event.src_path.endswith(".json"):
-            # 按照修改时间排序倒序，找到列表中对应文件的位置并置顶
-            self.round_raw_files.remove(event.src_path)
-            self.round_raw_files.insert(0, event.src_path)
-            # 刷新存档列表
-            self.refresh_save_list()
-
-    def on_deleted(self, event):
-        log.debug(f"触发了删除事件: {type(event)}")
-        if not isinstance(event, FileDeletedEvent):
-            # 忽略非文件删除事件
-            return
-        log.warning(f"删除文件: {event.src_path}")
-        if os.path.basename(
-            event.src_path
-        ) not in _ignore_json and event.src_path.endswith(".json"):
-            # 从列表中移除被删除的文件
-            if event.src_path in self.round_raw_files:
-                self.round_raw_files.remove(event.src_path)
-            # 刷新存档列表
-            self.refresh_save_list()
+    @profiled()
+    def apply_file_events(self):
+        # 在界面线程中把合并后的变化一次性应用到各账号的存档列表
+        changes = self.coalescer.drain()
+        if not changes:
+            return
+        counters.add("events_applied", len(changes))
+        log.debug(
+            "合并文件事件: 收到 %d 个，合并 %d 个，本次应用 %d 个",
+            self.coalescer.received,
+            self.coalescer.coalesced,
+            len(changes),
+        )
+        changed = {}  # Profile -> [文件路径]
+        for file_path, change in changes.items():
+            profile = self.profile_of_path(file_path)
+            if profile is None:
+                continue
+            self.doc_cache.invalidate(file_path)
+            if change == DELETED and self.fs.exists(file_path):
+                # 轮询监控按inode推断移动，原子替换后inode被复用时会把仍存在的文件报告为删除
+                change = MODIFIED
+            if change == DELETED:
+                save_index.discard(file_path)
+                profile.search_index.discard(file_path)
+                profile.save_model.remove_file(file_path)
+                continue
+            if change == CREATED:
+                profile.save_model.add_file(file_path)
+            else:
+                profile.save_model.update_file(file_path)
+            changed.setdefault(profile, []).append(file_path)
+            if profile.save_model.header_of(file_path) is None:
+                # 新的或被修改的存档在后台重新解析头部，填充回合、难度等列
+                self.workers.load_header(file_path, self.fs)
+            if Config.get("history_enabled", False):
+                self.workers.submit(
+                    self.history.capture, profile.steam_id, file_path, self.fs
+                )
+        policy = self.retention_policy()
+        auto_prune = Config.get("retention_auto", False) and is_enabled(policy)
+        for profile, paths in changed.items():
+            if profile.indexed:
+                # 还没有建立索引的账号在第一次显示时一起建立
+                self.index_files(profile, paths)
+            if auto_prune:
+                self.schedule_auto_prune(profile, policy)
+        if self.profile not in changed:
+            self.apply_search()
+
+    def push_file_event(self, kind, file_path):
+        # 在监控线程中调用，只做记录
+        if self.coalescer.push(kind, file_path):
+            self.events_pending.emit()
+
+    def on_index_progress(self, steam_id, done, total):
+        if self.profile is None or steam_id != self.profile.steam_id:
+            return
+        # 索引有变化时刷新当前的搜索结果
+        self.apply_search()
+        if done < total:
+            status = f"{self.search_status.text()} 正在建立索引 {done}/{total}"
+            self.search_status.setText(status.strip())
+
+    def schedule_search(self):
+        self.search_timer.start(150)
+
+    def apply_search(self):
+        query = self.search_input.text().strip()
+        if not query or self.profile is None:
+            self.proxy_model.set_filter_paths(None)
+            self.search_status.setText("")
+            return
+        start = time.perf_counter()
+        paths = self.profile.search_index.search(query)
+        elapsed = (time.perf_counter() - start) * 1000
+        self.proxy_model.set_filter_paths(paths)
+        self.search_status.setText(f"找到 {len(paths)} 个（{elapsed:.1f} ms）")
 
     def init_ui(self):
         # 窗口初始化
         self.setGeometry(100, 100, 800, 600)
-        self.setWindowTitle(f"苏丹的存档（{Config.get('steam_id')}）")
+        self.setWindowTitle("苏丹的存档")
 
-        # 设置窗口图标
-        self.setWindowIcon(QIcon("logo.png"))
-
-        # 排序状态
-        self.sort_column = 0
-        self.sort_order = False  # False=升序, True=降序
+        # 设置窗口图标，使用已经缩放好多种尺寸的ico，比加载大尺寸png快
+        self.setWindowIcon(QIcon(resource_path("logo.ico")))
 
         self.init_menu()
         self.init_content()
@@ -205,20 +438,63 @@ class MainWindow(QMainWindow, FileSystemEventHandler):
         layout = QHBoxLayout(central_widget)
         central_widget.setLayout(layout)
 
-        # 左侧表格区域
-        self.table_widget = QTableWidget(central_widget)
-        self.table_widget.setColumnCount(2)
-        self.table_widget.setHorizontalHeaderLabels(["存档名称", "修改时间"])
-        self.table_widget.setColumnWidth(0, 200)  # 存档名称
-        self.table_widget.setColumnWidth(1, 100)  # 修改时间
-        self.table_widget.horizontalHeader().setStretchLastSection(True)
-        self.table_widget.horizontalHeader().sectionClicked.connect(
-            self.handle_header_clicked
-        )
-        self.table_widget.setSelectionBehavior(QTableWidget.SelectRows)
-        self.table_widget.setEditTriggers(QTableWidget.NoEditTriggers)  # 设置为只读模式
-        self.table_widget.itemSelectionChanged.connect(self.update_save_info)
-        layout.addWidget(self.table_widget, 1)
+        # 左侧表格区域，数据来自当前账号的列表模型
+        self.proxy_model = SaveSortProxyModel(self)
+
+        left_layout = QVBoxLayout()
+        layout.addLayout(left_layout, 1)
+
+        # 账号选择和搜索框
+        search_layout = QHBoxLayout()
+        self.profile_combo = QComboBox(central_widget)
+        self.profile_combo.setToolTip("切换账号（steam_id）")
+        self.profile_combo.currentTextChanged.connect(self.switch_profile)
+        search_layout.addWidget(self.profile_combo)
+        self.search_input = QLineEdit(central_widget)
+        self.search_input.setPlaceholderText(
+            "搜索: 文字  角色:名字  难度:2  回合:10-20  时间:2025-04"
+        )
+        self.search_input.setClearButtonEnabled(True)
+        self.search_input.textChanged.connect(self.schedule_search)
+        search_layout.addWidget(self.search_input, 1)
+        self.search_status = QLabel(central_widget)
+        search_layout.addWidget(self.search_status)
+        left_layout.addLayout(search_layout)
+
+        self.table_view = QTableView(central_widget)
+        self.table_view.setModel(self.proxy_model)
+        self.table_view.setColumnWidth(COL_NAME, 200)
+        self.table_view.setColumnWidth(COL_MTIME, 140)
+        self.table_view.setColumnWidth(COL_CHARACTER, 80)
+        self.table_view.setColumnWidth(COL_ROUND, 50)
+        self.table_view.setColumnWidth(COL_DIFFICULTY, 50)
+        self.table_view.setColumnWidth(COL_SAVETIME, 140)
+        header_view = self.table_view.horizontalHeader()
+        header_view.setStretchLastSection(True)
+        # 列宽保存在当前账号的配置中
+        header_view.sectionResized.connect(self.save_column_widths)
+        # 所有行等高且不换行，视图按行号直接算出可见范围，只为可见的行取数据，
+        # 几万个存档时滚动也不需要逐行测量高度
+        vertical_header = self.table_view.verticalHeader()
+        vertical_header.setVisible(False)
+        vertical_header.setSectionResizeMode(QHeaderView.Fixed)
+        vertical_header.setDefaultSectionSize(self.fontMetrics().height() + 8)
+        self.table_view.setWordWrap(False)
+        # 排序交给代理模型，表头点击自己处理以支持按住Ctrl追加排序列
+        header_view.setSectionsClickable(True)
+        header_view.setSortIndicatorShown(True)
+        header_view.setToolTip("点击按该列排序，按住Ctrl点击追加排序列")
+        header_view.sectionClicked.connect(self.handle_header_clicked)
+        # 默认按修改时间倒序，加载账号后换成该账号上次的排序
+        self.table_view.sortByColumn(*DEFAULT_SORT_KEYS[0])
+        self.table_view.setSelectionBehavior(QAbstractItemView.SelectRows)
+        # 按住Ctrl可以选择两个存档进行对比
+        self.table_view.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.table_view.setEditTriggers(QAbstractItemView.NoEditTriggers)  # 设置为只读模式
+        self.table_view.selectionModel().selectionChanged.connect(
+            self.update_save_info
+        )
+        left_layout.addWidget(self.table_view)
 
         # 右侧内容区域
         self.content_frame = QFrame(central_widget)
@@ -239,6 +515,10 @@ class MainWindow(QMainWindow, FileSystemEventHandler):
         self.rename_btn_top = QPushButton("另存为", self.content_frame)
         self.rename_btn_top.clicked.connect(self.rename_save_from_input)
         rename_layout.addWidget(self.rename_btn_top)
+
+        self.snapshot_btn = QPushButton("存为快照", self.content_frame)
+        self.snapshot_btn.clicked.connect(self.snapshot_save_from_input)
+        rename_layout.addWidget(self.snapshot_btn)
         content_layout.addLayout(rename_layout)
 
         # 存档信息显示区域
@@ -255,8 +535,23 @@ class MainWindow(QMainWindow, FileSystemEventHandler):
         self.delete_btn = QPushButton("删除存档", self.content_frame)
         self.delete_btn.clicked.connect(self.delete_save)
         btn_layout.addWidget(self.delete_btn)
+
+        self.compare_btn = QPushButton("对比存档", self.content_frame)
+        self.compare_btn.clicked.connect(self.compare_saves)
+        btn_layout.addWidget(self.compare_btn)
         content_layout.addLayout(btn_layout)
 
+        # 批量操作，按住Ctrl或Shift可以选择多个存档
+        bulk_layout = QHBoxLayout()
+        self.export_btn = QPushButton("导出存档", self.content_frame)
+        self.export_btn.clicked.connect(self.export_saves)
+        bulk_layout.addWidget(self.export_btn)
+
+        self.archive_btn = QPushButton("归档到快照", self.content_frame)
+        self.archive_btn.clicked.connect(self.archive_saves)
+        bulk_layout.addWidget(self.archive_btn)
+        content_layout.addLayout(bulk_layout)
+
         # 添加拉伸使按钮在上方
         content_layout.addStretch()
 
@@ -273,38 +568,182 @@ class MainWindow(QMainWindow, FileSystemEventHandler):
         self.open_save_dir_action = self.file_menu.addAction("打开存档目录")
         self.open_save_dir_action.triggered.connect(self.open_save_dir)
 
+        # 存档包
+        self.file_menu.addSeparator()
+        self.export_archive_action = self.file_menu.addAction("导出存档包")
+        self.export_archive_action.triggered.connect(self.export_archive)
+        self.import_archive_action = self.file_menu.addAction("导入存档包")
+        self.import_archive_action.triggered.connect(self.import_archive)
+        self.file_menu.addSeparator()
+        self.user_archive_action = self.file_menu.addAction("官方存档")
+        self.user_archive_action.triggered.connect(
+            lambda: self.show_records(USER_ARCHIVE, "官方存档")
+        )
+        self.over_record_action = self.file_menu.addAction("结局记录")
+        self.over_record_action.triggered.connect(
+            lambda: self.show_records(OVER_RECORD, "结局记录")
+        )
+        self.store_record_action = self.file_menu.addAction("存入官方存档")
+        self.store_record_action.triggered.connect(self.store_record)
+
+        # 快照
+        self.snapshot_menu = self.menu_bar.addMenu("快照")
+        self.load_snapshot_action = self.snapshot_menu.addAction("加载快照")
+        self.load_snapshot_action.triggered.connect(self.load_snapshot)
+        self.delete_snapshot_action = self.snapshot_menu.addAction("删除快照")
+        self.delete_snapshot_action.triggered.connect(self.delete_snapshot)
+        self.snapshot_stats_action = self.snapshot_menu.addAction("快照统计")
+        self.snapshot_stats_action.triggered.connect(self.snapshot_stats)
+
+        # 历史
+        self.history_menu = self.menu_bar.addMenu("历史")
+        self.history_enabled_action = self.history_menu.addAction("自动记录历史")
+        self.history_enabled_action.setCheckable(True)
+        self.history_enabled_action.setChecked(Config.get("history_enabled", False))
+        self.history_enabled_action.toggled.connect(
+            lambda checked: Config.set("history_enabled", checked)
+        )
+        self.restore_history_action = self.history_menu.addAction("恢复历史版本")
+        self.restore_history_action.triggered.connect(self.restore_history)
+
+        # 清理
+        self.retention_menu = self.menu_bar.addMenu("清理")
+        self.edit_retention_action = self.retention_menu.addAction("清理策略")
+        self.edit_retention_action.triggered.connect(self.edit_retention)
+        self.prune_now_action = self.retention_menu.addAction("立即清理")
+        self.prune_now_action.triggered.connect(self.prune_now)
+
         # 关于
         self.about_menu = self.menu_bar.addMenu("关于")
         self.about_action = self.about_menu.addAction("关于")
         self.about_action.triggered.connect(self.about)
+        self.counters_action = self.about_menu.addAction("运行统计")
+        self.counters_action.triggered.connect(self.show_counters)
+        self.perf_action = self.about_menu.addAction("性能")
+        self.perf_action.triggered.connect(self.show_perf)
 
     def about(self):
         # 关于对话框
         QMessageBox.about(self, "关于", util.version.about_text())
 
+    def show_perf(self):
+        from gui.perf_dialog import PerfDialog
+
+        PerfDialog(self, profiler).exec_()
+
+    def show_counters(self):
+        # 显示文件事件、头部解析等计数，同时写入日志
+        log.info("存档缓存: %s", self.doc_cache.stats_text())
+        text = counters.dump(log) or "暂无统计"
+        text += f"\n存档缓存: {self.doc_cache.stats_text()}"
+        QMessageBox.information(self, "运行统计", text)
+
     def open_save_dir(self):
         # 打开存档目录
-        if hasattr(self, "save_dir") and os.path.exists(self.save_dir):
-            os.startfile(self.save_dir)
-        else:
+        if self.profile is None or not self.fs.exists(self.save_dir):
             QMessageBox.warning(self, "警告", "存档目录不存在或未初始化")
+        elif not self.fs.local:
+            QMessageBox.warning(self, "警告", "存档目录不在本地磁盘上，无法打开")
+        elif not QDesktopServices.openUrl(QUrl.fromLocalFile(self.save_dir)):
+            # 交给系统的文件管理器（Windows资源管理器、xdg-open、Finder）
+            QMessageBox.warning(self, "警告", "无法打开存档目录")
 
-    def get_choiced_save_path(self) -> str:
-        selected = self.table_widget.currentItem()
-        if not selected:
-            self.save_info_text.clear()
-            self.rename_input.clear()
-            return None
+    def handle_header_clicked(self, column):
+        r"""
+        点击表头按该列排序，再次点击反转顺序；
+        按住Ctrl点击时把该列追加为次要排序列（已在排序列中时反转其顺序）
+        """
+        keys = self.proxy_model.sort_keys()
+        orders = dict(keys)
+        # 时间默认最新的在前，其他列默认升序
+        default = (
+            Qt.DescendingOrder
+            if column in (COL_MTIME, COL_SAVETIME)
+            else Qt.AscendingOrder
+        )
+        if QApplication.keyboardModifiers() & Qt.ControlModifier and keys:
+            if column in orders:
+                keys = [(c, _reverse(o) if c == column else o) for c, o in keys]
+            else:
+                keys.append((column, default))
+        elif len(keys) == 1 and column in orders:
+            keys = [(column, _reverse(orders[column]))]
+        else:
+            keys = [(column, default)]
+        self.set_sort_keys(keys)
+        if self.profile is not None:
+            Config.set_profile(
+                self.profile.steam_id,
+                "sort_keys",
+                [[column, int(order)] for column, order in keys],
+            )
 
+    def set_sort_keys(self, keys):
+        self.proxy_model.set_sort_keys(keys)
+        self.table_view.horizontalHeader().setSortIndicator(*keys[0])
+
+    def restore_view(self, steam_id):
+        r"""
+        恢复账号上次的排序和列宽，配置中的值无效时使用默认值
+        """
+        keys = []
+        for item in Config.get_profile(steam_id, "sort_keys") or []:
+            if (
+                isinstance(item, list)
+                and len(item) == 2
+                and item[0] in range(self.proxy_model.columnCount())
+                and item[1] in (Qt.AscendingOrder, Qt.DescendingOrder)
+            ):
+                keys.append((item[0], Qt.SortOrder(item[1])))
+        self.set_sort_keys(keys or DEFAULT_SORT_KEYS)
+        widths = Config.get_profile(steam_id, "column_widths") or []
+        # 最后一列自动拉伸，不恢复
+        for column, width in enumerate(widths[: self.proxy_model.columnCount() - 1]):
+            if isinstance(width, int) and width > 0:
+                self.table_view.setColumnWidth(column, width)
+
+    def save_column_widths(self, *_):
+        if self.profile is None:
+            return
+        header_view = self.table_view.horizontalHeader()
+        Config.set_profile(
+            self.profile.steam_id,
+            "column_widths",
+            [header_view.sectionSize(i) for i in range(header_view.count())],
+        )
+
+    def restore_geometry(self, steam_id):
+        geometry = Config.get_profile(steam_id, "geometry") if steam_id else None
+        if geometry:
+            self.restoreGeometry(QByteArray.fromBase64(geometry.encode("ascii")))
+
+    def closeEvent(self, event):
+        # 关闭时记下窗口位置，不再响应配置变化
+        if self.profile is not None:
+            geometry = bytes(self.saveGeometry().toBase64()).decode("ascii")
+            Config.set_profile(self.profile.steam_id, "geometry", geometry)
+        Config.unsubscribe("SaveDataDir", self.on_save_dir_config_changed)
+        Config.unsubscribe("steam_id", self.on_save_dir_config_changed)
+        self._closed = True
+        # 停止监控线程，等待后台扫描、解析和批量操作结束，不在退出时留下写了一半的文件
+        if self.monitor is not None:
+            log.info("正在关闭监控。")
+            self.monitor.stop()
+            self.monitor = None
+        self.event_timer.stop()
+        self.workers.wait()
+        super().closeEvent(event)
+
+    def get_choiced_save_path(self) -> str:
         # 获取选中的存档路径
-        row = selected.row()
-        save_path = self.table_widget.item(row, 0).data(1)
+        save_path = self.proxy_model.path_at(self.table_view.currentIndex())
         if not save_path:
             self.save_info_text.clear()
             self.rename_input.clear()
             return None
         return save_path
 
+    @profiled()
     def update_save_info(self):
         # 更新存档信息
         save_path = self.get_choiced_save_path()
@@ -315,39 +754,78 @@ class MainWindow(QMainWindow, FileSystemEventHandler):
             save_name = file_name[:-5]  # 去掉.json后缀
             self.rename_input.setPlainText(save_name)
 
-        try:
-            with open(save_path, "r", encoding="utf8") as f:
-                save_data = json.load(f)
-            log.debug(f"读取存档: {save_path}")
-
-            character_name = save_data.get("name", "未知")
-            difficulty = save_data.get("difficulty", "未知")
-            current_round = save_data.get("round", "未知")
-            save_time_str = save_data.get("saveTime", "")
+        # 停止移动选择一段时间后预读附近的存档
+        self.prefetch_timer.start(Config.getset("prefetch_delay_ms", 500))
+        header = self.save_model.header_of(save_path)
+        if header is None:
+            # 头部还没有解析时，预读过的存档可以直接使用
+            header = self.doc_cache.peek(save_path)
+        if header is not None:
+            self.show_save_info(save_path, header, "")
+            return
+        # 在后台读取头部信息，结果由 on_header_ready 显示
+        self.save_info_text.setPlainText("正在读取存档信息...")
+        self.workers.load_header(save_path, self.fs)
+
+    def prefetch_neighbors(self):
+        r"""
+        在后台把对比存档要用的完整存档读入缓存
+
+        选中两个存档时预读这两个存档；prefetch_neighbors 大于0时（默认关闭）
+        另外预读当前行上下相邻的存档，由近到远
+        """
+        current = self.table_view.currentIndex()
+        if not current.isValid():
+            return
+        paths = self.selected_paths()
+        if len(paths) != 2:
+            paths = []
+        count = Config.get("prefetch_neighbors")
+        if count > 0:
+            rows = [current.row()]
+            for distance in range(1, count + 1):
+                rows += [current.row() - distance, current.row() + distance]
+            paths += [
+                self.proxy_model.path_at(self.proxy_model.index(row, 0))
+                for row in rows
+                if 0 <= row < self.proxy_model.rowCount()
+            ]
+        paths = [path for path in dict.fromkeys(paths) if path]
+        if paths:
+            self.workers.submit(self._prefetch, paths)
+
+    def _prefetch(self, paths):
+        # 在后台线程中执行
+        for path in paths:
             try:
-                if save_time_str:
-                    save_time_dt = datetime.fromisoformat(
-                        save_time_str.replace("Z", "+00:00")
-                    )
-                    save_time = save_time_dt.strftime("%Y-%m-%d %H:%M:%S")
-                else:
-                    save_time = "未知"
-            except ValueError:
-                save_time = "未知"
-
-            info_text = f"""存档详细信息:
+                self.doc_cache.load(path)
+            except (OSError, ValueError):
+                continue
+        log.debug("存档缓存: %s", self.doc_cache.stats_text())
+
+    def show_save_info(self, save_path, save_data, error):
+        if save_path != self.proxy_model.path_at(self.table_view.currentIndex()):
+            # 选择已经变化，丢弃过期的结果
+            return
+        if save_data is None:
+            self.save_info_text.setPlainText(f"读取存档信息失败: {error}")
+            return
+
+        character_name = save_data.get("name", "未知")
+        difficulty = save_data.get("difficulty", "未知")
+        current_round = save_data.get("round", "未知")
+        save_time = format_save_time(save_data.get("saveTime", ""))
+
+        info_text = f"""存档详细信息:
 主角名: {character_name}
 游戏难度: {difficulty}
 当前回合: {current_round}
 保存时间: {save_time}
 """
-            self.save_info_text.setPlainText(info_text)
-        except Exception as e:
-            self.save_info_text.setPlainText(f"读取存档信息失败: {str(e)}")
+        self.save_info_text.setPlainText(info_text)
 
     def rename_save_from_input(self):
-        selected = self.table_widget.currentItem()
-        if not selected:
+        if not self.table_view.currentIndex().isValid():
             QMessageBox.warning(self, "警告", "请先选择要另存为的存档")
             return
 
@@ -357,10 +835,10 @@ class MainWindow(QMainWindow, FileSystemEventHandler):
             return
 
         old_path = self.get_choiced_save_path()
-        new_path = os.path.join(os.path.dirname(old_path), f"{new_name}.json")
+        new_path = self.library.resolve(new_name)
 
         # 检查文件是否已存在
-        if os.path.exists(new_path):
+        if self.fs.exists(new_path):
             reply = QMessageBox.question(
                 self,
                 "确认",
@@ -372,81 +850,505 @@ class MainWindow(QMainWindow, FileSystemEventHandler):
                 return
 
         try:
-            # 复制而不是重命名文件
-            with open(old_path, "r", encoding="utf-8") as src:
-                data = src.read()
-            with open(new_path, "w", encoding="utf-8") as dst:
-                dst.write(data)
+            self.library.save_as(old_path, new_name, overwrite=True)
 
-            self.init_saves()  # 刷新列表
+            self.save_model.add_file(new_path)  # 刷新列表
             QMessageBox.information(self, "成功", "存档另存为成功")
             self.rename_input.clear()
         except Exception as e:
             QMessageBox.warning(self, "错误", f"另存为失败: {str(e)}")
 
+    def run_load(self, load, what="存档"):
+        r"""
+        执行加载操作 load()，返回False表示已经在游戏中，不提示
+        """
+        try:
+            if not load():
+                return  # 如果已经在游戏中，则不修改
+            QMessageBox.information(self, "成功", f"{what}已加载")
+        except Exception as e:
+            QMessageBox.warning(self, "错误", f"加载{what}失败: {str(e)}")
+
+    @profiled()
     def load_save(self):
-        selected = self.table_widget.currentItem()
-        if not selected:
+        if not self.table_view.currentIndex().isValid():
+            return
+
+        save_path = self.get_choiced_save_path()
+        self.run_load(lambda: self.library.load(save_path))
+
+    def snapshot_save_from_input(self):
+        save_path = self.get_choiced_save_path()
+        if not save_path:
+            QMessageBox.warning(self, "警告", "请先选择要保存为快照的存档")
+            return
+
+        name = self.rename_input.toPlainText().strip()
+        if not name:
+            QMessageBox.warning(self, "警告", "请输入快照名")
+            return
+
+        profile = Config.get("steam_id")
+        if any(m["name"] == name for m in self.snapshots.list(profile)):
+            reply = QMessageBox.question(
+                self,
+                "确认",
+                "同名快照已存在，是否覆盖？",
+                QMessageBox.Yes | QMessageBox.No,
+                QMessageBox.No,
+            )
+            if reply == QMessageBox.No:
+                return
+
+        try:
+            self.snapshots.put(profile, name, save_path, self.fs)
+            QMessageBox.information(self, "成功", "快照保存成功")
+            self.rename_input.clear()
+        except Exception as e:
+            QMessageBox.warning(self, "错误", f"保存快照失败: {str(e)}")
+
+    def choose_snapshot(self, title) -> str:
+        r"""
+        弹出快照选择框，返回快照名，取消时返回None
+        """
+        manifests = self.snapshots.list(Config.get("steam_id"))
+        if not manifests:
+            QMessageBox.information(self, title, "还没有快照")
+            return None
+        labels = [
+            f"{m['name']}（第{m['header'].get('round', '?')}回合，{m['created']}）"
+            for m in manifests
+        ]
+        label, ok = QInputDialog.getItem(self, title, "选择快照", labels, 0, False)
+        if not ok:
+            return None
+        return manifests[labels.index(label)]["name"]
+
+    def load_snapshot(self):
+        name = self.choose_snapshot("加载快照")
+        if name is None:
             return
+        # 把快照还原到auto_save.json
+        profile = Config.get("steam_id")
+        self.run_load(
+            lambda: self.library.load_with(
+                lambda dest: self.snapshots.materialize(
+                    profile, name, dest, fsync=self.library.fsync, fs=self.fs
+                )
+            ),
+            "快照",
+        )
 
+    def restore_history(self):
         save_path = self.get_choiced_save_path()
-        save_dir = os.path.dirname(save_path)
+        if not save_path:
+            QMessageBox.warning(self, "警告", "请先选择要恢复历史的存档")
+            return
+        save_name = os.path.splitext(os.path.basename(save_path))[0]
+        versions = self.history.versions(Config.get("steam_id"), save_name)
+        if not versions:
+            QMessageBox.information(self, "恢复历史版本", "这个存档还没有历史记录")
+            return
+        versions.reverse()
+        labels = [
+            f"v{v['version']}（第{v['round']}回合，{v['time']}）" for v in versions
+        ]
+        label, ok = QInputDialog.getItem(
+            self, "恢复历史版本", "选择版本", labels, 0, False
+        )
+        if not ok:
+            return
+        version = versions[labels.index(label)]["version"]
+
+        def load():
+            save_data = self.history.restore(Config.get("steam_id"), save_name, version)
+            return self.library.load_data(save_data)
+
+        # 和加载存档一样写入auto_save.json
+        self.run_load(load, "历史版本")
 
+    def delete_snapshot(self):
+        name = self.choose_snapshot("删除快照")
+        if name is None:
+            return
         try:
-            # 使用shutil直接复制文件到auto_save.json
-            auto_save_path = os.path.join(save_dir, "auto_save.json")
-            shutil.copy2(save_path, auto_save_path)
-
-            # 修改global.json
-            global_path = os.path.join(save_dir, "global.json")
-            if os.path.exists(global_path):
-                with open(global_path, "r+", encoding="utf-8") as f:
-                    global_data = json.load(f)
-                    if global_data["inGame"] == True:
-                        return  # 如果已经在游戏中，则不修改
-                    # 修改global.json中的inGame字段
-                    global_data["inGame"] = True
-                    f.seek(0)
-                    json.dump(global_data, f, ensure_ascii=False)
-                    f.truncate()
-
-            QMessageBox.information(self, "成功", "存档已加载")
+            self.snapshots.delete(Config.get("steam_id"), name)
+            # 删除不再被引用的数据块
+            self.snapshots.gc()
         except Exception as e:
-            QMessageBox.warning(self, "错误", f"加载存档失败: {str(e)}")
+            QMessageBox.warning(self, "错误", f"删除快照失败: {str(e)}")
+
+    def snapshot_stats(self):
+        stats = self.snapshots.stats()
+        QMessageBox.information(
+            self,
+            "快照统计",
+            f"""快照数量: {stats["snapshots"]}
+数据块数量: {stats["objects"]}
+原始大小: {stats["logical_bytes"] / 1048576:.2f} MB
+实际占用: {stats["stored_bytes"] / 1048576:.2f} MB
+去重压缩比: {stats["dedup_ratio"]:.1f}x
+""",
+        )
+
+    def compare_saves(self):
+        rows = self.table_view.selectionModel().selectedRows()
+        if len(rows) != 2:
+            QMessageBox.warning(self, "错误", "请按住Ctrl选择两个存档进行对比。")
+            return
+        paths = [self.proxy_model.path_at(index) for index in rows]
+        try:
+            # 较早的存档作为旧版本
+            paths.sort(key=lambda path: self.fs.stat(path).st_mtime)
+        except OSError as e:
+            QMessageBox.warning(self, "错误", f"读取存档失败: {e}")
+            return
+        self.compare_btn.setEnabled(False)
+        self.workers.submit(self._run_diff, *paths)
+
+    def _run_diff(self, old_path, new_path):
+        # 在后台线程中执行
+        from util.json_diff import diff
+
+        try:
+            old = self.doc_cache.load(old_path)
+            changes = diff(old, self.doc_cache.load(new_path))
+        except Exception as e:
+            self.diff_ready.emit(old_path, new_path, None, str(e))
+            return
+        self.diff_ready.emit(old_path, new_path, changes, "")
+
+    def show_diff(self, old_path, new_path, changes, error):
+        from gui.diff_dialog import DiffDialog
+
+        self.compare_btn.setEnabled(True)
+        if error:
+            QMessageBox.warning(self, "错误", f"对比存档失败: {error}")
+            return
+        old_name = os.path.splitext(os.path.basename(old_path))[0]
+        new_name = os.path.splitext(os.path.basename(new_path))[0]
+        DiffDialog(self, old_name, new_name, changes).show()
+
+    def selected_paths(self) -> list:
+        return [
+            self.proxy_model.path_at(index)
+            for index in self.table_view.selectionModel().selectedRows()
+        ]
+
+    def run_bulk(self, action, paths, func):
+        r"""
+        在后台对每个存档执行 func(路径)，全部完成后由 on_bulk_done 一次性更新列表
+        """
+        self.set_bulk_enabled(False)
+        self.workers.submit(self._bulk_task, self.profile, action, paths, func)
+
+    def _bulk_task(self, profile, action, paths, func):
+        # 在后台线程中执行，单个存档失败不影响其他存档
+        done = []
+        errors = []
+        for path in paths:
+            try:
+                func(path)
+                done.append(path)
+            except Exception as e:
+                errors.append(f"{os.path.basename(path)}: {e}")
+        log.info(f"批量{action}: 成功 {len(done)} 个，失败 {len(errors)} 个")
+        self.bulk_done.emit(profile, action, done, errors)
+
+    def set_bulk_enabled(self, enabled):
+        for button in (self.delete_btn, self.export_btn, self.archive_btn):
+            button.setEnabled(enabled)
+        # 归档时会在后台保存快照，删除快照的垃圾回收要等它结束
+        self.delete_snapshot_action.setEnabled(enabled)
+
+    def on_bulk_done(self, profile, action, done, errors):
+        if action != "导出":
+            for path in done:
+                profile.search_index.discard(path)
+            profile.save_model.remove_files(done)
+        if action == "自动清理":
+            self._auto_pruning.discard(profile.steam_id)
+            return
+        self.set_bulk_enabled(True)
+        message = f"{action}了 {len(done)} 个存档"
+        if errors:
+            shown = "\n".join(errors[:10])
+            more = f"\n……共 {len(errors)} 个" if len(errors) > 10 else ""
+            QMessageBox.warning(
+                self, "部分失败", f"{message}，以下存档失败:\n{shown}{more}"
+            )
+        else:
+            QMessageBox.information(self, "完成", message)
 
     def delete_save(self):
-        selected = self.table_widget.currentItem()
-        if not selected:
+        paths = self.selected_paths()
+        if not paths:
             QMessageBox.warning(self, "警告", "请先选择要删除的存档")
             return
+        if len(paths) == 1:
+            text = f"确定要永久删除存档 '{os.path.basename(paths[0])}' 吗?"
+        else:
+            text = f"确定要永久删除选中的 {len(paths)} 个存档吗?"
+        reply = QMessageBox.question(
+            self, "确认删除", text, QMessageBox.Yes | QMessageBox.No, QMessageBox.No
+        )
+        if reply == QMessageBox.No:
+            return
+        self.run_bulk("删除", paths, self.library.delete)
 
+    def export_saves(self):
+        paths = self.selected_paths()
+        if not paths:
+            QMessageBox.warning(self, "警告", "请先选择要导出的存档")
+            return
+        dest_dir = QFileDialog.getExistingDirectory(self, "选择导出目录")
+        if not dest_dir:
+            return
+        existing = [
+            path
+            for path in paths
+            if os.path.exists(os.path.join(dest_dir, os.path.basename(path)))
+        ]
+        if existing:
+            reply = QMessageBox.question(
+                self,
+                "确认",
+                f"导出目录中已有 {len(existing)} 个同名文件，是否覆盖？\n"
+                "选择“否”跳过这些存档。",
+                QMessageBox.Yes | QMessageBox.No | QMessageBox.Cancel,
+                QMessageBox.No,
+            )
+            if reply == QMessageBox.Cancel:
+                return
+            if reply == QMessageBox.No:
+                paths = [path for path in paths if path not in existing]
+                if not paths:
+                    return
+
+        def export(path):
+            self.fs.copy_out(path, os.path.join(dest_dir, os.path.basename(path)))
+
+        self.run_bulk("导出", paths, export)
+
+    def archive_saves(self):
+        r"""
+        把选中的存档存入去重快照存储后从游戏目录删除，之后可以通过“加载快照”恢复
+        """
+        paths = self.selected_paths()
+        if not paths:
+            QMessageBox.warning(self, "警告", "请先选择要归档的存档")
+            return
+        reply = QMessageBox.question(
+            self,
+            "确认归档",
+            f"把选中的 {len(paths)} 个存档移入快照存储，并从存档目录中删除？",
+            QMessageBox.Yes | QMessageBox.No,
+            QMessageBox.No,
+        )
+        if reply == QMessageBox.No:
+            return
+        profile = self.profile
+
+        def archive(path):
+            name = os.path.splitext(os.path.basename(path))[0]
+            self.snapshots.put(profile.steam_id, name, path, self.fs)
+            profile.library.delete(path)
+
+        self.run_bulk("归档", paths, archive)
+
+    def export_archive(self):
+        paths = self.selected_paths()
+        if not paths:
+            QMessageBox.warning(self, "警告", "请先选择要导出的存档")
+            return
+        archive_path, _ = QFileDialog.getSaveFileName(
+            self, "导出存档包", f"{self.profile.steam_id}.zip", "存档包 (*.zip)"
+        )
+        if not archive_path:
+            return
+        from util.archive import export_saves
+
+        self.workers.submit(
+            self._archive_task,
+            "导出",
+            partial(export_saves, fs=self.fs),
+            archive_path,
+            paths,
+        )
+
+    def show_records(self, file_name, title):
+        from gui.record_dialog import RecordDialog
+
+        if self.profile is None:
+            return
+        RecordDialog(self, file_name, title).exec_()
+
+    def store_record(self):
         save_path = self.get_choiced_save_path()
         if not save_path:
+            QMessageBox.warning(self, "警告", "请先选择要存入官方存档的存档")
+            return
+        name, ok = QInputDialog.getText(
+            self,
+            "存入官方存档",
+            "记录名:",
+            text=os.path.splitext(os.path.basename(save_path))[0],
+        )
+        if not ok:
+            return
+        try:
+            index = self.library.store_record(save_path, name.strip() or None)
+        except (OSError, ValueError) as e:
+            QMessageBox.warning(self, "错误", f"存入官方存档失败: {e}")
+            return
+        QMessageBox.information(
+            self, "成功", f"已存入官方存档，共 {len(index)} 条记录"
+        )
+
+    def import_archive(self):
+        archive_path, _ = QFileDialog.getOpenFileName(
+            self, "导入存档包", "", "存档包 (*.zip)"
+        )
+        if not archive_path:
+            return
+        from util.archive import import_saves
+
+        library = self.library
+
+        def import_named(archive_path, dest_dir):
+            # 导入的存档是用户备份过的，和另存为的存档一样不参与清理
+            result = import_saves(archive_path, dest_dir, fs=self.fs)
+            library.mark_named(result["imported"])
+            return result
+
+        # 导入的存档由文件监控加入列表
+        self.workers.submit(
+            self._archive_task, "导入", import_named, archive_path, self.save_dir
+        )
+
+    def _archive_task(self, action, func, *args):
+        # 在后台线程中执行
+        try:
+            result = func(*args)
+        except Exception as e:
+            log.exception(f"{action}存档包失败")
+            self.archive_done.emit(action, None, str(e))
+            return
+        self.archive_done.emit(action, result, "")
+
+    def on_archive_done(self, action, result, error):
+        if error:
+            QMessageBox.warning(self, "错误", f"{action}存档包失败: {error}")
+        elif action == "导出":
+            QMessageBox.information(
+                self, "完成", f"已导出 {len(result['saves'])} 个存档"
+            )
+        else:
+            message = (
+                f"导入 {len(result['imported'])} 个存档，"
+                f"跳过已有的 {len(result['skipped'])} 个"
+            )
+            if result["renamed"]:
+                message += f"，{len(result['renamed'])} 个同名存档已改名"
+            if result["failed"]:
+                failed = "\n".join(result["failed"][:10])
+                QMessageBox.warning(self, "部分失败", f"{message}\n失败:\n{failed}")
+            else:
+                QMessageBox.information(self, "完成", message)
+
+    def retention_policy(self) -> RetentionPolicy:
+        max_mb = Config.get("retention_max_mb")
+        return RetentionPolicy(
+            keep_last=Config.get("retention_keep_last"),
+            every_rounds=Config.get("retention_every_rounds"),
+            max_bytes=int(max_mb * 1048576) if max_mb else None,
+        )
+
+    def edit_retention(self):
+        from gui.retention_dialog import RetentionDialog
+
+        dialog = RetentionDialog(
+            self, self.retention_policy(), Config.get("retention_auto", False)
+        )
+        if not dialog.exec_():
             return
+        policy = dialog.policy()
+        Config.set("retention_keep_last", policy.keep_last)
+        Config.set("retention_every_rounds", policy.every_rounds)
+        Config.set(
+            "retention_max_mb", policy.max_bytes / 1048576 if policy.max_bytes else None
+        )
+        Config.set("retention_auto", dialog.auto.isChecked())
+
+    def prune_now(self):
+        policy = self.retention_policy()
+        if not is_enabled(policy):
+            QMessageBox.information(self, "立即清理", "请先在“清理策略”中设置保留条件")
+            return
+        # 先在后台计算需要删除的存档，确认后再删除
+        profile = self.profile
+        self.workers.submit(
+            self._plan_prune, profile, policy, profile.save_model.infos()
+        )
 
+    def _plan_prune(self, profile, policy, saves):
+        try:
+            removed = profile.library.prune(policy, dry_run=True, saves=saves)
+        except Exception:
+            log.exception("计算清理计划失败")
+            removed = []
+        self.prune_planned.emit(profile, removed)
+
+    def confirm_prune(self, profile, removed):
+        if profile is not self.profile:
+            return
+        if not removed:
+            QMessageBox.information(self, "立即清理", "没有需要清理的存档")
+            return
         reply = QMessageBox.question(
             self,
-            "确认删除",
-            f"确定要永久删除存档 '{os.path.basename(save_path)}' 吗?",
+            "立即清理",
+            f"按清理策略将删除 {len(removed)} 个旧存档，是否继续？",
             QMessageBox.Yes | QMessageBox.No,
             QMessageBox.No,
         )
-        if reply == QMessageBox.No:
+        if reply == QMessageBox.Yes:
+            self.run_bulk("清理", removed, profile.library.delete)
+
+    def schedule_auto_prune(self, profile, policy):
+        r"""
+        有新存档时按策略清理该账号
+
+        清理计划来自列表中的记录，不重新扫描目录；上一次清理还没有结束时跳过，
+        下一批文件事件会再次检查
+        """
+        if profile.steam_id in self._auto_pruning:
             return
+        self._auto_pruning.add(profile.steam_id)
+        self.workers.submit(
+            self._auto_prune, profile, policy, profile.save_model.infos()
+        )
 
+    def _auto_prune(self, profile, policy, saves):
+        # 在后台线程中执行，结束后由 on_bulk_done 更新列表
+        removed = []
+        errors = []
         try:
-            os.remove(save_path)
-            self.round_raw_files.remove(save_path)
-            self.refresh_save_list()
+            removed = profile.library.prune(policy, saves=saves)
         except Exception as e:
-            QMessageBox.warning(self, "错误", f"删除存档失败: {str(e)}")
+            log.exception(f"自动清理账号 {profile.steam_id} 失败")
+            errors.append(str(e))
+        if removed:
+            log.info(f"自动清理账号 {profile.steam_id}: 删除 {len(removed)} 个存档")
+        self.bulk_done.emit(profile, "自动清理", removed, errors)
 
     def change_save_dir(self):
         # 修改存档位置
         save_dir = QFileDialog.getExistingDirectory(
             None, "选择存档目录", Config.get("SaveDataDir")
         )
-        if save_dir:
-            Config.set("steam_id", os.path.basename(save_dir))
-            Config.set("SaveDataDir", "\\".join(save_dir.split("/")[:-1]))
-            self.init_saves()
+        if not save_dir:
+            return
+        # 修改配置后由 apply_save_dir_config 重新加载或切换到已加载的账号
+        Config.set("steam_id", os.path.basename(os.path.normpath(save_dir)))
+        Config.set("SaveDataDir", os.path.dirname(os.path.normpath(save_dir)))
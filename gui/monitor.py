@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+r"""
+存档目录监控
+
+watchdog 的导入较慢，只在开始监控时由 gui.main 导入本模块。
+所有账号的存档目录共用一个监控线程，每个目录一个监控项。
+监控线程中的事件只交给 push(变化, 文件路径) 记录，不直接操作界面。
+
+监控方式（配置项 watch_strategy）:
+    native   系统的文件通知（Linux inotify、Windows ReadDirectoryChangesW、macOS FSEvents）
+    polling  每隔 watch_poll_interval 秒扫描一次目录，用于网络盘等收不到通知的目录
+    auto     默认；网络文件系统上的目录和无法使用系统通知的目录（如 inotify 数量用尽）
+             改用轮询，其他目录使用系统通知
+"""
+import os
+import re
+import sys
+
+from watchdog.observers import Observer
+from watchdog.observers.polling import PollingObserver
+from watchdog.events import (
+    FileSystemEventHandler,
+    FileCreatedEvent,
+    FileModifiedEvent,
+    FileDeletedEvent,
+    FileMovedEvent,
+)
+
+import util.logger
+from core.library import is_save_file
+from util.event_coalescer import CREATED, MODIFIED, DELETED
+from util.profiler import profiler
+
+log = util.logger.logger(__name__)
+
+WATCH_STRATEGIES = ("auto", "native", "polling")
+# 收不到其他机器上的修改通知的文件系统（/proc/mounts 中的类型）
+_NETWORK_FS = (
+    "nfs",
+    "nfs4",
+    "cifs",
+    "smb3",
+    "smbfs",
+    "9p",
+    "fuse.sshfs",
+    "fuse.rclone",
+)
+# /proc/mounts 中挂载点的空格等字符被转义为 \ooo
+_octal_escape = re.compile(r"\\([0-7]{3})")
+
+
+def _mount_type(path: str) -> str:
+    r"""
+    Linux 上 path 所在挂载点的文件系统类型，无法判断时返回空字符串
+    """
+    if not sys.platform.startswith("linux"):
+        return ""
+    path = os.path.realpath(path)
+    best, fs_type = "", ""
+    try:
+        with open("/proc/mounts", "r", encoding="utf8") as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) < 3:
+                    continue
+                mount_point = _octal_escape.sub(
+                    lambda m: chr(int(m.group(1), 8)), fields[1]
+                )
+                if (
+                    path == mount_point
+                    or path.startswith(mount_point.rstrip("/") + "/")
+                ) and len(mount_point) > len(best):
+                    best, fs_type = mount_point, fields[2]
+    except OSError:
+        return ""
+    return fs_type
+
+
+def is_network_path(path: str) -> bool:
+    return _mount_type(path) in _NETWORK_FS
+
+
+class SaveEventHandler(FileSystemEventHandler):
+    def __init__(self, push):
+        super().__init__()
+        self.push = push
+
+    def dispatch(self, event):
+        # 监控线程中处理一个文件事件的耗时
+        with profiler.span("file_event"):
+            super().dispatch(event)
+
+    def on_created(self, event):
+        if not isinstance(event, FileCreatedEvent):
+            # 忽略非文件创建事件
+            return
+        log.debug("创建文件: %s", event.src_path)
+        if is_save_file(event.src_path):
+            self.push(CREATED, event.src_path)
+
+    def on_modified(self, event):
+        if not isinstance(event, FileModifiedEvent):
+            # 忽略非文件修改事件
+            return
+        log.debug("修改文件: %s", event.src_path)
+        if is_save_file(event.src_path):
+            self.push(MODIFIED, event.src_path)
+
+    def on_deleted(self, event):
+        if not isinstance(event, FileDeletedEvent):
+            # 忽略非文件删除事件
+            return
+        log.debug("删除文件: %s", event.src_path)
+        if is_save_file(event.src_path):
+            self.push(DELETED, event.src_path)
+
+    def on_moved(self, event):
+        if not isinstance(event, FileMovedEvent):
+            # 忽略非文件移动事件
+            return
+        log.debug("移动文件: %s -> %s", event.src_path, event.dest_path)
+        # 先写临时文件再改名的保存方式会产生移动事件，
+        # 源文件按删除处理，目标文件可能是覆盖已有存档，按修改处理
+        if is_save_file(event.src_path):
+            self.push(DELETED, event.src_path)
+        if is_save_file(event.dest_path):
+            self.push(MODIFIED, event.dest_path)
+
+
+class SaveMonitor:
+    r"""
+    strategy 为 WATCH_STRATEGIES 之一；两种方式各用一个监控线程，需要时才创建
+    """
+
+    def __init__(self, push, strategy: str = "auto", poll_interval: float = 2.0):
+        if strategy not in WATCH_STRATEGIES:
+            log.warning(f"未知的监控方式 {strategy}，使用 auto")
+            strategy = "auto"
+        self.handler = SaveEventHandler(push)
+        self.strategy = strategy
+        self.poll_interval = poll_interval
+        self._observers = {}  # "native" 或 "polling" -> 监控线程
+        self._watches = {}  # 存档目录 -> (监控线程, 监控项)
+        self._started = False
+
+    def _observer(self, kind: str):
+        observer = self._observers.get(kind)
+        if observer is None:
+            if kind == "polling":
+                observer = PollingObserver(timeout=self.poll_interval)
+            else:
+                observer = Observer()
+            self._observers[kind] = observer
+            if self._started:
+                observer.start()
+        return observer
+
+    def _schedule(self, kind: str, save_dir: str):
+        observer = self._observer(kind)
+        watch = observer.schedule(self.handler, save_dir, recursive=False)
+        self._watches[save_dir] = (observer, watch)
+        log.info(f"开始监控存档目录（{kind}）: {save_dir}")
+
+    def watch(self, save_dir: str):
+        r"""
+        开始监控一个存档目录，可以在监控线程启动之后调用
+        """
+        if save_dir in self._watches:
+            return
+        if self.strategy == "polling" or (
+            self.strategy == "auto" and is_network_path(save_dir)
+        ):
+            self._schedule("polling", save_dir)
+            return
+        try:
+            self._schedule("native", save_dir)
+        except OSError as e:
+            if self.strategy != "auto":
+                raise
+            log.warning(f"无法使用系统文件通知，改为轮询: {save_dir}: {e}")
+            self._schedule("polling", save_dir)
+
+    def unwatch(self, save_dir: str):
+        item = self._watches.pop(save_dir, None)
+        if item is not None:
+            observer, watch = item
+            observer.unschedule(watch)
+            log.info(f"停止监控存档目录: {save_dir}")
+
+    def start(self):
+        self._started = True
+        for observer in self._observers.values():
+            observer.start()
+
+    def stop(self):
+        for observer in self._observers.values():
+            observer.stop()
+        for observer in self._observers.values():
+            observer.join()
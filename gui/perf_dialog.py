@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+from PyQt5.QtWidgets import (
+    QDialog,
+    QVBoxLayout,
+    QHBoxLayout,
+    QLabel,
+    QPushButton,
+    QTableWidget,
+    QTableWidgetItem,
+    QFileDialog,
+    QMessageBox,
+)
+from PyQt5.QtCore import Qt
+
+from util.profiler import BUCKETS_MS, Profiler
+
+_columns = ["操作", "次数", "总计", "平均", "P50", "P95", "最大", "耗时分布"]
+
+
+def _ms(seconds: float) -> str:
+    return f"{seconds * 1000:.1f} ms"
+
+
+def _histogram_text(buckets) -> str:
+    r"""
+    把耗时分布写成 "<1ms:3 <5ms:1 ≥1000ms:0" 的形式，省略为0的区间
+    """
+    labels = [f"<{b}ms" for b in BUCKETS_MS] + [f"≥{BUCKETS_MS[-1]}ms"]
+    return " ".join(f"{label}:{n}" for label, n in zip(labels, buckets) if n)
+
+
+class PerfDialog(QDialog):
+    r"""
+    性能统计，显示各个操作的耗时分布，可以导出 pstats 或 Chrome trace 文件
+    """
+
+    def __init__(self, parent, profiler: Profiler):
+        super().__init__(parent)
+        self.profiler = profiler
+        self.setWindowTitle("性能")
+        self.resize(900, 400)
+        layout = QVBoxLayout(self)
+        if not profiler.enabled:
+            layout.addWidget(QLabel("使用 --profile 参数启动后才会记录性能数据。", self))
+
+        self.table = QTableWidget(self)
+        self.table.setColumnCount(len(_columns))
+        self.table.setHorizontalHeaderLabels(_columns)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        layout.addWidget(self.table)
+
+        buttons = QHBoxLayout()
+        for text, slot in (
+            ("刷新", self.refresh),
+            ("清空", self.reset),
+            ("导出 pstats", self.export_pstats),
+            ("导出 Chrome trace", self.export_trace),
+        ):
+            button = QPushButton(text, self)
+            button.clicked.connect(slot)
+            button.setEnabled(profiler.enabled)
+            buttons.addWidget(button)
+        layout.addLayout(buttons)
+        self.refresh()
+
+    def refresh(self):
+        stats = self.profiler.stats()
+        self.table.setRowCount(len(stats))
+        for row, s in enumerate(stats):
+            values = [
+                s["name"],
+                str(s["count"]),
+                _ms(s["total"]),
+                _ms(s["mean"]),
+                _ms(s["p50"]),
+                _ms(s["p95"]),
+                _ms(s["max"]),
+                _histogram_text(s["buckets"]),
+            ]
+            for column, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                if 0 < column < len(values) - 1:
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                self.table.setItem(row, column, item)
+        self.table.resizeColumnsToContents()
+
+    def reset(self):
+        self.profiler.reset()
+        self.refresh()
+
+    def _export(self, title, file_filter, export):
+        path, _ = QFileDialog.getSaveFileName(self, title, "", file_filter)
+        if not path:
+            return
+        try:
+            export(path)
+        except (OSError, ValueError) as e:
+            QMessageBox.warning(self, "导出失败", str(e))
+            return
+        QMessageBox.information(self, "导出完成", f"已导出到 {path}")
+
+    def export_pstats(self):
+        self._export(
+            "导出 pstats", "pstats 文件 (*.prof)", self.profiler.export_pstats
+        )
+
+    def export_trace(self):
+        self._export(
+            "导出 Chrome trace",
+            "Chrome trace (*.json)",
+            self.profiler.export_chrome_trace,
+        )
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+from core.library import SaveLibrary
+from gui.save_model import SaveTableModel
+from util.fs import local_fs
+from util.search_index import SearchIndex
+
+
+class Profile:
+    r"""
+    一个账号（steam_id）的存档目录
+
+    列表模型和搜索索引常驻内存，并持续随文件事件更新，切换账号时直接换用，不需要重新扫描。
+    搜索索引要完整解析每个存档，只在第一次切换到这个账号时才开始建立。
+    """
+
+    def __init__(
+        self,
+        steam_id: str,
+        save_dir: str,
+        fsync: bool = True,
+        parent=None,
+        fs=local_fs,
+    ):
+        self.steam_id = steam_id
+        self.save_dir = save_dir
+        self.library = SaveLibrary(save_dir, fsync=fsync, fs=fs)
+        self.save_model = SaveTableModel(parent, fs)
+        self.search_index = SearchIndex(fs)
+        self.scan_generation = None
+        self.scanned = False  # 后台扫描是否已经完成
+        self.indexed = False  # 是否已经开始为全部存档建立搜索索引
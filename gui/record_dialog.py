@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+from PyQt5.QtWidgets import (
+    QDialog,
+    QVBoxLayout,
+    QHBoxLayout,
+    QLabel,
+    QPushButton,
+    QTableView,
+    QAbstractItemView,
+    QInputDialog,
+    QMessageBox,
+)
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, pyqtSignal
+
+from core.library import format_save_time
+from gui.save_model import format_size
+from util.record_file import read_record, record_save
+
+_headers = ["序号", "名称", "回合", "难度", "游戏时间", "大小"]
+
+
+class RecordTableModel(QAbstractTableModel):
+    r"""
+    记录文件的列表模型，只使用索引中的位置和头部字段
+
+    存档被序列化成字符串包在记录中时索引里没有回合等字段，
+    这些行第一次显示时才读取并解析这一条记录
+    """
+
+    def __init__(self, index, parent=None):
+        super().__init__(parent)
+        self.index_ = index
+        self._resolved = {}  # 行 -> 存档头部
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.index_.entries)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(_headers)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return _headers[section]
+        return None
+
+    def _save_header(self, row) -> dict:
+        header = self.index_.entries[row].header
+        if "round" in header or "saveTime" in header:
+            return header
+        if row not in self._resolved:
+            try:
+                save_data = record_save(read_record(self.index_, row))
+                self._resolved[row] = save_data if isinstance(save_data, dict) else {}
+            except (OSError, ValueError):
+                self._resolved[row] = {}
+        return self._resolved[row]
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
+        entry = self.index_.entries[index.row()]
+        column = index.column()
+        if column == 0:
+            return str(entry.index)
+        if column == 1:
+            return str(entry.header.get("name", ""))
+        if column == 5:
+            return format_size(entry.length)
+        header = self._save_header(index.row())
+        if column == 4:
+            save_time = header.get("saveTime")
+            return format_save_time(save_time) if save_time else ""
+        value = header.get("round" if column == 2 else "difficulty")
+        return "" if value is None else str(value)
+
+
+class RecordDialog(QDialog):
+    r"""
+    官方存档或结局记录中的记录列表，可以把一条记录提取为存档或直接加载
+
+    索引在后台建立，完成前只显示进度文字
+    """
+
+    # 索引, 错误信息
+    indexed = pyqtSignal(object, str)
+
+    def __init__(self, window, file_name: str, title: str):
+        super().__init__(window)
+        self.main_window = window
+        self.library = window.library
+        self.file_name = file_name
+        self.index = None
+        self.setWindowTitle(title)
+        self.resize(700, 500)
+        layout = QVBoxLayout(self)
+        self.status = QLabel("正在读取记录...", self)
+        layout.addWidget(self.status)
+
+        self.table = QTableView(self)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        layout.addWidget(self.table)
+
+        buttons = QHBoxLayout()
+        self.load_btn = QPushButton("加载", self)
+        self.load_btn.clicked.connect(self.load_record)
+        buttons.addWidget(self.load_btn)
+        self.extract_btn = QPushButton("提取为存档", self)
+        self.extract_btn.clicked.connect(self.extract_record)
+        buttons.addWidget(self.extract_btn)
+        layout.addLayout(buttons)
+        self.set_buttons_enabled(False)
+
+        self.indexed.connect(self.on_indexed)
+        window.workers.submit(self._index_task)
+
+    def _index_task(self):
+        try:
+            index = self.library.index_records(self.file_name)
+        except (OSError, ValueError) as e:
+            self.indexed.emit(None, str(e))
+            return
+        self.indexed.emit(index, "")
+
+    def set_buttons_enabled(self, enabled: bool):
+        self.load_btn.setEnabled(enabled)
+        self.extract_btn.setEnabled(enabled)
+
+    def on_indexed(self, index, error):
+        if index is None:
+            self.status.setText(f"读取记录失败: {error}")
+            return
+        self.index = index
+        self.status.setText(f"共 {len(index)} 条记录")
+        self.table.setModel(RecordTableModel(index, self.table))
+        self.table.setColumnWidth(1, 200)
+        self.set_buttons_enabled(len(index) > 0)
+
+    def selected_row(self):
+        current = self.table.currentIndex()
+        if not current.isValid():
+            QMessageBox.warning(self, "警告", "请先选择一条记录")
+            return None
+        return current.row()
+
+    def load_record(self):
+        row = self.selected_row()
+        if row is None:
+            return
+        self.main_window.run_load(
+            lambda: self.library.load_data(
+                record_save(read_record(self.index, row))
+            ),
+            "记录",
+        )
+
+    def extract_record(self):
+        row = self.selected_row()
+        if row is None:
+            return
+        name, ok = QInputDialog.getText(self, "提取为存档", "新存档名:")
+        name = name.strip()
+        if not ok or not name:
+            return
+        if self.library.fs.exists(self.library.resolve(name)):
+            reply = QMessageBox.question(
+                self,
+                "确认",
+                "同名存档已存在，是否覆盖？",
+                QMessageBox.Yes | QMessageBox.No,
+                QMessageBox.No,
+            )
+            if reply == QMessageBox.No:
+                return
+        try:
+            path = self.library.extract_record(self.index, row, name, overwrite=True)
+        except (OSError, ValueError) as e:
+            QMessageBox.warning(self, "错误", f"提取记录失败: {e}")
+            return
+        self.main_window.save_model.add_file(path)
+        QMessageBox.information(self, "成功", "记录已提取为存档")
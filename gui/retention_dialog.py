@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+from PyQt5.QtWidgets import (
+    QDialog,
+    QFormLayout,
+    QSpinBox,
+    QDoubleSpinBox,
+    QCheckBox,
+    QDialogButtonBox,
+)
+
+from core.retention import RetentionPolicy
+
+
+class RetentionDialog(QDialog):
+    r"""
+    清理策略设置，数值为0表示不使用该条件
+    """
+
+    def __init__(self, parent, policy: RetentionPolicy, auto: bool):
+        super().__init__(parent)
+        self.setWindowTitle("清理策略")
+        layout = QFormLayout(self)
+
+        self.keep_last = QSpinBox(self)
+        self.keep_last.setRange(0, 100000)
+        self.keep_last.setValue(policy.keep_last or 0)
+        layout.addRow("每局保留最新的存档数", self.keep_last)
+
+        self.every_rounds = QSpinBox(self)
+        self.every_rounds.setRange(0, 100000)
+        self.every_rounds.setValue(policy.every_rounds or 0)
+        layout.addRow("每隔多少回合保留一个", self.every_rounds)
+
+        self.max_mb = QDoubleSpinBox(self)
+        self.max_mb.setRange(0, 1000000)
+        self.max_mb.setSuffix(" MB")
+        self.max_mb.setValue((policy.max_bytes or 0) / 1048576)
+        layout.addRow("存档总大小上限", self.max_mb)
+
+        self.auto = QCheckBox("有新存档时自动清理", self)
+        self.auto.setChecked(auto)
+        layout.addRow(self.auto)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel, self)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addRow(buttons)
+
+    def policy(self) -> RetentionPolicy:
+        return RetentionPolicy(
+            keep_last=self.keep_last.value() or None,
+            every_rounds=self.every_rounds.value() or None,
+            max_bytes=int(self.max_mb.value() * 1048576) or None,
+        )
@@ -0,0 +1,458 @@
+# -*- coding: utf-8 -*-
+from PyQt5.QtCore import (
+    Qt,
+    QAbstractItemModel,
+    QAbstractTableModel,
+    QModelIndex,
+    QSortFilterProxyModel,
+    QTimer,
+)
+from datetime import datetime
+import os
+import time
+
+from core.library import format_save_time
+from util.fs import local_fs
+from util.save_index import save_index
+
+# 存放排序键的角色
+SortRole = Qt.UserRole + 1
+# 存放文件路径的角色
+PathRole = Qt.UserRole + 2
+
+_headers = ["存档名称", "修改时间", "主角", "回合", "难度", "游戏时间", "大小"]
+(
+    COL_NAME,
+    COL_MTIME,
+    COL_CHARACTER,
+    COL_ROUND,
+    COL_DIFFICULTY,
+    COL_SAVETIME,
+    COL_SIZE,
+) = range(len(_headers))
+# 右对齐的数值列
+_numeric_columns = (COL_ROUND, COL_DIFFICULTY, COL_SIZE)
+# 行变化后至少等待这么久再重新排序，期间的变化合并为一次布局更新；
+# 排序本身较慢时按其耗时的倍数延长等待，排序占用的时间不超过约五分之一
+SORT_DELAY_MS = 50
+SORT_DELAY_FACTOR = 4
+
+
+def format_size(size: int) -> str:
+    if size >= 1048576:
+        return f"{size / 1048576:.1f} MB"
+    return f"{size / 1024:.0f} KB"
+
+
+def _int_key(value) -> int:
+    # 头部缺失或不是整数时排在最前面
+    return value if isinstance(value, int) and not isinstance(value, bool) else -1
+
+
+def _str_key(value) -> str:
+    return value if isinstance(value, str) else ""
+
+
+class SaveRecord:
+    r"""
+    一个存档在内存中的记录
+
+    排序键直接来自目录扫描和头部信息，排序和显示都不再访问文件系统。
+    时间的显示文字在第一次显示时才生成，几万个存档时只有看到过的行占用这部分内存。
+    header 为解析过的头部信息，还没有解析时为None，由后台的头部解析补上。
+    """
+
+    __slots__ = (
+        "path",
+        "display_name",
+        "size",
+        "mtime",
+        "time_str",
+        "header",
+        "save_time_str",
+    )
+
+    def __init__(self, path: str, size: int, mtime: float, header: dict = None):
+        self.path = path
+        self.display_name = os.path.splitext(os.path.basename(path))[0]
+        self.size = size
+        self.mtime = mtime
+        self.time_str = None
+        self.set_header(header)
+
+    @classmethod
+    def from_path(cls, path: str, fs=local_fs) -> "SaveRecord":
+        r"""
+        文件事件时使用，只stat一次；索引中有有效的头部信息时直接使用
+        """
+        stat = fs.stat(path)
+        return cls(path, stat.st_size, stat.st_mtime, save_index.lookup(path, stat))
+
+    def set_header(self, header: dict):
+        self.header = header
+        self.save_time_str = None
+
+    def _header_value(self, key):
+        return self.header.get(key) if self.header else None
+
+    def display(self, column: int):
+        if column == COL_NAME:
+            return self.display_name
+        if column == COL_MTIME:
+            if self.time_str is None:
+                self.time_str = datetime.fromtimestamp(self.mtime).strftime(
+                    "%Y-%m-%d %H:%M:%S"
+                )
+            return self.time_str
+        if column == COL_SIZE:
+            return format_size(self.size)
+        if column == COL_SAVETIME:
+            if self.save_time_str is None:
+                save_time = self._header_value("saveTime")
+                self.save_time_str = format_save_time(save_time) if save_time else ""
+            return self.save_time_str
+        value = self._header_value(_header_keys[column])
+        return "" if value is None else str(value)
+
+    def sort_key(self, column: int):
+        if column == COL_NAME:
+            return self.display_name.lower()
+        if column == COL_MTIME:
+            return self.mtime
+        if column == COL_SIZE:
+            return self.size
+        value = self._header_value(_header_keys[column])
+        if column in (COL_CHARACTER, COL_SAVETIME):
+            # saveTime 为ISO格式，按字符串比较即按时间先后
+            return _str_key(value)
+        return _int_key(value)
+
+
+# 来自存档头部的列对应的头部字段
+_header_keys = {
+    COL_CHARACTER: "name",
+    COL_ROUND: "round",
+    COL_DIFFICULTY: "difficulty",
+    COL_SAVETIME: "saveTime",
+}
+
+
+class SaveTableModel(QAbstractTableModel):
+    r"""
+    存档列表模型
+
+    每个存档是一个 SaveRecord，目录扫描时从 os.scandir 一次取得大小和修改时间，
+    之后只随文件事件更新；单个文件的增删改只影响对应的一行，不再整表重建。
+
+    排序在模型中用Python的列表排序完成，每次只发出一次布局变化。
+    新增的行和头部信息变化先放在原位，短时间内的多次变化合并为一次重新排序。
+    """
+
+    def __init__(self, parent=None, fs=local_fs):
+        super().__init__(parent)
+        self.fs = fs
+        self._rows = []  # [SaveRecord]
+        self._row_of = {}  # file_path -> row
+        self._sort_keys = []  # [(列, 顺序)]
+        self._sort_timer = QTimer(self)
+        self._sort_timer.setSingleShot(True)
+        self._sort_timer.setInterval(SORT_DELAY_MS)
+        self._sort_timer.timeout.connect(self.sort_now)
+
+    def _reindex(self, start=0):
+        for row in range(start, len(self._rows)):
+            self._row_of[self._rows[row].path] = row
+
+    def _emit_row_changed(self, row):
+        self.dataChanged.emit(
+            self.index(row, 0), self.index(row, self.columnCount() - 1)
+        )
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(_headers)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return _headers[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        record = self._rows[index.row()]
+        if role == Qt.DisplayRole:
+            return record.display(index.column())
+        if role == SortRole:
+            return record.sort_key(index.column())
+        if role == PathRole:
+            return record.path
+        if role == Qt.TextAlignmentRole and index.column() in _numeric_columns:
+            return int(Qt.AlignRight | Qt.AlignVCenter)
+        return None
+
+    def path_at(self, row) -> str:
+        return self._rows[row].path
+
+    def set_sort_keys(self, keys):
+        r"""
+        按多列排序，keys 为 [(列, Qt.AscendingOrder 或 Qt.DescendingOrder)]
+        """
+        self._sort_keys = list(keys)
+        self.sort_now()
+
+    def schedule_sort(self, header_only=False):
+        r"""
+        稍后重新排序；header_only 为True时只有头部信息变化，不按头部字段排序时忽略
+        """
+        if not self._sort_keys or self._sort_timer.isActive():
+            return
+        if header_only and not any(c in _header_keys for c, _ in self._sort_keys):
+            return
+        self._sort_timer.start()
+
+    def sort_now(self):
+        r"""
+        按当前排序列重新排列所有行，顺序没有变化时不发出信号
+
+        前一列相同时按后一列比较，全部相同时按路径，保证结果稳定
+        """
+        self._sort_timer.stop()
+        if not self._sort_keys or len(self._rows) < 2:
+            return
+        start = time.perf_counter()
+        try:
+            self._sort_rows()
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self._sort_timer.setInterval(
+                max(SORT_DELAY_MS, int(elapsed_ms * SORT_DELAY_FACTOR))
+            )
+
+    def _sort_rows(self):
+        rows = self._rows
+        order = sorted(range(len(rows)), key=lambda i: rows[i].path)
+        # 稳定排序从最后一列排到第一列，每列可以有不同的顺序
+        for column, sort_order in reversed(self._sort_keys):
+            order.sort(
+                key=lambda i: rows[i].sort_key(column),
+                reverse=sort_order == Qt.DescendingOrder,
+            )
+        if all(old == new for new, old in enumerate(order)):
+            return
+        self.layoutAboutToBeChanged.emit([], QAbstractItemModel.VerticalSortHint)
+        new_row = [0] * len(order)
+        for new, old in enumerate(order):
+            new_row[old] = new
+        persistent = self.persistentIndexList()
+        self._rows = [rows[i] for i in order]
+        self._reindex()
+        self.changePersistentIndexList(
+            persistent,
+            [self.index(new_row[i.row()], i.column()) for i in persistent],
+        )
+        self.layoutChanged.emit([], QAbstractItemModel.VerticalSortHint)
+
+    def contains(self, file_path) -> bool:
+        return file_path in self._row_of
+
+    def paths(self) -> list:
+        return [record.path for record in self._rows]
+
+    def infos(self) -> list:
+        r"""
+        所有存档的信息，形式同 SaveLibrary.infos，直接来自内存中的记录，不访问文件系统
+        """
+        return [
+            {
+                "name": record.display_name,
+                "path": record.path,
+                "size": record.size,
+                "mtime": record.mtime,
+                "character": record._header_value("name"),
+                "round": record._header_value("round"),
+            }
+            for record in self._rows
+        ]
+
+    def header_of(self, file_path) -> dict:
+        r"""
+        已经缓存的头部信息，没有时返回None
+        """
+        row = self._row_of.get(file_path)
+        return None if row is None else self._rows[row].header
+
+    def set_header(self, file_path, header):
+        row = self._row_of.get(file_path)
+        if row is None:
+            return
+        self._rows[row].set_header(header)
+        self._emit_row_changed(row)
+        self.schedule_sort(header_only=True)
+
+    def set_headers(self, headers):
+        r"""
+        批量填入后台解析的头部信息，整批只发出一次数据变化信号
+
+        headers 为 [(文件路径, 头部信息)]
+        """
+        first = last = None
+        for file_path, header in headers:
+            row = self._row_of.get(file_path)
+            if row is None:
+                continue
+            self._rows[row].set_header(header)
+            first = row if first is None else min(first, row)
+            last = row if last is None else max(last, row)
+        if first is not None:
+            self.dataChanged.emit(
+                self.index(first, 0), self.index(last, self.columnCount() - 1)
+            )
+            self.schedule_sort(header_only=True)
+
+    def add_records(self, records):
+        r"""
+        批量追加存档，整批只发出一次插入信号，已存在的存档替换为新记录
+        """
+        new_rows = []
+        for record in records:
+            row = self._row_of.get(record.path)
+            if row is None:
+                new_rows.append(record)
+            else:
+                self._rows[row] = record
+                self._emit_row_changed(row)
+        if new_rows:
+            start = len(self._rows)
+            self.beginInsertRows(QModelIndex(), start, start + len(new_rows) - 1)
+            self._rows.extend(new_rows)
+            self._reindex(start)
+            self.endInsertRows()
+        # 新行先追加在末尾，稍后与其他变化一起排到正确位置
+        self.schedule_sort()
+
+    def add_file(self, file_path):
+        # 新增一行，已存在时按修改处理
+        self.update_file(file_path)
+
+    def update_file(self, file_path):
+        # 文件被创建或修改，只刷新对应的一行
+        try:
+            record = SaveRecord.from_path(file_path, self.fs)
+        except OSError:
+            return
+        self.add_records([record])
+
+    def remove_file(self, file_path):
+        # 删除对应的一行
+        row = self._row_of.get(file_path)
+        if row is None:
+            return
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self._rows[row]
+        del self._row_of[file_path]
+        self._reindex(row)
+        self.endRemoveRows()
+
+    def remove_files(self, file_paths):
+        r"""
+        批量删除存档，连续的行合并为一次删除，最后只重建一次行号
+        """
+        rows = sorted(
+            (self._row_of[p] for p in set(file_paths) if p in self._row_of),
+            reverse=True,
+        )
+        if not rows:
+            return
+        # 从后往前删除，前面的行号不受影响
+        end = 0
+        while end < len(rows):
+            start = end
+            while end + 1 < len(rows) and rows[end + 1] == rows[end] - 1:
+                end += 1
+            first, last = rows[end], rows[start]
+            self.beginRemoveRows(QModelIndex(), first, last)
+            del self._rows[first : last + 1]
+            self.endRemoveRows()
+            end += 1
+        self._row_of = {}
+        self._reindex()
+
+
+class SaveSortProxyModel(QSortFilterProxyModel):
+    r"""
+    存档列表的代理，搜索时只显示给定路径集合中的存档
+
+    支持多列排序：sort_keys 为 [(列, 顺序)]，前一列相同时按后一列比较，
+    全部相同时按路径比较，保证结果稳定。排序交给源模型完成，
+    代理本身不排序，不会对每次比较调用 Python 的 lessThan
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        # 过滤只看路径，行数据变化不影响结果；动态过滤会让每次批量的数据变化
+        # 把范围内的所有行重新过滤一遍
+        self.setDynamicSortFilter(False)
+        self._filter_paths = None
+        self._sort_keys = []
+
+    def sort_keys(self) -> list:
+        return list(self._sort_keys)
+
+    def set_sort_keys(self, keys):
+        r"""
+        按多列排序，keys 为 [(列, Qt.AscendingOrder 或 Qt.DescendingOrder)]
+        """
+        self._sort_keys = list(keys)
+        if self.sourceModel() is not None:
+            self.sourceModel().set_sort_keys(self._sort_keys)
+        self.headerDataChanged.emit(Qt.Horizontal, 0, len(_headers) - 1)
+
+    def setSourceModel(self, model):
+        # 切换档案时新模型使用当前的排序
+        super().setSourceModel(model)
+        if model is not None and self._sort_keys:
+            model.set_sort_keys(self._sort_keys)
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        # 单列排序（如 QTableView.sortByColumn）
+        self.set_sort_keys([] if column < 0 else [(column, order)])
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        value = super().headerData(section, orientation, role)
+        if (
+            orientation == Qt.Horizontal
+            and role == Qt.DisplayRole
+            and len(self._sort_keys) > 1
+        ):
+            # 多列排序时在表头标出每列的优先级和方向
+            for rank, (column, order) in enumerate(self._sort_keys, 1):
+                if column == section:
+                    arrow = "↑" if order == Qt.AscendingOrder else "↓"
+                    return f"{value} {rank}{arrow}"
+        return value
+
+    def set_filter_paths(self, paths):
+        r"""
+        只显示 paths 中的存档，None 表示不过滤
+        """
+        if paths is None and self._filter_paths is None:
+            return
+        self._filter_paths = paths
+        self.invalidateFilter()
+
+    def filterAcceptsRow(self, source_row, source_parent):
+        if self._filter_paths is None:
+            return True
+        return self.sourceModel().path_at(source_row) in self._filter_paths
+
+    def path_at(self, proxy_index) -> str:
+        if not proxy_index.isValid():
+            return None
+        return proxy_index.data(PathRole)
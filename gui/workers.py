@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+r"""
+后台任务
+
+目录扫描和存档解析放到线程池中执行，结果通过Qt信号回到界面线程。
+每次扫描都有一个代数，同一目录重新扫描后旧扫描会提前停止，迟到的结果也会被丢弃。
+不同目录（账号）的扫描互不影响，可以同时进行。
+扫描分两步：先只用目录信息和索引缓存列出存档，再在后台逐批解析缺少的头部信息。
+"""
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+import util.logger
+from gui.save_model import SaveRecord
+from util.fs import local_fs
+from util.profiler import profiled
+from util.save_index import save_index
+
+log = util.logger.logger(__name__)
+
+# 每批发送给界面的存档数量
+SCAN_BATCH = 256
+# 每批发送给界面的头部信息数量
+HEADER_BATCH = 64
+
+
+class SaveWorkers(QObject):
+    # 代数, [SaveRecord]
+    scanned = pyqtSignal(int, list)
+    # 代数, [(文件路径, 头部信息)]
+    headers_loaded = pyqtSignal(int, list)
+    # 代数, 存档数量
+    scan_finished = pyqtSignal(int, int)
+    # 代数, 错误信息
+    scan_failed = pyqtSignal(int, str)
+    # 文件路径, 头部信息, 错误信息
+    header_ready = pyqtSignal(str, object, str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.generation = 0
+        self._current = {}  # 存档目录 -> 该目录最近一次扫描的代数
+
+    def is_current(self, generation: int) -> bool:
+        return generation in self._current.values()
+
+    def scan(self, library) -> int:
+        r"""
+        开始扫描存档库，同一目录之前未完成的扫描会被作废，返回本次扫描的代数
+        """
+        self.generation += 1
+        self._current[library.save_dir] = self.generation
+        self.pool.start(_ScanTask(self, self.generation, library))
+        return self.generation
+
+    def load_header(self, file_path: str, fs=local_fs):
+        self.pool.start(_HeaderTask(self, file_path, fs))
+
+    def submit(self, func, *args):
+        r"""
+        在后台执行不需要返回结果的任务，异常只记录日志
+        """
+        self.pool.start(_CallTask(func, args))
+
+    def wait(self, msecs: int = -1) -> bool:
+        # 作废所有扫描并等待正在执行的任务结束
+        self._current = {}
+        return self.pool.waitForDone(msecs)
+
+
+class _ScanTask(QRunnable):
+    def __init__(self, workers: SaveWorkers, generation: int, library):
+        super().__init__()
+        self.workers = workers
+        self.generation = generation
+        self.library = library
+
+    @profiled("scan")
+    def run(self):
+        found = []
+        missing = []  # 索引中没有头部信息的存档
+        batch = []
+        try:
+            for file_path, stat in self.library.scan():
+                if not self.workers.is_current(self.generation):
+                    log.info(f"扫描已过期，停止: {self.library.save_dir}")
+                    return
+                # 大小和修改时间来自目录扫描，这里不打开文件，只使用索引中的头部信息
+                header = save_index.lookup(file_path, stat, self.library.fs)
+                if header is None:
+                    missing.append((file_path, stat))
+                batch.append(SaveRecord(file_path, stat.st_size, stat.st_mtime, header))
+                found.append(file_path)
+                if len(batch) >= SCAN_BATCH:
+                    self.workers.scanned.emit(self.generation, batch)
+                    batch = []
+        except OSError as e:
+            self.workers.scan_failed.emit(self.generation, str(e))
+            return
+        if batch:
+            self.workers.scanned.emit(self.generation, batch)
+        save_index.retain(self.library.save_dir, found)
+        if not self.load_headers(missing):
+            return
+        self.workers.scan_finished.emit(self.generation, len(found))
+
+    def load_headers(self, missing) -> bool:
+        r"""
+        列表显示后再解析缺少的头部信息，每个存档只解析一次并写入索引
+
+        扫描过期时返回False
+        """
+        batch = []
+        for file_path, stat in missing:
+            if not self.workers.is_current(self.generation):
+                log.info(f"扫描已过期，停止解析头部: {self.library.save_dir}")
+                return False
+            try:
+                header = save_index.get_header(file_path, stat, self.library.fs)
+            except (OSError, ValueError):
+                continue
+            batch.append((file_path, header))
+            if len(batch) >= HEADER_BATCH:
+                self.workers.headers_loaded.emit(self.generation, batch)
+                batch = []
+        if batch:
+            self.workers.headers_loaded.emit(self.generation, batch)
+        return True
+
+
+class _HeaderTask(QRunnable):
+    def __init__(self, workers: SaveWorkers, file_path: str, fs):
+        super().__init__()
+        self.workers = workers
+        self.file_path = file_path
+        self.fs = fs
+
+    def run(self):
+        try:
+            header = save_index.get_header(self.file_path, fs=self.fs)
+        except Exception as e:
+            self.workers.header_ready.emit(self.file_path, None, str(e))
+            return
+        self.workers.header_ready.emit(self.file_path, header, "")
+
+
+class _CallTask(QRunnable):
+    def __init__(self, func, args):
+        super().__init__()
+        self.func = func
+        self.args = args
+
+    def run(self):
+        try:
+            self.func(*self.args)
+        except Exception:
+            log.exception(f"后台任务失败: {self.func.__name__}")
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+import pytest
+
+import util.fileio as fileio
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PAD = "x" * 2000000
+
+# 子进程：不停地用 atomic_write 写入不同回合的完整JSON，直到被结束
+WRITER = """
+import json, sys
+from util.fileio import atomic_write
+path, pad = sys.argv[1], "x" * 2000000
+round_ = 0
+while True:
+    round_ += 1
+    atomic_write(path, json.dumps({"round": round_, "pad": pad}))
+    print(round_, flush=True)
+"""
+
+
+def _read_save(path):
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def test_atomic_write_survives_kill(tmp_path):
+    path = str(tmp_path / "auto_save.json")
+    fileio.atomic_write(path, json.dumps({"round": 0, "pad": PAD}))
+    rnd = random.Random(0)
+    last = 0
+    for _ in range(15):
+        proc = subprocess.Popen(
+            [sys.executable, "-c", WRITER, path],
+            cwd=ROOT,
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        # 等第一次写入完成后再在随机时刻结束，结束时多半正在写下一个版本
+        assert proc.stdout.readline()
+        time.sleep(rnd.uniform(0, 0.05))
+        proc.kill()
+        proc.wait()
+        proc.stdout.close()
+        save = _read_save(path)
+        # 只能是某个完整写入的版本，不能是写了一半的文件
+        assert save["pad"] == PAD
+        assert save["round"] >= 1
+        last = save["round"]
+    assert last >= 1
+
+
+def test_copy_file_keeps_target_when_source_shrinks(tmp_path, monkeypatch):
+    src = tmp_path / "round_1.json"
+    dst = tmp_path / "auto_save.json"
+    src.write_bytes(b"x" * 5000)
+    dst.write_bytes(b"old")
+    real_fstat = os.fstat
+
+    def grown_fstat(fd):
+        # 模拟复制开始后源文件被改短：记录的大小比实际多
+        stat = real_fstat(fd)
+        return os.stat_result((*stat[:6], stat.st_size + 1000, *stat[7:]))
+
+    monkeypatch.setattr(fileio.os, "fstat", grown_fstat)
+    with pytest.raises(OSError):
+        fileio.copy_file(str(src), str(dst))
+    assert dst.read_bytes() == b"old"
+    assert sorted(os.listdir(tmp_path)) == ["auto_save.json", "round_1.json"]
+
+
+@pytest.mark.parametrize("method", ["copy_file_range", "sendfile", "read"])
+def test_copy_fd_raises_on_short_copy(tmp_path, monkeypatch, method):
+    if method != "copy_file_range":
+        monkeypatch.delattr(fileio.os, "copy_file_range", raising=False)
+    if method == "read":
+        monkeypatch.delattr(fileio.os, "sendfile", raising=False)
+    elif not hasattr(os, method):
+        pytest.skip(f"本平台没有 os.{method}")
+    src = tmp_path / "src"
+    src.write_bytes(b"x" * 5000)
+    with open(src, "rb") as fsrc, open(tmp_path / "dst", "wb") as fdst:
+        with pytest.raises(OSError):
+            fileio._copy_fd(fsrc.fileno(), fdst.fileno(), 6000)
+
+
+def test_temp_paths_are_unique():
+    assert fileio._temp_path("a/b.json") != fileio._temp_path("a/b.json")
@@ -0,0 +1,14 @@
+# -*- coding: utf-8 -*-
+from util.fs import MemoryFS
+from util.json_diff import CHANGED, diff_files
+
+
+def test_diff_files_on_memory_fs():
+    fs = MemoryFS()
+    fs.makedirs("/saves")
+    fs.write_bytes("/saves/old.json", b'{"round": 1, "name": "hero"}')
+    fs.write_bytes("/saves/new.json", b'{"round": 2, "name": "hero"}')
+    changes = diff_files("/saves/old.json", "/saves/new.json", fs)
+    assert [(c.kind, c.path, c.old, c.new) for c in changes] == [
+        (CHANGED, ("round",), 1, 2)
+    ]
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+import json
+
+import pytest
+
+from util.fs import MemoryFS
+from util.record_file import append_record, index_records, read_record
+
+PATH = "/saves/user_archive.json"
+
+
+@pytest.fixture
+def fs():
+    fs = MemoryFS()
+    fs.makedirs("/saves")
+    return fs
+
+
+@pytest.mark.parametrize(
+    "content",
+    [
+        b'{"records": []}',
+        b'{"version": 2, "other": [1], "records": [ ], "tail": []}',
+        b'\xef\xbb\xbf{"records": [\n]}',
+    ],
+)
+def test_empty_record_array(fs, content):
+    fs.write_bytes(PATH, content)
+    index = index_records(PATH, chunk_size=8, fs=fs)
+    assert index.key == "records"
+    assert len(index) == 0
+
+    index = append_record(index, {"round": 1, "saveTime": "a"})
+    index = append_record(index, {"round": 2, "saveTime": "b"})
+    with fs.open(PATH, "rb") as f:
+        data = json.loads(f.read().decode("utf-8-sig"))
+    assert data["records"] == [
+        {"round": 1, "saveTime": "a"},
+        {"round": 2, "saveTime": "b"},
+    ]
+
+    index = index_records(PATH, fs=fs)
+    assert len(index) == 2
+    assert read_record(index, 1) == {"round": 2, "saveTime": "b"}
+
+
+def test_object_array_before_empty_array(fs):
+    fs.write_bytes(PATH, b'{"empty": [], "records": [{"round": 3}]}')
+    index = index_records(PATH, fs=fs)
+    assert index.key == "records"
+    assert index.entries[0].header == {"round": 3}
+
+
+def test_no_record_array(fs):
+    fs.write_bytes(PATH, b'{"version": 2, "other": [1]}')
+    with pytest.raises(ValueError, match="没有找到记录数组"):
+        index_records(PATH, fs=fs)
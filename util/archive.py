@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+r"""
+存档包的导出与导入
+
+存档包是一个zip文件，存档按原文件名存放，另有 manifest.json 记录每个存档的
+文件名、大小、修改时间、sha256 以及主角名、难度、回合、保存时间。
+导出和导入都按块流式处理，不会把整个存档读入内存。
+导入时按 sha256 跳过目标目录中已有的相同存档，重复导入同一个存档包不会产生新文件。
+"""
+from datetime import datetime
+import hashlib
+import json
+import os
+import zipfile
+
+import util.logger
+from util.fileio import atomic_open
+from util.fs import local_fs
+from util.save_index import HEADER_KEYS, save_index
+
+log = util.logger.logger(__name__)
+
+MANIFEST = "manifest.json"
+MANIFEST_VERSION = 1
+CHUNK = 1024 * 1024
+
+
+def file_sha256(path: str, fs=local_fs) -> str:
+    digest = hashlib.sha256()
+    with fs.open(path, "rb") as f:
+        for block in iter(lambda: f.read(CHUNK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def export_saves(archive_path: str, save_paths, progress=None, fs=local_fs) -> dict:
+    r"""
+    把存档写入存档包，返回清单
+
+    progress(已完成数量, 总数) 每导出一个存档调用一次；
+    存档从 fs 中读取，存档包本身总是写在本地磁盘上
+    """
+    entries = []
+    total = len(save_paths)
+    with atomic_open(archive_path) as f, zipfile.ZipFile(
+        f, "w", zipfile.ZIP_DEFLATED, compresslevel=6
+    ) as zf:
+        for done, path in enumerate(save_paths, 1):
+            stat = fs.stat(path)
+            try:
+                header = save_index.get_header(path, stat, fs)
+            except (OSError, ValueError):
+                header = {}
+            file_name = os.path.basename(path)
+            info = zipfile.ZipInfo(
+                file_name, datetime.fromtimestamp(stat.st_mtime).timetuple()[:6]
+            )
+            info.external_attr = 0o644 << 16
+            info.compress_type = zipfile.ZIP_DEFLATED
+            digest = hashlib.sha256()
+            with fs.open(path, "rb") as src, zf.open(info, "w") as dst:
+                for block in iter(lambda: src.read(CHUNK), b""):
+                    digest.update(block)
+                    dst.write(block)
+            entry = {
+                "file": file_name,
+                "size": stat.st_size,
+                "mtime": stat.st_mtime,
+                "sha256": digest.hexdigest(),
+            }
+            entry.update({key: header.get(key) for key in HEADER_KEYS})
+            entries.append(entry)
+            if progress is not None:
+                progress(done, total)
+        manifest = {
+            "version": MANIFEST_VERSION,
+            "created": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "saves": entries,
+        }
+        zf.writestr(MANIFEST, json.dumps(manifest, ensure_ascii=False, indent=2))
+    log.info(f"导出存档包 {archive_path}: {len(entries)} 个存档")
+    return manifest
+
+
+def read_manifest(zf: zipfile.ZipFile) -> dict:
+    r"""
+    读取并检查存档包清单，格式不正确时抛出 ValueError
+    """
+    try:
+        manifest = json.loads(zf.read(MANIFEST))
+    except KeyError:
+        raise ValueError("不是存档包: 缺少 manifest.json")
+    if manifest.get("version") != MANIFEST_VERSION:
+        raise ValueError(f"不支持的存档包版本: {manifest.get('version')}")
+    names = set(zf.namelist())
+    for entry in manifest["saves"]:
+        file_name = entry["file"]
+        if file_name not in names:
+            raise ValueError(f"存档包缺少文件: {file_name}")
+        if os.path.basename(file_name) != file_name or not file_name.endswith(".json"):
+            raise ValueError(f"存档包中的文件名不合法: {file_name}")
+    return manifest
+
+
+def _free_name(dest_dir: str, file_name: str, fs=local_fs) -> str:
+    stem = os.path.splitext(file_name)[0]
+    n = 1
+    while True:
+        candidate = f"{stem}_导入{n}.json"
+        if not fs.exists(os.path.join(dest_dir, candidate)):
+            return candidate
+        n += 1
+
+
+def _extract(zf: zipfile.ZipFile, entry: dict, target: str, fs=local_fs):
+    digest = hashlib.sha256()
+    with zf.open(entry["file"]) as src, fs.atomic_open(target) as dst:
+        for block in iter(lambda: src.read(CHUNK), b""):
+            digest.update(block)
+            dst.write(block)
+        if digest.hexdigest() != entry["sha256"]:
+            # 在替换目标文件之前抛出，临时文件会被丢弃
+            raise ValueError("sha256 与清单不一致")
+    # 保留原来的修改时间，列表中的顺序不变
+    fs.set_mtime(target, entry["mtime"])
+
+
+def import_saves(
+    archive_path: str, dest_dir: str, progress=None, fs=local_fs
+) -> dict:
+    r"""
+    把存档包导入到存档目录
+
+    与目录中已有存档内容相同（sha256一致）的跳过；文件名相同但内容不同的改名导入。
+    返回 {"imported": [新文件路径], "skipped": [文件名], "renamed": {原文件名: 新文件名},
+    "failed": [错误信息]}，单个存档损坏不影响其他存档
+    """
+    # 只有大小相同的已有存档才需要计算摘要
+    existing = {}  # 大小 -> [路径]
+    with fs.scandir(dest_dir) as it:
+        for e in it:
+            if e.name.endswith(".json") and e.is_file():
+                existing.setdefault(e.stat().st_size, []).append(e.path)
+    hashes = {}  # 路径 -> sha256
+
+    def has_copy(entry) -> bool:
+        for path in existing.get(entry["size"], []):
+            if path not in hashes:
+                hashes[path] = file_sha256(path, fs)
+            if hashes[path] == entry["sha256"]:
+                return True
+        return False
+
+    result = {"imported": [], "skipped": [], "renamed": {}, "failed": []}
+    with zipfile.ZipFile(archive_path) as zf:
+        manifest = read_manifest(zf)
+        total = len(manifest["saves"])
+        for done, entry in enumerate(manifest["saves"], 1):
+            file_name = entry["file"]
+            if has_copy(entry):
+                result["skipped"].append(file_name)
+            else:
+                target_name = file_name
+                if fs.exists(os.path.join(dest_dir, file_name)):
+                    target_name = _free_name(dest_dir, file_name, fs)
+                    result["renamed"][file_name] = target_name
+                target = os.path.join(dest_dir, target_name)
+                try:
+                    _extract(zf, entry, target, fs)
+                except (ValueError, zipfile.BadZipFile) as e:
+                    log.warning(f"导入存档失败 {file_name}: {e}")
+                    result["failed"].append(f"{file_name}: {e}")
+                    result["renamed"].pop(file_name, None)
+                else:
+                    existing.setdefault(entry["size"], []).append(target)
+                    hashes[target] = entry["sha256"]
+                    result["imported"].append(target)
+            if progress is not None:
+                progress(done, total)
+    log.info(
+        f"导入存档包 {archive_path}: 导入 {len(result['imported'])} 个，"
+        f"跳过 {len(result['skipped'])} 个"
+    )
+    return result
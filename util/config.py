@@ -1,25 +1,181 @@
 # -*- coding: utf-8 -*-
+r"""
+程序配置，保存在当前目录的 config.json 中
+
+每个配置项有固定的类型和默认值（见 OPTIONS），读取到类型不符的值时使用默认值，
+写入类型不符的值时抛出 TypeError。
+修改后不立即写盘，SAVE_DELAY 秒内的多次修改合并为一次原子写入，退出时写入剩余的修改，
+程序崩溃最多丢失最后几秒的修改。
+subscribe 可以监听某个配置项的变化，值真正改变时在调用 set 的线程中回调。
+每个账号有一个独立的小节（profiles 下以 steam_id 为键），保存排序、列宽、窗口位置等界面状态。
+"""
 import json
 import atexit
 import os
+import threading
+
+import util.logger
+from util.fileio import atomic_write
+
+log = util.logger.logger(__name__)
+
+CONFIG_FILE = "config.json"
+# 修改后等待这么多秒再写盘
+SAVE_DELAY = 1.0
+
+# 配置项: (类型, 默认值)，默认值为None表示未设置
+OPTIONS = {
+    "SaveDataDir": (str, None),
+    "steam_id": (str, None),
+    "fsync": (bool, True),
+    "event_debounce_ms": (int, 300),
+    "watch_strategy": (str, "auto"),  # auto、native 或 polling，见 gui.monitor
+    "watch_poll_interval": (float, 2.0),
+    "snapshot_compression": (str, "zlib"),
+    "history_enabled": (bool, False),
+    "history_keyframe_interval": (int, 10),
+    "retention_keep_last": (int, None),
+    "retention_every_rounds": (int, None),
+    "retention_max_mb": (float, None),
+    "retention_auto": (bool, False),
+    "doc_cache_mb": (int, 64),
+    "prefetch_delay_ms": (int, 500),
+    "prefetch_neighbors": (int, 0),  # 预读当前行上下各几个存档，0为只预读对比的存档
+    "profiles": (dict, None),
+}
+
+# 账号小节中的配置项
+PROFILE_OPTIONS = {
+    "sort_keys": (list, None),  # [[列, 顺序]]
+    "column_widths": (list, None),
+    "geometry": (str, None),  # QWidget.saveGeometry() 的base64
+    "named_saves": (list, None),  # 用户命名的存档名，清理时不会删除
+}
+
+
+def _check_type(options: dict, key, value) -> bool:
+    if value is None or key not in options:
+        return True
+    expected = options[key][0]
+    if isinstance(value, bool) and expected is not bool:
+        return False
+    if expected is float:
+        return isinstance(value, (int, float))
+    return isinstance(value, expected)
+
+
+def _default(options: dict, key, default):
+    if default is None and key in options:
+        return options[key][1]
+    return default
 
 
 class Config:
     _config = {}
+    # 第一次访问时才读取config.json，导入本模块不产生磁盘读写
+    _loaded = False
+    _lock = threading.RLock()
+    _subscribers = {}  # key -> [callback(key, value)]
+    _save_timer = None
+    _dirty = False
+
+    @staticmethod
+    def _ensure_loaded():
+        if not Config._loaded:
+            load_data()
 
     @staticmethod
     def get(key, default=None):
-        return Config._config.get(key, default)
+        r"""
+        读取配置项，没有设置时返回 default，default 为None时返回配置项的默认值
+        """
+        Config._ensure_loaded()
+        value = Config._config.get(key)
+        if value is None:
+            return _default(OPTIONS, key, default)
+        return value
 
     @staticmethod
     def set(key, value):
-        Config._config[key] = value
+        r"""
+        修改配置项并安排写盘，值改变时通知订阅者
+        """
+        if not _check_type(OPTIONS, key, value):
+            raise TypeError(f"配置项 {key} 的类型应为 {OPTIONS[key][0].__name__}")
+        Config._ensure_loaded()
+        with Config._lock:
+            if key in Config._config and Config._config[key] == value:
+                return
+            Config._config[key] = value
+            schedule_save()
+        Config._notify(key, value)
 
     @staticmethod
     def getset(key, default=None):
-        if key not in Config._config:
-            Config._config[key] = default
-        return Config._config[key]
+        r"""
+        读取配置项，没有设置时把默认值写入配置，方便用户在 config.json 中修改
+        """
+        Config._ensure_loaded()
+        with Config._lock:
+            if Config._config.get(key) is None:
+                default = _default(OPTIONS, key, default)
+                if default is None:
+                    return None
+                Config._config[key] = default
+                schedule_save()
+            return Config._config[key]
+
+    @staticmethod
+    def subscribe(key, callback):
+        r"""
+        配置项 key 的值改变时调用 callback(key, value)
+        """
+        Config._subscribers.setdefault(key, []).append(callback)
+
+    @staticmethod
+    def unsubscribe(key, callback):
+        callbacks = Config._subscribers.get(key, [])
+        if callback in callbacks:
+            callbacks.remove(callback)
+
+    @staticmethod
+    def _notify(key, value):
+        for callback in list(Config._subscribers.get(key, ())):
+            try:
+                callback(key, value)
+            except Exception:
+                log.exception(f"配置项 {key} 的订阅者出错")
+
+    @staticmethod
+    def get_profile(steam_id, key, default=None):
+        r"""
+        读取账号小节中的配置项
+        """
+        section = (Config.get("profiles") or {}).get(steam_id)
+        value = section.get(key) if isinstance(section, dict) else None
+        if value is None or not _check_type(PROFILE_OPTIONS, key, value):
+            return _default(PROFILE_OPTIONS, key, default)
+        return value
+
+    @staticmethod
+    def set_profile(steam_id, key, value):
+        r"""
+        修改账号小节中的配置项并安排写盘，不通知订阅者
+        """
+        if not _check_type(PROFILE_OPTIONS, key, value):
+            raise TypeError(
+                f"账号配置项 {key} 的类型应为 {PROFILE_OPTIONS[key][0].__name__}"
+            )
+        Config._ensure_loaded()
+        with Config._lock:
+            profiles = Config._config.setdefault("profiles", {})
+            section = profiles.get(steam_id)
+            if not isinstance(section, dict):
+                section = profiles[steam_id] = {}
+            if section.get(key) == value:
+                return
+            section[key] = value
+            schedule_save()
 
     @staticmethod
     def __getitem__(key):
@@ -31,19 +187,63 @@ class Config:
 
     @staticmethod
     def __contains__(key):
+        Config._ensure_loaded()
         return key in Config._config
 
 
 def load_data():
-    if os.path.exists("config.json"):
-        with open("config.json", "r") as file:
-            Config._config = json.load(file)
+    Config._loaded = True
+    if not os.path.exists(CONFIG_FILE):
+        return
+    try:
+        with open(CONFIG_FILE, "r", encoding="utf8") as file:
+            config = json.load(file)
+    except (OSError, ValueError) as e:
+        log.warning(f"配置文件损坏，使用默认配置: {e}")
+        return
+    if not isinstance(config, dict):
+        log.warning("配置文件格式错误，使用默认配置")
+        return
+    for key, value in list(config.items()):
+        if not _check_type(OPTIONS, key, value):
+            log.warning(f"配置项 {key} 的值 {value!r} 类型错误，使用默认值")
+            del config[key]
+    profiles = config.get("profiles") or {}
+    for steam_id, section in list(profiles.items()):
+        if not isinstance(section, dict):
+            log.warning(f"账号 {steam_id} 的配置 {section!r} 格式错误，已忽略")
+            del profiles[steam_id]
+    Config._config = config
+
+
+def schedule_save():
+    r"""
+    SAVE_DELAY 秒后写盘，期间的修改合并为一次写入
+    """
+    with Config._lock:
+        Config._dirty = True
+        if Config._save_timer is not None:
+            return
+        Config._save_timer = threading.Timer(SAVE_DELAY, save_data)
+        Config._save_timer.daemon = True
+        Config._save_timer.start()
 
 
 def save_data():
-    with open("config.json", "w") as file:
-        json.dump(Config._config, file)
+    # 写盘时持有锁，定时写入和退出时的写入不会同时进行
+    with Config._lock:
+        if Config._save_timer is not None:
+            Config._save_timer.cancel()
+            Config._save_timer = None
+        if not Config._dirty:
+            return
+        try:
+            atomic_write(
+                CONFIG_FILE, json.dumps(Config._config, ensure_ascii=False, indent=2)
+            )
+            Config._dirty = False
+        except OSError as e:
+            log.warning(f"保存配置失败: {e}")
 
 
 atexit.register(save_data)
-load_data()
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+r"""
+运行计数器
+
+记录收到的文件事件数量、合并掉的事件数量、解析存档头部的次数和耗时等，
+可以在任意线程累加，需要时通过 snapshot() 或 dump() 取出。
+"""
+from contextlib import contextmanager
+import threading
+import time
+
+
+class Counters:
+    def __init__(self):
+        self._values = {}  # 名称 -> 数值
+        self._lock = threading.Lock()
+
+    def add(self, name: str, value=1):
+        with self._lock:
+            self._values[name] = self._values.get(name, 0) + value
+
+    @contextmanager
+    def timed(self, name: str):
+        r"""
+        累加代码块的次数和耗时，分别记在 name 和 name_seconds 下
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self._values[name] = self._values.get(name, 0) + 1
+                key = name + "_seconds"
+                self._values[key] = self._values.get(key, 0.0) + elapsed
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(self._values)
+
+    def reset(self):
+        with self._lock:
+            self._values = {}
+
+    def dump(self, log=None) -> str:
+        r"""
+        返回按名称排列的计数文本，给出 log 时同时写入日志
+        """
+        lines = []
+        for name, value in sorted(self.snapshot().items()):
+            if isinstance(value, float):
+                lines.append(f"{name}: {value:.3f} s")
+            else:
+                lines.append(f"{name}: {value}")
+        text = "\n".join(lines)
+        if log is not None:
+            log.info("运行统计:\n%s", text)
+        return text
+
+
+counters = Counters()
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+r"""
+解析后存档的LRU缓存
+
+LRUCache 按总字节数限制大小，超出时淘汰最久未使用的项，可以在任意线程使用。
+DocumentCache 缓存解析后的存档，以文件大小和修改时间判断是否过期；
+文件事件到来时由界面调用 invalidate。解析后的Python对象占用的内存是JSON文件的数倍，
+缓存的大小按 parsed_size 估算的内存计算，而不是文件的字节数。
+"""
+from collections import OrderedDict
+import json
+import threading
+
+from util.fs import local_fs
+
+# 解析后的存档占用的内存约为JSON文件大小的倍数（tracemalloc 实测，20KB~600KB的存档为3.2~4.5倍）
+PARSED_SIZE_FACTOR = 4.5
+
+
+def parsed_size(file_bytes: int) -> int:
+    r"""
+    估算把 file_bytes 字节的JSON解析成Python对象后占用的内存
+    """
+    return int(file_bytes * PARSED_SIZE_FACTOR)
+
+
+class LRUCache:
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._items = OrderedDict()  # 键 -> (值, 字节数)
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def get(self, key, default=None, valid=None):
+        r"""
+        取出一项并标记为最近使用；valid(值) 为False的项视为未命中
+        """
+        with self._lock:
+            item = self._items.get(key)
+            if item is None or (valid is not None and not valid(item[0])):
+                self.misses += 1
+                return default
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def put(self, key, value, cost: int):
+        r"""
+        放入一项，单项超过上限时不缓存
+        """
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            if cost > self.max_bytes:
+                return
+            self._items[key] = (value, cost)
+            self.bytes += cost
+            while self.bytes > self.max_bytes:
+                _, (_, evicted) = self._items.popitem(last=False)
+                self.bytes -= evicted
+                self.evictions += 1
+
+    def discard(self, key):
+        with self._lock:
+            item = self._items.pop(key, None)
+            if item is not None:
+                self.bytes -= item[1]
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.bytes = 0
+
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats_text(self) -> str:
+        return (
+            f"{len(self._items)} 项，命中率 {self.hit_rate():.0%}"
+            f"（命中 {self.hits}，未命中 {self.misses}，淘汰 {self.evictions}），"
+            f"估计占用内存 {self.bytes / 1048576:.1f} / {self.max_bytes / 1048576:.0f} MB"
+        )
+
+
+class DocumentCache(LRUCache):
+    r"""
+    解析后的存档文档，键为文件路径
+    """
+
+    def __init__(self, max_bytes: int, fs=local_fs):
+        super().__init__(max_bytes)
+        self.fs = fs
+
+    def _version(self, file_path: str):
+        stat = self.fs.stat(file_path)
+        return stat.st_size, stat.st_mtime
+
+    def peek(self, file_path: str):
+        r"""
+        缓存中有最新的文档时返回它，否则返回None，不读取文件
+        """
+        try:
+            version = self._version(file_path)
+        except OSError:
+            return None
+        item = self.get(file_path, valid=lambda item: item[0] == version)
+        return None if item is None else item[1]
+
+    def load(self, file_path: str):
+        r"""
+        返回解析后的存档，缓存中没有或文件已修改时重新读取
+        """
+        version = self._version(file_path)
+        item = self.get(file_path, valid=lambda item: item[0] == version)
+        if item is not None:
+            return item[1]
+        with self.fs.open(file_path, "r", encoding="utf8") as f:
+            doc = json.load(f)
+        self.put(file_path, (version, doc), parsed_size(version[0]))
+        return doc
+
+    def invalidate(self, file_path: str):
+        self.discard(file_path)
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+r"""
+文件事件合并
+
+游戏保存一次存档往往会触发多次修改事件。这里按路径缓存一个时间窗口内的事件，
+把创建、修改、删除的序列合并成一个最终变化，再整批交给界面处理。
+"""
+import threading
+
+from util.counters import counters
+
+CREATED = "created"
+MODIFIED = "modified"
+DELETED = "deleted"
+
+
+def net_change(first: str, last: str) -> str:
+    r"""
+    根据窗口内第一个和最后一个事件得出最终变化，没有变化时返回None
+    """
+    existed_before = first != CREATED
+    exists_after = last != DELETED
+    if existed_before and exists_after:
+        return MODIFIED
+    if existed_before:
+        return DELETED
+    if exists_after:
+        return CREATED
+    return None
+
+
+class EventCoalescer:
+    def __init__(self):
+        self._pending = {}  # file_path -> [first_kind, last_kind]
+        self._lock = threading.Lock()
+        self.received = 0
+        self.coalesced = 0
+
+    def push(self, kind: str, file_path: str) -> bool:
+        r"""
+        记录一个事件，可在任意线程调用
+
+        返回True表示这是当前窗口的第一个事件，调用方应安排一次 drain
+        """
+        with self._lock:
+            self.received += 1
+            first = not self._pending
+            entry = self._pending.get(file_path)
+            if entry is None:
+                self._pending[file_path] = [kind, kind]
+            else:
+                entry[1] = kind
+                self.coalesced += 1
+        counters.add("events_received")
+        if entry is not None:
+            counters.add("events_coalesced")
+        return first
+
+    def drain(self) -> dict:
+        r"""
+        取出当前窗口内所有路径的最终变化 {文件路径: 变化}
+        """
+        with self._lock:
+            pending = self._pending
+            self._pending = {}
+        changes = {}
+        for file_path, (first, last) in pending.items():
+            change = net_change(first, last)
+            if change is not None:
+                changes[file_path] = change
+        return changes
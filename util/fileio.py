@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+r"""
+原子文件写入
+
+所有写入都先写到同目录的临时文件，再用 os.replace 替换目标文件。
+游戏在写入过程中读取文件、或者本程序中途退出，都只会看到完整的旧文件或新文件。
+复制文件时优先使用 copy_file_range / sendfile，在内核中完成复制。
+"""
+from contextlib import contextmanager
+import itertools
+import json
+import os
+import shutil
+
+COPY_CHUNK = 1024 * 1024
+
+# 每次写入使用不同的临时文件，多个线程同时写同一个目标时不会共用一个临时文件
+_temp_serial = itertools.count()
+
+
+def _temp_path(path: str) -> str:
+    # 临时文件放在同一目录下，保证 os.replace 不跨文件系统
+    directory, name = os.path.split(path)
+    return os.path.join(directory, f".{name}.{os.getpid()}.{next(_temp_serial)}.tmp")
+
+
+def _truncated(size: int, copied: int) -> OSError:
+    return OSError(f"复制时源文件变短: 应复制 {size} 字节，只读到 {copied} 字节")
+
+
+def _fsync_dir(directory: str):
+    # 替换后同步目录项，保证改名本身落盘；Windows不支持打开目录
+    if os.name != "posix":
+        return
+    fd = os.open(directory or ".", os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _replace(tmp_path: str, path: str, fsync: bool):
+    try:
+        os.replace(tmp_path, path)
+    except BaseException:
+        _discard(tmp_path)
+        raise
+    if fsync:
+        _fsync_dir(os.path.dirname(path))
+
+
+def _discard(tmp_path: str):
+    try:
+        os.remove(tmp_path)
+    except OSError:
+        pass
+
+
+def atomic_write(path: str, data, fsync: bool = False, encoding: str = "utf8"):
+    r"""
+    原子地写入 data（bytes 或 str）
+    """
+    if isinstance(data, str):
+        data = data.encode(encoding)
+    tmp_path = _temp_path(path)
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+    except BaseException:
+        _discard(tmp_path)
+        raise
+    _replace(tmp_path, path, fsync)
+
+
+@contextmanager
+def atomic_open(path: str, fsync: bool = False):
+    r"""
+    以二进制写入方式打开临时文件，用于流式写入；正常结束时替换目标文件，出错时丢弃
+    """
+    tmp_path = _temp_path(path)
+    try:
+        with open(tmp_path, "wb") as f:
+            yield f
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+    except BaseException:
+        _discard(tmp_path)
+        raise
+    _replace(tmp_path, path, fsync)
+
+
+def atomic_write_json(path: str, data, fsync: bool = False, **kwargs):
+    r"""
+    原子地写入JSON，默认 ensure_ascii=False
+    """
+    kwargs.setdefault("ensure_ascii", False)
+    # json.dumps 使用C实现的编码器，比 json.dump 逐段写入快得多
+    atomic_write(path, json.dumps(data, **kwargs), fsync)
+
+
+def _write_all(fd: int, data: bytes):
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view) :]
+
+
+def _copy_fd(src_fd: int, dst_fd: int, size: int, offset: int = 0):
+    # 把 src 中从 offset 开始的 size 个字节复制到 dst 的当前位置
+    # 依次尝试 copy_file_range、sendfile，都不可用时退回普通读写
+    # 源文件在复制过程中变短（例如游戏正在重写存档）时抛出 OSError，不能把不完整的内容当作完整副本
+    copied = 0
+    if hasattr(os, "copy_file_range"):
+        try:
+            while copied < size:
+                n = os.copy_file_range(
+                    src_fd, dst_fd, size - copied, offset + copied
+                )
+                if n == 0:
+                    break
+                copied += n
+        except OSError:
+            if copied:
+                raise
+        if copied == size:
+            return
+        if copied:
+            raise _truncated(size, copied)
+        # 一个字节都没有复制时，可能是文件系统不支持，换下一种方式
+    if hasattr(os, "sendfile") and os.name == "posix":
+        try:
+            while copied < size:
+                n = os.sendfile(dst_fd, src_fd, offset + copied, size - copied)
+                if n == 0:
+                    break
+                copied += n
+        except OSError:
+            if copied:
+                raise
+        if copied == size:
+            return
+        if copied:
+            raise _truncated(size, copied)
+    os.lseek(src_fd, offset, os.SEEK_SET)
+    while copied < size:
+        block = os.read(src_fd, min(COPY_CHUNK, size - copied))
+        if not block:
+            raise _truncated(size, copied)
+        _write_all(dst_fd, block)
+        copied += len(block)
+
+
+def copy_file(src: str, dst: str, fsync: bool = False, copy_stat: bool = True):
+    r"""
+    原子地把 src 复制到 dst，copy_stat 时同时复制修改时间等元数据（同 shutil.copy2）
+    """
+    tmp_path = _temp_path(dst)
+    try:
+        with open(src, "rb") as fsrc, open(tmp_path, "wb") as fdst:
+            _copy_fd(fsrc.fileno(), fdst.fileno(), os.fstat(fsrc.fileno()).st_size)
+            if fsync:
+                fdst.flush()
+                os.fsync(fdst.fileno())
+        if copy_stat:
+            shutil.copystat(src, tmp_path)
+    except BaseException:
+        _discard(tmp_path)
+        raise
+    _replace(tmp_path, dst, fsync)
+
+
+def atomic_insert(path: str, offset: int, data: bytes, fsync: bool = False):
+    r"""
+    在文件的 offset 处插入 data，原子地替换原文件
+
+    插入点前后的内容直接在内核中复制，不读入内存也不重新解析
+    """
+    tmp_path = _temp_path(path)
+    try:
+        with open(path, "rb") as fsrc, open(tmp_path, "wb") as fdst:
+            src_fd, dst_fd = fsrc.fileno(), fdst.fileno()
+            size = os.fstat(src_fd).st_size
+            if not 0 <= offset <= size:
+                raise ValueError(f"插入位置超出文件范围: {offset}")
+            _copy_fd(src_fd, dst_fd, offset)
+            _write_all(dst_fd, data)
+            _copy_fd(src_fd, dst_fd, size - offset, offset)
+            if fsync:
+                os.fsync(dst_fd)
+    except BaseException:
+        _discard(tmp_path)
+        raise
+    _replace(tmp_path, path, fsync)
@@ -0,0 +1,315 @@
+# -*- coding: utf-8 -*-
+r"""
+存档目录的文件系统接口
+
+存档库、头部解析、记录文件和界面对游戏存档目录的读写都通过这里，不直接调用 os 和 open。
+LocalFS 是本地磁盘，写入都是原子的（见 util.fileio）；
+MemoryFS 把文件放在内存中，用于测试和基准测试，不依赖磁盘速度，也可以在没有游戏的机器上运行。
+
+scandir 返回的条目和 os.DirEntry 一样有 name、path、is_dir()、is_file()、stat()，
+stat 的结果至少有 st_size 和 st_mtime。
+"""
+from collections import namedtuple
+from contextlib import contextmanager
+import io
+import json
+import os
+import threading
+import time
+
+from util.event_coalescer import CREATED, MODIFIED, DELETED
+from util.fileio import (
+    atomic_insert,
+    atomic_open,
+    atomic_write,
+    atomic_write_json,
+    copy_file,
+)
+
+FileStat = namedtuple("FileStat", "st_size st_mtime")
+
+
+class LocalFS:
+    r"""
+    本地文件系统
+    """
+
+    # 是否是本地磁盘上的真实目录，可以用系统的文件管理器打开和用 watchdog 监控
+    local = True
+
+    def scandir(self, path: str):
+        return os.scandir(path)
+
+    def stat(self, path: str):
+        return os.stat(path)
+
+    def exists(self, path: str) -> bool:
+        return os.path.exists(path)
+
+    def isdir(self, path: str) -> bool:
+        return os.path.isdir(path)
+
+    def open(self, path: str, mode: str = "r", encoding: str = None):
+        return open(path, mode, encoding=encoding)
+
+    def makedirs(self, path: str):
+        os.makedirs(path, exist_ok=True)
+
+    def atomic_open(self, path: str, fsync: bool = False):
+        return atomic_open(path, fsync)
+
+    def write_bytes(self, path: str, data: bytes, fsync: bool = False):
+        atomic_write(path, data, fsync)
+
+    def write_json(self, path: str, data, fsync: bool = False, **kwargs):
+        atomic_write_json(path, data, fsync, **kwargs)
+
+    def copy(self, src: str, dst: str, fsync: bool = False, copy_stat: bool = True):
+        copy_file(src, dst, fsync, copy_stat)
+
+    def insert(self, path: str, offset: int, data: bytes, fsync: bool = False):
+        atomic_insert(path, offset, data, fsync)
+
+    def copy_out(self, src: str, dst: str):
+        r"""
+        把文件复制到本地磁盘上的 dst（如用户选择的导出目录）
+        """
+        copy_file(src, dst)
+
+    def remove(self, path: str):
+        os.remove(path)
+
+    def set_mtime(self, path: str, mtime: float):
+        os.utime(path, (mtime, mtime))
+
+
+class _MemoryEntry:
+    __slots__ = ("name", "path", "_stat")
+
+    def __init__(self, name, path, stat):
+        self.name = name
+        self.path = path
+        self._stat = stat  # 目录为None
+
+    def is_dir(self):
+        return self._stat is None
+
+    def is_file(self):
+        return self._stat is not None
+
+    def stat(self):
+        if self._stat is None:
+            return FileStat(0, 0.0)
+        return self._stat
+
+
+class _MemoryWriter(io.BytesIO):
+    # 关闭时才把内容写入文件系统，和原子写入一样不会读到写了一半的文件
+    def __init__(self, fs, path):
+        super().__init__()
+        self._fs = fs
+        self._path = path
+
+    def close(self):
+        if not self.closed:
+            self._fs.write_bytes(self._path, self.getvalue())
+        super().close()
+
+
+class _ScanContext:
+    # 让 MemoryFS.scandir 和 os.scandir 一样可以用在 with 语句中
+    def __init__(self, entries):
+        self._entries = entries
+
+    def __enter__(self):
+        return iter(self._entries)
+
+    def __exit__(self, *exc):
+        return False
+
+    def __iter__(self):
+        return iter(self._entries)
+
+
+class MemoryFS:
+    r"""
+    内存文件系统，可以在多个线程中使用
+
+    文件被写入或删除时通知 monitor() 返回的监控对象，和本地目录的 watchdog 监控一样
+    把 (变化, 文件路径) 交给 push
+    """
+
+    local = False
+
+    def __init__(self):
+        self._files = {}  # 路径 -> [内容, 修改时间]
+        self._dirs = set()
+        self._monitors = []
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _norm(path: str) -> str:
+        return os.path.normpath(path)
+
+    def _missing(self, path):
+        return FileNotFoundError(2, "No such file or directory", path)
+
+    def _notify(self, kind, path):
+        for monitor in list(self._monitors):
+            monitor.notify(kind, path)
+
+    def scandir(self, path: str):
+        path = self._norm(path)
+        with self._lock:
+            if path not in self._dirs:
+                raise self._missing(path)
+            entries = [
+                _MemoryEntry(
+                    os.path.basename(file_path),
+                    file_path,
+                    FileStat(len(data), mtime),
+                )
+                for file_path, (data, mtime) in self._files.items()
+                if os.path.dirname(file_path) == path
+            ]
+            entries.extend(
+                _MemoryEntry(os.path.basename(d), d, None)
+                for d in self._dirs
+                if os.path.dirname(d) == path and d != path
+            )
+        return _ScanContext(entries)
+
+    def stat(self, path: str):
+        path = self._norm(path)
+        with self._lock:
+            item = self._files.get(path)
+            if item is None:
+                if path in self._dirs:
+                    return FileStat(0, 0.0)
+                raise self._missing(path)
+            return FileStat(len(item[0]), item[1])
+
+    def exists(self, path: str) -> bool:
+        path = self._norm(path)
+        return path in self._files or path in self._dirs
+
+    def isdir(self, path: str) -> bool:
+        return self._norm(path) in self._dirs
+
+    def read_bytes(self, path: str) -> bytes:
+        path = self._norm(path)
+        with self._lock:
+            item = self._files.get(path)
+        if item is None:
+            raise self._missing(path)
+        return item[0]
+
+    def open(self, path: str, mode: str = "r", encoding: str = None):
+        if "w" in mode:
+            writer = _MemoryWriter(self, path)
+            if "b" in mode:
+                return writer
+            return io.TextIOWrapper(writer, encoding=encoding or "utf8")
+        data = io.BytesIO(self.read_bytes(path))
+        if "b" in mode:
+            return data
+        return io.TextIOWrapper(data, encoding=encoding or "utf8")
+
+    def makedirs(self, path: str):
+        path = self._norm(path)
+        with self._lock:
+            while path not in self._dirs:
+                self._dirs.add(path)
+                parent = os.path.dirname(path)
+                if parent == path:
+                    break
+                path = parent
+
+    def write_bytes(self, path: str, data: bytes, fsync: bool = False):
+        path = self._norm(path)
+        with self._lock:
+            if os.path.dirname(path) not in self._dirs:
+                raise self._missing(os.path.dirname(path))
+            kind = MODIFIED if path in self._files else CREATED
+            self._files[path] = [bytes(data), time.time()]
+        self._notify(kind, path)
+
+    @contextmanager
+    def atomic_open(self, path: str, fsync: bool = False):
+        # 正常结束时才写入，出错时文件不变
+        buffer = io.BytesIO()
+        yield buffer
+        self.write_bytes(path, buffer.getvalue())
+
+    def write_json(self, path: str, data, fsync: bool = False, **kwargs):
+        kwargs.setdefault("ensure_ascii", False)
+        self.write_bytes(path, json.dumps(data, **kwargs).encode("utf8"))
+
+    def copy(self, src: str, dst: str, fsync: bool = False, copy_stat: bool = True):
+        data = self.read_bytes(src)
+        self.write_bytes(dst, data)
+        if copy_stat:
+            self.set_mtime(dst, self.stat(src).st_mtime)
+
+    def insert(self, path: str, offset: int, data: bytes, fsync: bool = False):
+        old = self.read_bytes(path)
+        self.write_bytes(path, old[:offset] + data + old[offset:])
+
+    def copy_out(self, src: str, dst: str):
+        atomic_write(dst, self.read_bytes(src))
+
+    def remove(self, path: str):
+        path = self._norm(path)
+        with self._lock:
+            if self._files.pop(path, None) is None:
+                raise self._missing(path)
+        self._notify(DELETED, path)
+
+    def set_mtime(self, path: str, mtime: float):
+        path = self._norm(path)
+        with self._lock:
+            if path not in self._files:
+                raise self._missing(path)
+            self._files[path][1] = mtime
+
+    def monitor(self, push, accept=None):
+        return MemoryMonitor(self, push, accept)
+
+
+class MemoryMonitor:
+    r"""
+    MemoryFS 的目录监控，接口与 gui.monitor.SaveMonitor 相同
+
+    accept(文件路径) 为False的文件不通知，例如不是存档的 global.json
+    """
+
+    def __init__(self, fs: MemoryFS, push, accept=None):
+        self.fs = fs
+        self.push = push
+        self.accept = accept
+        self._dirs = set()
+        self._running = False
+
+    def notify(self, kind, path):
+        if not self._running or os.path.dirname(path) not in self._dirs:
+            return
+        if self.accept is None or self.accept(path):
+            self.push(kind, path)
+
+    def watch(self, save_dir: str):
+        self._dirs.add(os.path.normpath(save_dir))
+
+    def unwatch(self, save_dir: str):
+        self._dirs.discard(os.path.normpath(save_dir))
+
+    def start(self):
+        self._running = True
+        self.fs._monitors.append(self)
+
+    def stop(self):
+        self._running = False
+        if self in self.fs._monitors:
+            self.fs._monitors.remove(self)
+
+
+local_fs = LocalFS()
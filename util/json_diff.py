@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+r"""
+存档结构化对比
+
+比较两个存档（JSON）并给出增加、删除、修改的字段列表。
+对象按键比较；数组中的对象有唯一的 id 类字段时按 id 配对，与顺序无关，
+否则先计算每一项的摘要，相同的项直接跳过，只对不同的一段逐项比较。
+
+    from util.json_diff import diff_files, format_path
+    for change in diff_files("round_1.json", "round_2.json"):
+        print(change.kind, format_path(change.path), change.old, change.new)
+"""
+from collections import namedtuple
+from difflib import SequenceMatcher
+import hashlib
+import json
+
+from util.fs import local_fs
+
+ADDED = "added"
+REMOVED = "removed"
+CHANGED = "changed"
+
+# kind: 变化类型，path: 从根到该字段的路径，old/new: 旧值和新值（增加时old为None，删除时new为None）
+Change = namedtuple("Change", "kind path old new")
+# 按 id 配对的数组项在路径中的表示
+ItemId = namedtuple("ItemId", "key value")
+
+# 按顺序尝试的数组项 id 字段
+ID_KEYS = ("uid", "guid", "id", "key")
+
+_missing = object()
+
+
+def _digest(value):
+    r"""
+    数组项的摘要，摘要相同即认为内容相同
+    """
+    if value is None or isinstance(value, (str, int, float, bool)):
+        # 标量直接用值本身，带上类型区分 1 和 True
+        return (type(value).__name__, value)
+    text = json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.blake2b(text.encode("utf8"), digest_size=16).digest()
+
+
+def _same(a, b) -> bool:
+    r"""
+    类型严格的相等比较，True、1 和 1.0 互不相等
+
+    容器先用 == 快速排除不同的情况；== 成立时再比较序列化结果，
+    因为 [1] == [1.0]、{"v": True} == {"v": 1} 在Python中也成立
+    """
+    if a is b:
+        return True
+    if type(a) is not type(b) or a != b:
+        return False
+    if isinstance(a, (dict, list)):
+        return json.dumps(a, sort_keys=True) == json.dumps(b, sort_keys=True)
+    return True
+
+
+def _find_id_key(old: list, new: list):
+    r"""
+    找出两个数组共同的唯一 id 字段，没有时返回None
+    """
+    if not old or not new:
+        return None
+    items = old + new
+    if not all(isinstance(item, dict) for item in items):
+        return None
+    for key in ID_KEYS:
+        for side in (old, new):
+            values = [item.get(key, _missing) for item in side]
+            if any(
+                v is _missing or isinstance(v, bool) or not isinstance(v, (str, int))
+                for v in values
+            ):
+                break
+            if len(set(values)) != len(values):
+                break
+        else:
+            return key
+    return None
+
+
+def format_path(path) -> str:
+    r"""
+    把路径转换为 cards[uid=3].tag.t1 形式的文字
+    """
+    parts = []
+    for key in path:
+        if isinstance(key, ItemId):
+            parts.append(f"[{key.key}={key.value}]")
+        elif isinstance(key, int):
+            parts.append(f"[{key}]")
+        else:
+            parts.append(f".{key}" if parts else str(key))
+    return "".join(parts) or "(根)"
+
+
+class _Differ:
+    def __init__(self):
+        self.changes = []
+
+    def compare(self, old, new, path: tuple):
+        if isinstance(old, dict) and isinstance(new, dict):
+            self._compare_dict(old, new, path)
+        elif isinstance(old, list) and isinstance(new, list):
+            self._compare_list(old, new, path)
+        elif type(old) is not type(new) or old != new:
+            self.changes.append(Change(CHANGED, path, old, new))
+
+    def _compare_dict(self, old: dict, new: dict, path: tuple):
+        for key, old_value in old.items():
+            new_value = new.get(key, _missing)
+            if new_value is _missing:
+                self.changes.append(Change(REMOVED, path + (key,), old_value, None))
+            elif not _same(old_value, new_value):
+                self.compare(old_value, new_value, path + (key,))
+        for key, new_value in new.items():
+            if key not in old:
+                self.changes.append(Change(ADDED, path + (key,), None, new_value))
+
+    def _compare_list(self, old: list, new: list, path: tuple):
+        id_key = _find_id_key(old, new)
+        if id_key is not None:
+            self._compare_by_id(old, new, path, id_key)
+            return
+        old_digests = [_digest(item) for item in old]
+        new_digests = [_digest(item) for item in new]
+        # 先去掉相同的前缀和后缀，只对中间一段做序列匹配
+        start = 0
+        limit = min(len(old), len(new))
+        while start < limit and old_digests[start] == new_digests[start]:
+            start += 1
+        end = 0
+        while (
+            end < limit - start
+            and old_digests[len(old) - 1 - end] == new_digests[len(new) - 1 - end]
+        ):
+            end += 1
+        matcher = SequenceMatcher(
+            None,
+            old_digests[start : len(old) - end],
+            new_digests[start : len(new) - end],
+            autojunk=False,
+        )
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag == "equal":
+                continue
+            i1, i2, j1, j2 = i1 + start, i2 + start, j1 + start, j2 + start
+            # 位置对应的项逐项比较，多出来的部分算作增加或删除
+            paired = min(i2 - i1, j2 - j1)
+            for k in range(paired):
+                self.compare(old[i1 + k], new[j1 + k], path + (j1 + k,))
+            for i in range(i1 + paired, i2):
+                self.changes.append(Change(REMOVED, path + (i,), old[i], None))
+            for j in range(j1 + paired, j2):
+                self.changes.append(Change(ADDED, path + (j,), None, new[j]))
+
+    def _compare_by_id(self, old: list, new: list, path: tuple, id_key: str):
+        old_items = {item[id_key]: item for item in old}
+        new_ids = set()
+        for item in new:
+            item_id = item[id_key]
+            new_ids.add(item_id)
+            old_item = old_items.get(item_id)
+            item_path = path + (ItemId(id_key, item_id),)
+            if old_item is None:
+                self.changes.append(Change(ADDED, item_path, None, item))
+            elif not _same(old_item, item):
+                self._compare_dict(old_item, item, item_path)
+        for item in old:
+            if item[id_key] not in new_ids:
+                item_path = path + (ItemId(id_key, item[id_key]),)
+                self.changes.append(Change(REMOVED, item_path, item, None))
+
+
+def diff(old, new) -> list:
+    r"""
+    比较两个JSON值，返回 Change 列表；数组按 id 配对时不报告顺序的变化
+    """
+    differ = _Differ()
+    differ.compare(old, new, ())
+    return differ.changes
+
+
+def diff_files(old_path: str, new_path: str, fs=local_fs) -> list:
+    r"""
+    比较两个存档文件，fs 为文件所在的文件系统
+    """
+    with fs.open(old_path, "r", encoding="utf8") as f:
+        old = json.load(f)
+    with fs.open(new_path, "r", encoding="utf8") as f:
+        new = json.load(f)
+    return diff(old, new)
+
+
+def summarize(changes) -> dict:
+    r"""
+    按顶层字段统计变化数量，例如 {"cards": {"added": 2, "changed": 5}}
+    """
+    summary = {}
+    for change in changes:
+        top = format_path(change.path[:1])
+        counts = summary.setdefault(top, {})
+        counts[change.kind] = counts.get(change.kind, 0) + 1
+    return summary
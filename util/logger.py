@@ -1,26 +1,115 @@
 # -*- coding: utf-8 -*-
+r"""
+日志
+
+各模块的日志记录只把记录放进队列，由后台的 QueueListener 线程格式化并写入文件，
+监控线程和界面线程都不会等待磁盘。日志文件按大小轮转。
+启动参数 --debug 输出调试日志，--log-json 另外写一份每行一个JSON的日志。
+
+热点路径请使用 log.debug("... %s", 参数) 的形式：级别关闭时不会格式化消息，
+级别打开时也在后台线程中才格式化。参数应为字符串、数字等不可变的值。
+"""
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+import atexit
+import json
 import logging
-import sys
 import os
+import queue
+import sys
 
 DEBUG = "--debug" in sys.argv
+JSON_LOG = "--log-json" in sys.argv
 
+LOG_DIR = "log"
+LOG_FILE = os.path.join(LOG_DIR, "sultan_saver.log")
+JSON_LOG_FILE = os.path.join(LOG_DIR, "sultan_saver.jsonl")
+# 单个日志文件的大小上限和保留的旧文件数量
+MAX_BYTES = 2 * 1024 * 1024
+BACKUP_COUNT = 3
+
+_queue_handler = None
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    r"""
+    每条记录输出为一行JSON
+    """
+
+    def format(self, record):
+        entry = {
+            "time": record.created,
+            "logger": record.name,
+            "level": record.levelname,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
 
-def logger(name: str) -> logging.Logger:
-    logger = logging.getLogger(name)
 
-    os.makedirs("log", exist_ok=True)
+class _LazyQueueHandler(QueueHandler):
+    r"""
+    记录原样放入队列，消息的格式化留给写文件的后台线程
+    """
 
-    # Set up file handler
-    file_handler = logging.FileHandler(f"log/{name}.log")
-    file_formatter = logging.Formatter(
-        "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    def prepare(self, record):
+        return record
+
+
+def _file_handler(path: str, formatter: logging.Formatter) -> logging.Handler:
+    handler = RotatingFileHandler(
+        path, maxBytes=MAX_BYTES, backupCount=BACKUP_COUNT, encoding="utf8"
     )
-    file_handler.setFormatter(file_formatter)
+    handler.setFormatter(formatter)
+    return handler
+
+
+def _shared_queue_handler() -> logging.Handler:
+    r"""
+    所有模块共用一个队列处理器，第一次使用时启动写日志的后台线程
+    """
+    global _queue_handler, _listener
+    if _queue_handler is None:
+        os.makedirs(LOG_DIR, exist_ok=True)
+        handlers = [
+            _file_handler(
+                LOG_FILE,
+                logging.Formatter(
+                    "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+                ),
+            )
+        ]
+        if JSON_LOG:
+            handlers.append(_file_handler(JSON_LOG_FILE, JsonFormatter()))
+        log_queue = queue.SimpleQueue()
+        _queue_handler = _LazyQueueHandler(log_queue)
+        _listener = QueueListener(log_queue, *handlers)
+        _listener.start()
+        atexit.register(shutdown)
+    return _queue_handler
+
+
+def shutdown():
+    r"""
+    写完队列中剩余的日志并停止后台线程
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+def logger(name: str) -> logging.Logger:
+    logger = logging.getLogger(name)
 
     # Add handlers to logger
-    logger.addHandler(file_handler)
+    handler = _shared_queue_handler()
+    if handler not in logger.handlers:
+        logger.addHandler(handler)
     logger.setLevel(logging.DEBUG if DEBUG else logging.INFO)
     logger.propagate = False  # Prevent double logging to console
-    logger.info(f"正在初始化 {name} 日志")
     return logger
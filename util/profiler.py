@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+r"""
+性能记录
+
+使用 --profile 启动时记录各个操作的耗时分布，并在界面线程上运行 cProfile。
+结果可以导出为 pstats 文件（python -m pstats 或 snakeviz 打开）
+或 Chrome trace 文件（chrome://tracing 或 Perfetto 打开）。
+没有 --profile 时 profiled 直接返回原函数，span 返回空的上下文，几乎没有开销。
+"""
+from collections import deque
+from contextlib import contextmanager, nullcontext
+import bisect
+import functools
+import inspect
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+PROFILE = "--profile" in sys.argv
+
+# 耗时分布的区间上限（毫秒），最后一个区间为“更慢”
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+# 保留的最近耗时记录数量，用于导出 Chrome trace
+MAX_TRACE_EVENTS = 100000
+# 每个操作保留的耗时样本数量，用于计算分位数；次数、总耗时、最大值和分布始终是精确的
+MAX_SAMPLES = 10000
+
+_null = nullcontext()
+
+
+class _Durations:
+    r"""
+    一个操作的耗时统计，样本数量超过 MAX_SAMPLES 后用蓄水池抽样，内存不随运行时间增长
+    """
+
+    __slots__ = ("count", "total", "max", "buckets", "samples")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+        self.samples = []
+
+    def add(self, elapsed: float, rnd: random.Random):
+        self.count += 1
+        self.total += elapsed
+        self.max = max(self.max, elapsed)
+        # 区间为 [下限, 上限)，正好 1ms 算入 1~2ms 的区间
+        self.buckets[bisect.bisect_right(BUCKETS_MS, elapsed * 1000)] += 1
+        if len(self.samples) < MAX_SAMPLES:
+            self.samples.append(elapsed)
+        else:
+            i = rnd.randrange(self.count)
+            if i < MAX_SAMPLES:
+                self.samples[i] = elapsed
+
+
+class Profiler:
+    def __init__(self, enabled: bool = PROFILE):
+        self.enabled = enabled
+        self._durations = {}  # 名称 -> _Durations
+        self._random = random.Random(0)
+        self._trace = deque(maxlen=MAX_TRACE_EVENTS)  # (名称, 开始, 耗时, 线程)
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+        self._cprofile = None
+
+    def start(self):
+        r"""
+        在调用线程（界面线程）上开始 cProfile
+        """
+        if not self.enabled or self._cprofile is not None:
+            return
+        import cProfile
+
+        self._cprofile = cProfile.Profile()
+        self._cprofile.enable()
+
+    def record(self, name: str, start: float, elapsed: float):
+        with self._lock:
+            durations = self._durations.get(name)
+            if durations is None:
+                durations = self._durations[name] = _Durations()
+            durations.add(elapsed, self._random)
+            self._trace.append((name, start, elapsed, threading.get_ident()))
+
+    @contextmanager
+    def _span(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, start, time.perf_counter() - start)
+
+    def span(self, name: str):
+        r"""
+        记录一段代码的耗时，未开启时返回空的上下文
+        """
+        if not self.enabled:
+            return _null
+        return self._span(name)
+
+    def reset(self):
+        with self._lock:
+            self._durations = {}
+            self._trace.clear()
+
+    def stats(self) -> list:
+        r"""
+        每个操作的统计，按总耗时从多到少排列
+
+        返回 [{"name", "count", "total", "mean", "p50", "p95", "max", "buckets"}]，
+        时间单位为秒，buckets 为落在 BUCKETS_MS 各区间的次数（多一个“更慢”的区间）；
+        次数超过 MAX_SAMPLES 时 p50 和 p95 由抽样的样本估计
+        """
+        with self._lock:
+            durations = [
+                (name, d.count, d.total, d.max, list(d.buckets), sorted(d.samples))
+                for name, d in self._durations.items()
+            ]
+        result = []
+        for name, count, total, max_, buckets, values in durations:
+            result.append(
+                {
+                    "name": name,
+                    "count": count,
+                    "total": total,
+                    "mean": total / count,
+                    "p50": values[len(values) // 2],
+                    "p95": values[min(len(values) - 1, int(len(values) * 0.95))],
+                    "max": max_,
+                    "buckets": buckets,
+                }
+            )
+        result.sort(key=lambda s: s["total"], reverse=True)
+        return result
+
+    def export_pstats(self, path: str):
+        r"""
+        导出界面线程的 cProfile 结果，可以用 pstats.Stats(path) 读取
+        """
+        if self._cprofile is None:
+            raise ValueError("没有使用 --profile 启动，无法导出 cProfile 结果")
+        self._cprofile.disable()
+        try:
+            self._cprofile.dump_stats(path)
+        finally:
+            self._cprofile.enable()
+
+    def export_chrome_trace(self, path: str):
+        r"""
+        导出为 Chrome trace 格式（每个操作一个完整事件，时间单位为微秒）
+        """
+        with self._lock:
+            trace = list(self._trace)
+        pid = os.getpid()
+        events = [
+            {
+                "name": name,
+                "ph": "X",
+                "ts": (start - self._origin) * 1e6,
+                "dur": elapsed * 1e6,
+                "pid": pid,
+                "tid": tid,
+            }
+            for name, start, elapsed, tid in trace
+        ]
+        with open(path, "w", encoding="utf8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+
+profiler = Profiler()
+
+
+def profiled(name: str = None):
+    r"""
+    装饰器，记录函数每次调用的耗时；未开启时直接返回原函数
+
+    被装饰的函数常用作Qt槽，PyQt只对原函数丢弃多余的信号参数，
+    所以这里按原函数的参数个数截掉多余的位置参数
+    """
+
+    def decorator(func):
+        if not profiler.enabled:
+            return func
+        span_name = name or func.__name__
+        code = func.__code__
+        max_args = None if code.co_flags & inspect.CO_VARARGS else code.co_argcount
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if max_args is not None:
+                args = args[:max_args]
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profiler.record(span_name, start, time.perf_counter() - start)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,277 @@
+# -*- coding: utf-8 -*-
+r"""
+官方存档（user_archive.json）和结局记录（over_record_excerpt.json）的读取与写入
+
+这两个文件各保存了许多条记录。index_records 流式扫描一遍文件，记下每条记录的
+位置、长度和头部字段（主角名、难度、回合、保存时间），列表只使用这些信息；
+需要某条记录时 read_record 再按位置读出并解析这一条。
+记录所在的数组为顶层数组，或顶层对象中第一个元素为对象的数组；
+还没有任何记录的文件（如 {"records": []}）中，记录数组为顶层对象中的第一个空数组。
+append_record 把新记录插入到数组末尾：插入点前后的内容原样复制，原子地替换文件，
+已有记录的位置不变，索引只需追加一项。
+"""
+from collections import namedtuple
+import json
+
+from util.fs import local_fs
+from util.save_header import CHUNK_SIZE, _Scanner
+from util.save_index import HEADER_KEYS
+
+USER_ARCHIVE = "user_archive.json"  # 官方存档
+OVER_RECORD = "over_record_excerpt.json"  # 结局记录
+RECORD_FILES = (USER_ARCHIVE, OVER_RECORD)
+
+# 头部字段最多在记录中嵌套的对象层数（记录可能把存档包在某个字段中）
+HEADER_DEPTH = 1
+
+RecordEntry = namedtuple("RecordEntry", "index offset length header")
+
+
+class RecordIndex:
+    r"""
+    一个记录文件的索引
+
+    key 为记录数组在顶层对象中的键，顶层就是数组时为None；
+    array_end 为数组结尾 ']' 在文件中的位置；fs 为文件所在的文件系统
+    """
+
+    def __init__(self, path, size, mtime, key, entries, array_end, fs=local_fs):
+        self.fs = fs
+        self.path = path
+        self.size = size
+        self.mtime = mtime
+        self.key = key
+        self.entries = entries
+        self.array_end = array_end
+
+    def __len__(self):
+        return len(self.entries)
+
+    def is_fresh(self) -> bool:
+        try:
+            stat = self.fs.stat(self.path)
+        except OSError:
+            return False
+        return stat.st_size == self.size and stat.st_mtime == self.mtime
+
+
+def _scan_object(scanner: _Scanner, header: dict, depth: int):
+    r"""
+    扫描一个对象，把找到的头部字段写入 header；当前位置在 '{' 上
+    """
+    scanner.expect(b"{")
+    if scanner.peek() == 0x7D:  # }
+        scanner.pos += 1
+        return
+    while True:
+        if len(header) == len(HEADER_KEYS):
+            # 字段都找到了，跳过对象的其余部分
+            scanner.skip_container_rest(1)
+            return
+        if scanner.peek() != 0x22:
+            raise ValueError("记录格式错误，期望键名")
+        key = scanner.read_value()
+        scanner.expect(b":")
+        char = scanner.peek()
+        if key in HEADER_KEYS and key not in header:
+            header[key] = scanner.read_value()
+        elif char == 0x7B and depth > 0:
+            _scan_object(scanner, header, depth - 1)
+        else:
+            scanner.skip_value()
+        char = scanner.peek()
+        scanner.pos += 1
+        if char == 0x7D:  # }
+            return
+        if char != 0x2C:  # ,
+            raise ValueError("记录格式错误，期望 ','")
+
+
+class _EmptyRecordArray(ValueError):
+    r"""
+    顶层对象中没有对象数组，但有空数组；key 为第一个空数组的键
+    """
+
+    def __init__(self, key: str):
+        super().__init__("记录数组为空")
+        self.key = key
+
+
+def _enter_record_array(scanner: _Scanner, empty_key: str = None) -> str:
+    r"""
+    在顶层对象中找到第一个元素为对象的数组，停在数组的第一个元素之前，返回它的键
+
+    键为 empty_key 的空数组也作为记录数组；没有对象数组但有空数组时抛出
+    _EmptyRecordArray，调用者用它的键重新扫描
+    """
+    empty = None
+    scanner.expect(b"{")
+    while scanner.peek() != 0x7D:
+        key = scanner.read_value()
+        scanner.expect(b":")
+        if scanner.peek() == 0x5B:  # [
+            # 向后看一个字符，不是对象数组时回到 '[' 整体跳过
+            scanner.mark = scanner.pos
+            scanner.pos += 1
+            char = scanner.peek()
+            if char == 0x7B or (char == 0x5D and key == empty_key):
+                scanner.mark = None
+                return key
+            if char == 0x5D and empty is None:
+                empty = key
+            scanner.pos = scanner.mark
+            scanner.mark = None
+        scanner.skip_value()
+        if scanner.peek() == 0x2C:
+            scanner.pos += 1
+    if empty is not None:
+        raise _EmptyRecordArray(empty)
+    raise ValueError("没有找到记录数组")
+
+
+def _scan_records(f, chunk_size: int, empty_key: str = None):
+    r"""
+    扫描记录文件，返回 (记录数组的键, 各条记录, 数组结尾的位置)
+    """
+    entries = []
+    scanner = _Scanner(f, chunk_size)
+    scanner.fill()
+    if scanner.buf.startswith(b"\xef\xbb\xbf"):
+        scanner.pos = 3
+    key = None
+    if scanner.peek() == 0x5B:
+        scanner.pos += 1
+    else:
+        key = _enter_record_array(scanner, empty_key)
+    if scanner.peek() != 0x5D:  # ]
+        while True:
+            start = scanner.offset
+            header = {}
+            if scanner.peek() == 0x7B:
+                _scan_object(scanner, header, HEADER_DEPTH)
+            else:
+                scanner.skip_value()
+            entries.append(
+                RecordEntry(len(entries), start, scanner.offset - start, header)
+            )
+            char = scanner.peek()
+            if char == 0x5D:
+                break
+            if char != 0x2C:
+                raise ValueError("记录格式错误，期望 ','")
+            scanner.pos += 1
+    return key, entries, scanner.offset
+
+
+def index_records(
+    path: str, chunk_size: int = CHUNK_SIZE, fs=local_fs
+) -> RecordIndex:
+    r"""
+    流式扫描记录文件，返回各条记录的位置和头部字段，不解析记录的其余内容
+
+    还没有记录的文件得到没有条目的索引，array_end 指向空数组的 ']'，可以直接追加
+    """
+    stat = fs.stat(path)
+    with fs.open(path, "rb") as f:
+        try:
+            key, entries, array_end = _scan_records(f, chunk_size)
+        except _EmptyRecordArray as e:
+            # 记录数组还是空的，从头再扫描一遍，停在这个空数组中
+            f.seek(0)
+            key, entries, array_end = _scan_records(f, chunk_size, e.key)
+    return RecordIndex(
+        path, stat.st_size, stat.st_mtime, key, entries, array_end, fs
+    )
+
+
+def read_record(index: RecordIndex, i: int):
+    r"""
+    只读取并解析第 i 条记录，文件在建立索引后被修改过时抛出 ValueError
+    """
+    if not index.is_fresh():
+        raise ValueError("记录文件已被修改，请重新读取")
+    entry = index.entries[i]
+    with index.fs.open(index.path, "rb") as f:
+        f.seek(entry.offset)
+        return json.loads(f.read(entry.length))
+
+
+def _looks_like_save(value) -> bool:
+    return isinstance(value, dict) and ("round" in value or "saveTime" in value)
+
+
+def _wrapped_save(record: dict):
+    r"""
+    记录中包着的存档，返回 (键, 存档, 是否为JSON字符串)，没有时返回None
+    """
+    for key, value in record.items():
+        if isinstance(value, str) and value.startswith("{"):
+            try:
+                decoded = json.loads(value)
+            except ValueError:
+                continue
+            if _looks_like_save(decoded):
+                return key, decoded, True
+        elif _looks_like_save(value):
+            return key, value, False
+    return None
+
+
+def record_save(record) -> dict:
+    r"""
+    从记录中取出可以加载的存档数据
+
+    记录本身有存档字段时就是存档，否则取其中第一个像存档的对象
+    （也可能是序列化成字符串的JSON）；都没有时原样返回
+    """
+    if _looks_like_save(record) or not isinstance(record, dict):
+        return record
+    wrapped = _wrapped_save(record)
+    return record if wrapped is None else wrapped[1]
+
+
+def _make_record(index: RecordIndex, save: dict, name: str):
+    # 新记录使用与第一条记录相同的包装方式
+    if not index.entries:
+        return save
+    template = read_record(index, 0)
+    if not isinstance(template, dict) or _looks_like_save(template):
+        return save
+    wrapped = _wrapped_save(template)
+    if wrapped is None:
+        return save
+    key, _, as_string = wrapped
+    record = {key: json.dumps(save, ensure_ascii=False) if as_string else save}
+    if name and isinstance(template.get("name"), str):
+        record["name"] = name
+    return record
+
+
+def append_record(
+    index: RecordIndex, save: dict, name: str = None, fsync: bool = False
+) -> RecordIndex:
+    r"""
+    把存档作为一条新记录追加到记录数组末尾，返回更新后的索引
+
+    只在数组结尾处插入新记录的字节，文件的其余部分原样复制，原子地替换原文件
+    """
+    if not index.is_fresh():
+        index = index_records(index.path, fs=index.fs)
+    raw = json.dumps(_make_record(index, save, name), ensure_ascii=False)
+    raw = raw.encode("utf8")
+    separator = b"," if index.entries else b""
+    index.fs.insert(index.path, index.array_end, separator + raw, fsync)
+    stat = index.fs.stat(index.path)
+    header = {key: save[key] for key in HEADER_KEYS if key in save}
+    entry = RecordEntry(
+        len(index.entries), index.array_end + len(separator), len(raw), header
+    )
+    return RecordIndex(
+        index.path,
+        stat.st_size,
+        stat.st_mtime,
+        index.key,
+        index.entries + [entry],
+        index.array_end + len(separator) + len(raw),
+        index.fs,
+    )
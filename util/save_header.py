@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+r"""
+存档头部字段的流式提取
+
+存档文件保存了完整的卡牌和世界状态，而信息面板只需要几个顶层字段。
+这里按块读取文件，只解析需要的顶层键的值，其余的值只做括号匹配跳过，
+不构建任何Python对象；所有字段都找到后立即停止读取。
+"""
+from array import array
+from itertools import accumulate
+import json
+import re
+
+from util.fs import local_fs
+
+# 在容器中跳过时只关心引号和括号
+_container_token = re.compile(rb'["\[\]{}]')
+# 批量计算深度时只保留引号和括号，其余字节全部删除
+_non_token = bytes(c for c in range(256) if c not in b'"[]{}')
+# 把括号映射为有符号字节 +1 / -1，用于批量计算嵌套深度
+_depth_table = bytes.maketrans(b"[{]}", b"\x01\x01\xff\xff")
+# 标量（数字、true、false、null）在这些字符处结束
+_scalar_end = re.compile(rb"[,}\]\s]")
+_whitespace = b" \t\r\n"
+
+CHUNK_SIZE = 64 * 1024
+
+
+class _Scanner:
+    def __init__(self, f, chunk_size: int):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = b""
+        self.pos = 0
+        # buf[0] 在文件中的位置
+        self.base = 0
+        self.eof = False
+        # 需要保留的起始位置，丢弃已读数据时不能越过它
+        self.mark = None
+
+    def fill(self) -> bool:
+        if self.eof:
+            return False
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        # 丢弃已经处理过的数据，避免缓冲区随文件大小增长
+        keep = self.pos if self.mark is None else self.mark
+        if keep > 0:
+            self.buf = self.buf[keep:]
+            self.base += keep
+            self.pos -= keep
+            if self.mark is not None:
+                self.mark -= keep
+        self.buf += chunk
+        return True
+
+    @property
+    def offset(self) -> int:
+        # 当前位置在文件中的偏移
+        return self.base + self.pos
+
+    def peek(self) -> int:
+        # 跳过空白并返回下一个字符
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _whitespace:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                raise ValueError("存档意外结束")
+
+    def expect(self, char: bytes):
+        if self.peek() != char[0]:
+            raise ValueError(f"存档格式错误，期望 {char!r}")
+        self.pos += 1
+
+    def skip_string(self):
+        # 当前位置在开头的引号上
+        self.pos += 1
+        self._skip_string_rest()
+
+    def _skip_string_rest(self):
+        # 当前位置在字符串内部，跳到结尾的引号之后
+        while True:
+            end = self.buf.find(b'"', self.pos)
+            if end < 0:
+                # 保留末尾的反斜杠，以便判断下一块开头的引号是否被转义
+                end = len(self.buf)
+                while end > self.pos and self.buf[end - 1] == 0x5C:
+                    end -= 1
+                self.pos = end
+                if not self.fill():
+                    raise ValueError("字符串意外结束")
+                continue
+            # 引号前有奇数个反斜杠时是转义
+            backslashes = 0
+            while (
+                end - 1 - backslashes >= 0
+                and self.buf[end - 1 - backslashes] == 0x5C
+            ):
+                backslashes += 1
+            self.pos = end + 1
+            if backslashes % 2 == 0:
+                return
+
+    def skip_container(self):
+        # 当前位置在开头的括号上
+        self.pos += 1
+        self.skip_container_rest(1)
+
+    def skip_container_rest(self, depth: int):
+        # 当前位置在容器内部（不在字符串中），跳到深度为 depth 的容器结束之后
+        in_string = False
+        while True:
+            # 先整段计算嵌套深度，只有容器在这一段内结束时才逐个字符定位。
+            # 末尾的反斜杠留到下一段，保证转义不会被切开
+            end = len(self.buf)
+            while end > self.pos and self.buf[end - 1] == 0x5C:
+                end -= 1
+            # 去掉转义的反斜杠和引号后，剩下的引号两两配对
+            piece = self.buf[self.pos : end].replace(b"\\\\", b"")
+            piece = piece.replace(b'\\"', b"")
+            parts = piece.translate(None, _non_token).split(b'"')
+            outside = b"".join(parts[1 if in_string else 0 :: 2])
+            depths = list(
+                accumulate(array("b", outside.translate(_depth_table)), initial=depth)
+            )
+            if 0 in depths:
+                break
+            depth = depths[-1]
+            in_string ^= len(parts) % 2 == 0
+            self.pos = end
+            if not self.fill():
+                raise ValueError("存档意外结束")
+        if in_string:
+            self._skip_string_rest()
+        self._walk_container(depth)
+
+    def _walk_container(self, depth: int):
+        while depth:
+            match = _container_token.search(self.buf, self.pos)
+            if match is None:
+                self.pos = len(self.buf)
+                if not self.fill():
+                    raise ValueError("存档意外结束")
+                continue
+            token = match.group()
+            if token == b'"':
+                self.pos = match.start()
+                self.skip_string()
+                continue
+            self.pos = match.end()
+            if token in b"[{":
+                depth += 1
+            else:
+                depth -= 1
+
+    def skip_scalar(self):
+        while True:
+            match = _scalar_end.search(self.buf, self.pos)
+            if match is not None:
+                self.pos = match.start()
+                return
+            self.pos = len(self.buf)
+            if not self.fill():
+                return
+
+    def skip_value(self):
+        char = self.peek()
+        if char == 0x22:  # "
+            self.skip_string()
+        elif char in b"[{":
+            self.skip_container()
+        else:
+            self.skip_scalar()
+
+    def read_value(self):
+        # 读取并解析一个值，只用于需要的字段
+        self.peek()
+        self.mark = self.pos
+        self.skip_value()
+        raw = self.buf[self.mark : self.pos]
+        self.mark = None
+        return json.loads(raw)
+
+
+def _scan_header(f, keys, chunk_size: int) -> dict:
+    scanner = _Scanner(f, chunk_size)
+    scanner.fill()
+    if scanner.buf.startswith(b"\xef\xbb\xbf"):
+        scanner.pos = 3
+    scanner.expect(b"{")
+    wanted = set(keys)
+    header = {}
+    if scanner.peek() == 0x7D:  # }
+        return header
+    while wanted:
+        if scanner.peek() != 0x22:
+            raise ValueError("存档格式错误，期望键名")
+        key = scanner.read_value()
+        scanner.expect(b":")
+        if key in wanted:
+            header[key] = scanner.read_value()
+            wanted.discard(key)
+        else:
+            scanner.skip_value()
+        char = scanner.peek()
+        scanner.pos += 1
+        if char == 0x7D:  # }
+            break
+        if char != 0x2C:  # ,
+            raise ValueError("存档格式错误，期望 ','")
+    return header
+
+
+def read_header(
+    file_path: str, keys, chunk_size: int = CHUNK_SIZE, fs=local_fs
+) -> dict:
+    r"""
+    从存档中读取指定的顶层字段
+
+    找到全部字段后立即停止读取；流式解析失败或有字段缺失时退回完整解析。
+    """
+    try:
+        with fs.open(file_path, "rb") as f:
+            header = _scan_header(f, keys, chunk_size)
+        if len(header) == len(keys):
+            return header
+    except ValueError:
+        pass
+    with fs.open(file_path, "r", encoding="utf8") as f:
+        save_data = json.load(f)
+    return {key: save_data[key] for key in keys if key in save_data}
@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+r"""
+存档历史
+
+监控到存档被覆盖时，把新版本记录为相对上一版本的差异，
+并定期保存完整的关键帧，恢复任意版本最多只需要应用有限个差异。
+
+目录结构: history/<steam_id>/<存档名>/
+    index.json      版本列表 [{"version", "kind", "round", "time", "size"}]
+    <版本号>.z      zlib压缩的完整存档（关键帧）或差异
+"""
+from datetime import datetime
+import json
+import os
+import threading
+import zlib
+
+import util.logger
+from util.doc_cache import LRUCache, parsed_size
+from util.fileio import atomic_write
+from util.fs import local_fs
+
+log = util.logger.logger(__name__)
+
+HISTORY_DIR = "history"
+# 缓存最近记录过的版本，下次记录时不需要重建；按解析后的大小估算
+LATEST_CACHE_BYTES = 32 * 1048576
+
+# 差异操作:
+#   ["s", 路径, 值]                 设置对象的键或数组的下标
+#   ["d", 路径]                     删除对象的键
+#   ["r", 路径, 起点, 终点, 新项]   替换数组的一段
+SET, DELETE, SPLICE = "s", "d", "r"
+
+
+def same(a, b) -> bool:
+    r"""
+    类型严格的相等比较
+
+    Python 中 True == 1 == 1.0，普通的 == 会把它们当作相同的值，记录的历史就会丢失类型的变化；
+    这里要求类型相同，对象的键顺序也相同
+    """
+    if a is b:
+        return True
+    if type(a) is not type(b):
+        return False
+    if isinstance(a, dict):
+        return list(a) == list(b) and all(same(v, b[k]) for k, v in a.items())
+    if isinstance(a, list):
+        return len(a) == len(b) and all(map(same, a, b))
+    return a == b
+
+
+def diff(old, new, path=None) -> list:
+    r"""
+    计算把 old 变成 new 的差异操作列表
+    """
+    path = [] if path is None else path
+    if type(old) is not type(new):
+        return [[SET, path, new]]
+    if isinstance(old, dict):
+        # 键的顺序发生变化时无法用增删表达，直接整体替换
+        expected = [k for k in old if k in new] + [k for k in new if k not in old]
+        if expected != list(new):
+            return [[SET, path, new]]
+        ops = [[DELETE, path + [k]] for k in old if k not in new]
+        for key, value in new.items():
+            if key not in old:
+                ops.append([SET, path + [key], value])
+            else:
+                ops.extend(diff(old[key], value, path + [key]))
+        return ops
+    if isinstance(old, list):
+        if len(old) == len(new):
+            ops = []
+            for i, (a, b) in enumerate(zip(old, new)):
+                ops.extend(diff(a, b, path + [i]))
+            return ops
+        # 长度不同时只替换去掉相同前后缀之后的中间一段
+        start = 0
+        limit = min(len(old), len(new))
+        while start < limit and same(old[start], new[start]):
+            start += 1
+        end = 0
+        while end < limit - start and same(
+            old[len(old) - 1 - end], new[len(new) - 1 - end]
+        ):
+            end += 1
+        return [[SPLICE, path, start, len(old) - end, new[start : len(new) - end]]]
+    if old is new or old == new:
+        # 类型已经相同，== 不会混淆 True、1 和 1.0
+        return []
+    return [[SET, path, new]]
+
+
+def patch(doc, ops):
+    r"""
+    应用差异操作，返回新的文档（会修改传入的文档）
+    """
+    for op in ops:
+        kind, path = op[0], op[1]
+        if kind == SET and not path:
+            doc = op[2]
+            continue
+        target = doc
+        for key in path[:-1] if kind != SPLICE else path:
+            target = target[key]
+        if kind == SET:
+            target[path[-1]] = op[2]
+        elif kind == DELETE:
+            del target[path[-1]]
+        else:
+            target[op[2] : op[3]] = op[4]
+    return doc
+
+
+class SaveHistory:
+    def __init__(self, root: str = HISTORY_DIR, keyframe_interval: int = 10):
+        self.root = root
+        self.keyframe_interval = keyframe_interval
+        self._latest = LRUCache(LATEST_CACHE_BYTES)  # 历史目录 -> 最新版本的存档数据
+        self._lock = threading.Lock()
+
+    def _history_dir(self, profile: str, save_name: str) -> str:
+        return os.path.join(self.root, profile, save_name)
+
+    def _read_index(self, history_dir: str) -> list:
+        index_path = os.path.join(history_dir, "index.json")
+        if not os.path.exists(index_path):
+            return []
+        with open(index_path, "r", encoding="utf8") as f:
+            return json.load(f)
+
+    def _read_version(self, history_dir: str, version: int):
+        with open(os.path.join(history_dir, f"{version}.z"), "rb") as f:
+            return json.loads(zlib.decompress(f.read()))
+
+    def _rebuild(self, history_dir: str, index: list, version: int):
+        # 从不晚于目标版本的最近关键帧开始，依次应用差异
+        entries = [e for e in index if e["version"] <= version]
+        if not entries or entries[-1]["version"] != version:
+            raise KeyError(f"历史版本不存在: {version}")
+        start = max(i for i, e in enumerate(entries) if e["kind"] == "full")
+        doc = self._read_version(history_dir, entries[start]["version"])
+        for entry in entries[start + 1 :]:
+            doc = patch(doc, self._read_version(history_dir, entry["version"]))
+        return doc
+
+    def versions(self, profile: str, save_name: str) -> list:
+        r"""
+        列出某个存档的历史版本
+        """
+        return self._read_index(self._history_dir(profile, save_name))
+
+    def capture(self, profile: str, save_path: str, fs=local_fs) -> dict:
+        r"""
+        记录存档的当前内容，返回新版本的信息；内容没有变化时返回None
+        """
+        save_name = os.path.splitext(os.path.basename(save_path))[0]
+        history_dir = self._history_dir(profile, save_name)
+        with fs.open(save_path, "r", encoding="utf8") as f:
+            raw = f.read()
+        doc = json.loads(raw)
+        with self._lock:
+            index = self._read_index(history_dir)
+            previous = None
+            if index:
+                previous = self._latest.get(history_dir)
+                if previous is None:
+                    previous = self._rebuild(history_dir, index, index[-1]["version"])
+            since_keyframe = 0
+            for entry in reversed(index):
+                if entry["kind"] == "full":
+                    break
+                since_keyframe += 1
+
+            if previous is None or since_keyframe + 1 >= self.keyframe_interval:
+                kind, payload = "full", raw.encode("utf8")
+            else:
+                ops = diff(previous, doc)
+                if not ops:
+                    return None
+                payload = json.dumps(ops, ensure_ascii=False).encode("utf8")
+                kind = "delta"
+                if len(payload) * 2 > len(raw):
+                    # 差异太大时直接存完整版本
+                    kind, payload = "full", raw.encode("utf8")
+            if kind == "full" and previous is not None and same(previous, doc):
+                return None
+
+            version = index[-1]["version"] + 1 if index else 1
+            data = zlib.compress(payload, 6)
+            os.makedirs(history_dir, exist_ok=True)
+            atomic_write(os.path.join(history_dir, f"{version}.z"), data)
+            entry = {
+                "version": version,
+                "kind": kind,
+                "round": doc.get("round") if isinstance(doc, dict) else None,
+                "time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                "size": len(data),
+            }
+            index.append(entry)
+            atomic_write(
+                os.path.join(history_dir, "index.json"),
+                json.dumps(index, ensure_ascii=False).encode("utf8"),
+            )
+            self._latest.put(history_dir, doc, parsed_size(len(raw)))
+        log.info(f"记录存档历史 {save_name} v{version}（{kind}，{len(data)} 字节）")
+        return entry
+
+    def restore(self, profile: str, save_name: str, version: int):
+        r"""
+        重建某个历史版本的存档数据
+        """
+        history_dir = self._history_dir(profile, save_name)
+        with self._lock:
+            index = self._read_index(history_dir)
+            return self._rebuild(history_dir, index, version)
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+r"""
+存档元数据索引
+
+把每个存档的头部信息（主角名、难度、回合、保存时间）缓存到 save_index.json 中，
+以 (路径, 大小, 修改时间) 作为有效性判断。只有新增或被修改过的存档才会重新解析。
+有变化后 SAVE_DELAY 秒写盘（同 util.config），程序被强制结束时最多丢失最后几秒解析的头部。
+"""
+import json
+import atexit
+import os
+import threading
+
+from util.config import Config
+import util.logger
+from util.counters import counters
+from util.fileio import atomic_write_json
+from util.fs import local_fs
+from util.save_header import read_header
+
+log = util.logger.logger(__name__)
+
+INDEX_FILE = "save_index.json"
+INDEX_VERSION = 1
+# 有变化后等待这么多秒再写盘，期间的变化合并为一次写入
+SAVE_DELAY = 2.0
+
+# 信息面板需要的顶层字段
+HEADER_KEYS = ("name", "difficulty", "round", "saveTime")
+
+
+def parse_header(file_path: str, fs=local_fs) -> dict:
+    r"""
+    解析存档的头部字段
+    """
+    return read_header(file_path, HEADER_KEYS, fs=fs)
+
+
+class SaveIndex:
+    def __init__(self, index_path: str = INDEX_FILE):
+        self.index_path = index_path
+        self._entries = {}  # file_path -> [size, mtime, header]
+        self._loaded = False
+        self._dirty = False
+        self._save_timer = None
+        self._lock = threading.RLock()
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        if not os.path.exists(self.index_path):
+            return
+        try:
+            with open(self.index_path, "r", encoding="utf8") as f:
+                data = json.load(f)
+            if data.get("version") == INDEX_VERSION:
+                self._entries = data.get("entries", {})
+            log.info(f"读取存档索引: {len(self._entries)} 条")
+        except (OSError, ValueError) as e:
+            log.warning(f"存档索引损坏，将重新建立: {e}")
+            self._entries = {}
+
+    def lookup(
+        self, file_path: str, stat: os.stat_result = None, fs=local_fs
+    ) -> dict:
+        r"""
+        返回缓存中有效的头部信息，没有或已过期时返回None
+        """
+        if stat is None:
+            stat = fs.stat(file_path)
+        with self._lock:
+            self._ensure_loaded()
+            entry = self._entries.get(file_path)
+            if entry is None:
+                return None
+            size, mtime, header = entry
+            if size != stat.st_size or mtime != stat.st_mtime:
+                return None
+            return header
+
+    def get_header(
+        self, file_path: str, stat: os.stat_result = None, fs=local_fs
+    ) -> dict:
+        r"""
+        获取存档头部信息，只在索引失效时重新解析文件
+        """
+        if stat is None:
+            stat = fs.stat(file_path)
+        header = self.lookup(file_path, stat)
+        if header is not None:
+            return header
+        with counters.timed("header_parses"):
+            header = parse_header(file_path, fs)
+        log.debug("解析存档头部: %s", file_path)
+        with self._lock:
+            self._entries[file_path] = [stat.st_size, stat.st_mtime, header]
+            self._schedule_save()
+        return header
+
+    def discard(self, file_path: str):
+        with self._lock:
+            self._ensure_loaded()
+            if self._entries.pop(file_path, None) is not None:
+                self._schedule_save()
+
+    def retain(self, save_dir: str, file_paths):
+        r"""
+        丢弃目录下已经不存在的存档的索引
+        """
+        keep = set(file_paths)
+        with self._lock:
+            self._ensure_loaded()
+            stale = [
+                path
+                for path in self._entries
+                if os.path.dirname(path) == save_dir and path not in keep
+            ]
+            for path in stale:
+                del self._entries[path]
+            if stale:
+                self._schedule_save()
+
+    def retain_dirs(self, save_dirs):
+        r"""
+        丢弃不在 save_dirs 中的目录的索引，例如已删除的账号或以前使用的存档根目录
+        """
+        keep = {os.path.normcase(os.path.normpath(d)) for d in save_dirs}
+        with self._lock:
+            self._ensure_loaded()
+            stale = [
+                path
+                for path in self._entries
+                if os.path.normcase(os.path.dirname(path)) not in keep
+            ]
+            for path in stale:
+                del self._entries[path]
+            if stale:
+                log.info(f"丢弃 {len(stale)} 条其他目录的存档索引")
+                self._schedule_save()
+
+    def _schedule_save(self):
+        # 持有锁时调用
+        self._dirty = True
+        if self._save_timer is not None:
+            return
+        self._save_timer = threading.Timer(SAVE_DELAY, self.save)
+        self._save_timer.daemon = True
+        self._save_timer.start()
+
+    def save(self):
+        with self._lock:
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+                self._save_timer = None
+            if not self._dirty:
+                return
+            data = {"version": INDEX_VERSION, "entries": self._entries}
+            atomic_write_json(self.index_path, data, separators=(",", ":"))
+            self._dirty = False
+
+
+save_index = SaveIndex()
+atexit.register(save_index.save)
+# 修改存档根目录时，先把旧目录已经解析的头部写盘
+Config.subscribe("SaveDataDir", lambda key, value: save_index.save())
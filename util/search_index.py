@@ -0,0 +1,309 @@
+# -*- coding: utf-8 -*-
+r"""
+存档搜索索引
+
+每个存档只完整解析一次，存档中所有字符串切分为词加入倒排索引（词 -> 存档编号），
+同时记录主角名、难度、回合、保存时间用于字段过滤。查询只访问内存中的索引，不再打开文件。
+每个存档另外保留一个词元组，删除或替换存档时按它找到要更新的倒排表；词都经过
+sys.intern，元组和倒排索引的键共用同一个字符串对象，每个词只多占一个引用。
+
+查询语法（空格分隔，条件之间为“并且”）:
+    角色:名字 / name:名字        主角名包含
+    难度:2 / difficulty:1-3      难度等于或在范围内
+    回合:10-20 / round:>=30      回合范围，支持 a-b、>a、>=a、<a、<=a
+    时间:2025-04 / time:2025-04-26   保存时间前缀
+    其他文字                       存档内任意字符串包含该词（英文数字按前缀匹配）
+"""
+from bisect import bisect_left
+import json
+import re
+import shlex
+import sys
+import threading
+
+import util.logger
+from util.fs import local_fs
+
+log = util.logger.logger(__name__)
+
+# 中日韩文字没有空格分词，按单字和相邻两字建立索引；其他文字按单词建立索引
+_CJK = "㐀-䶿一-鿿豈-﫿"
+_token_re = re.compile(f"[^\\W{_CJK}]+|[{_CJK}]+")
+_cjk_re = re.compile(f"[{_CJK}]")
+
+_field_names = {
+    "name": "name",
+    "角色": "name",
+    "主角": "name",
+    "difficulty": "difficulty",
+    "难度": "difficulty",
+    "round": "round",
+    "回合": "round",
+    "time": "time",
+    "时间": "time",
+}
+
+
+def _words(text: str):
+    for word in _token_re.findall(text.lower()):
+        yield word, _cjk_re.match(word) is not None
+
+
+def tokenize(text: str) -> set:
+    r"""
+    建立索引时使用的切词
+    """
+    tokens = set()
+    for word, cjk in _words(text):
+        if cjk:
+            tokens.update(word)
+            tokens.update(word[i : i + 2] for i in range(len(word) - 1))
+        else:
+            tokens.add(word)
+    return tokens
+
+
+def _strings(doc):
+    # 遍历文档中的所有字符串值
+    stack = [doc]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, str):
+            yield value
+        elif isinstance(value, dict):
+            stack.extend(value.values())
+        elif isinstance(value, list):
+            stack.extend(value)
+
+
+def _parse_range(text: str):
+    r"""
+    把 "3"、"10-20"、">=5"、"<8" 转换为 (下限, 上限)，无法解析时抛出 ValueError
+    """
+    for op in (">=", "<=", ">", "<"):
+        if text.startswith(op):
+            n = int(text[len(op) :])
+            return {
+                ">=": (n, None),
+                "<=": (None, n),
+                ">": (n + 1, None),
+                "<": (None, n - 1),
+            }[op]
+    if "-" in text[1:]:
+        low, high = text.split("-", 1) if text[0] != "-" else ("", text[1:])
+        return (int(low) if low else None, int(high) if high else None)
+    n = int(text)
+    return (n, n)
+
+
+def _in_range(value, bounds) -> bool:
+    if not isinstance(value, int) or isinstance(value, bool):
+        return False
+    low, high = bounds
+    return (low is None or value >= low) and (high is None or value <= high)
+
+
+def parse_query(query: str):
+    r"""
+    解析查询，返回 (字段条件列表, 全文词列表)
+    """
+    try:
+        parts = shlex.split(query)
+    except ValueError:
+        parts = query.split()
+    fields = []
+    terms = []
+    for part in parts:
+        key, sep, value = part.partition(":")
+        if not sep:
+            key, sep, value = part.partition("：")
+        field = _field_names.get(key.lower()) if sep else None
+        if field is None or not value:
+            terms.append(part)
+            continue
+        if field in ("difficulty", "round"):
+            try:
+                fields.append((field, _parse_range(value)))
+            except ValueError:
+                terms.append(part)
+        else:
+            fields.append((field, value.lower()))
+    return fields, terms
+
+
+class SearchIndex:
+    def __init__(self, fs=local_fs):
+        self.fs = fs
+        self._lock = threading.Lock()
+        self._ids = {}  # file_path -> 存档编号
+        self._paths = {}  # 存档编号 -> file_path
+        self._mtimes = {}  # 存档编号 -> 建立索引时的修改时间
+        self._fields = {}  # 存档编号 -> (主角名, 难度, 回合, 保存时间)
+        self._tokens = {}  # 存档编号 -> 该存档的词元组
+        self._postings = {}  # 词 -> {存档编号}
+        self._vocab = None  # 排序后的词表，用于前缀匹配，索引变化后重建
+        self._next_id = 0
+        self.generation = 0
+
+    def __len__(self):
+        return len(self._ids)
+
+    def clear(self):
+        r"""
+        清空索引，正在进行的 build 会提前停止
+        """
+        with self._lock:
+            self._ids = {}
+            self._paths = {}
+            self._mtimes = {}
+            self._fields = {}
+            self._tokens = {}
+            self._postings = {}
+            self._vocab = None
+            self.generation += 1
+
+    def _remove(self, doc_id):
+        for token in self._tokens.pop(doc_id):
+            posting = self._postings[token]
+            posting.discard(doc_id)
+            if not posting:
+                del self._postings[token]
+        del self._paths[doc_id]
+        del self._mtimes[doc_id]
+        del self._fields[doc_id]
+        self._vocab = None
+
+    def discard(self, file_path: str):
+        with self._lock:
+            doc_id = self._ids.pop(file_path, None)
+            if doc_id is not None:
+                self._remove(doc_id)
+
+    def is_fresh(self, file_path: str, mtime: float) -> bool:
+        with self._lock:
+            doc_id = self._ids.get(file_path)
+            return doc_id is not None and self._mtimes[doc_id] == mtime
+
+    def add(self, file_path: str, doc, mtime: float = None):
+        r"""
+        把已经解析的存档加入索引，已存在时替换
+        """
+        # 所有字符串拼接后一次切词，换行不属于任何词，不会把相邻字符串连成一个词
+        tokens = tuple(map(sys.intern, tokenize("\n".join(_strings(doc)))))
+        header = doc if isinstance(doc, dict) else {}
+        name = header.get("name")
+        save_time = header.get("saveTime")
+        fields = (
+            name.lower() if isinstance(name, str) else "",
+            header.get("difficulty"),
+            header.get("round"),
+            save_time.replace("T", " ").lower() if isinstance(save_time, str) else "",
+        )
+        with self._lock:
+            old_id = self._ids.get(file_path)
+            if old_id is not None:
+                self._remove(old_id)
+            doc_id = self._next_id
+            self._next_id += 1
+            self._ids[file_path] = doc_id
+            self._paths[doc_id] = file_path
+            self._mtimes[doc_id] = mtime
+            self._fields[doc_id] = fields
+            self._tokens[doc_id] = tokens
+            for token in tokens:
+                posting = self._postings.get(token)
+                if posting is None:
+                    self._postings[token] = {doc_id}
+                else:
+                    posting.add(doc_id)
+            self._vocab = None
+
+    def add_file(self, file_path: str) -> bool:
+        r"""
+        读取并索引一个存档，修改时间没有变化时跳过，返回是否重新建立了索引
+        """
+        try:
+            mtime = self.fs.stat(file_path).st_mtime
+            if self.is_fresh(file_path, mtime):
+                return False
+            with self.fs.open(file_path, "r", encoding="utf8") as f:
+                doc = json.load(f)
+        except FileNotFoundError:
+            self.discard(file_path)
+            return False
+        except (OSError, ValueError) as e:
+            log.warning(f"无法为存档建立索引 {file_path}: {e}")
+            return False
+        self.add(file_path, doc, mtime)
+        return True
+
+    def build(self, file_paths, generation: int, progress=None, batch: int = 64):
+        r"""
+        为一批存档建立索引，索引被 clear 之后停止
+
+        progress(已完成数量, 总数) 每处理 batch 个存档调用一次
+        """
+        total = len(file_paths)
+        for done, file_path in enumerate(file_paths, 1):
+            if generation != self.generation:
+                return
+            self.add_file(file_path)
+            if progress is not None and (done % batch == 0 or done == total):
+                progress(done, total)
+
+    def _match_word(self, word: str, cjk: bool) -> set:
+        if cjk:
+            if len(word) == 1:
+                return self._postings.get(word, set())
+            # 相邻两字都出现即认为匹配
+            result = None
+            for i in range(len(word) - 1):
+                posting = self._postings.get(word[i : i + 2], set())
+                result = posting if result is None else result & posting
+                if not result:
+                    break
+            return result
+        # 英文数字按前缀匹配，用排序词表二分查找
+        if self._vocab is None:
+            self._vocab = sorted(self._postings)
+        result = set()
+        i = bisect_left(self._vocab, word)
+        while i < len(self._vocab) and self._vocab[i].startswith(word):
+            result |= self._postings[self._vocab[i]]
+            i += 1
+        return result
+
+    def search(self, query: str) -> set:
+        r"""
+        返回满足查询的存档路径集合
+        """
+        fields, terms = parse_query(query)
+        with self._lock:
+            candidates = None
+            for term in terms:
+                for word, cjk in _words(term):
+                    matched = self._match_word(word, cjk)
+                    candidates = (
+                        set(matched) if candidates is None else candidates & matched
+                    )
+                    if not candidates:
+                        return set()
+            if candidates is None:
+                candidates = self._fields.keys()
+            result = set()
+            for doc_id in candidates:
+                name, difficulty, round_, save_time = self._fields[doc_id]
+                for field, value in fields:
+                    if field == "name":
+                        ok = value in name
+                    elif field == "difficulty":
+                        ok = _in_range(difficulty, value)
+                    elif field == "round":
+                        ok = _in_range(round_, value)
+                    else:
+                        ok = save_time.startswith(value)
+                    if not ok:
+                        break
+                else:
+                    result.add(self._paths[doc_id])
+            return result
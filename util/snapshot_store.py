@@ -0,0 +1,338 @@
+# -*- coding: utf-8 -*-
+r"""
+去重快照存储
+
+命名存档不再完整复制一份，而是把存档的JSON树切成块，按内容哈希存储，
+相同的子树和块只保存一次。每个快照只是一个记录根哈希的清单，
+加载时再还原成完整的存档文件。
+
+对象格式（压缩前都是JSON数组）:
+    ["V", 值]                  小存档整体作为一个值
+    ["D", 块哈希, ...]         对象节点，由若干块组成
+    ["L", 块哈希, ...]         数组节点
+块中每一项为 [键, 0, 值] / [键, 1, 子节点哈希]（数组块中没有键）。
+
+保存快照时会复用已有的对象，垃圾回收只看清单中的引用；
+两者用同一把锁串行执行，回收不会删掉正在保存的快照刚复用、但清单还没有写入的对象。
+"""
+from datetime import datetime
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+
+import util.logger
+from util.fileio import atomic_write, atomic_write_json
+from util.fs import local_fs
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+log = util.logger.logger(__name__)
+
+SNAPSHOT_DIR = "snapshots"
+
+# 小于这个大小的子树直接内联在父节点中
+INLINE_SIZE = 4096
+# 子项不多的容器先整体序列化一次，足够小就不再逐项处理
+SMALL_CONTAINER = 64
+# 按内容切分块的最小和最大大小
+CHUNK_MIN = 1024
+CHUNK_MAX = 16384
+# 块边界由项的哈希决定，插入或删除一项只影响附近的块
+CHUNK_MASK = 0x7
+
+
+def _dumps(value) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+class SnapshotStore:
+    def __init__(self, root: str = SNAPSHOT_DIR, compression: str = "zlib"):
+        self.root = root
+        if compression == "zstd" and zstandard is None:
+            log.warning("未安装 zstandard，快照改用 zlib 压缩")
+            compression = "zlib"
+        self.compression = compression
+        self._lock = threading.RLock()
+
+    # 对象读写
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.root, "objects", digest[:2], digest[2:])
+
+    def _compress(self, data: bytes) -> bytes:
+        if self.compression == "zstd":
+            return b"s" + zstandard.ZstdCompressor().compress(data)
+        if self.compression == "zlib":
+            return b"z" + zlib.compress(data, 6)
+        return b"n" + data
+
+    @staticmethod
+    def _decompress(data: bytes) -> bytes:
+        codec, payload = data[:1], data[1:]
+        if codec == b"s":
+            if zstandard is None:
+                raise RuntimeError("快照使用了 zstd 压缩，请安装 zstandard")
+            return zstandard.ZstdDecompressor().decompress(payload)
+        if codec == b"z":
+            return zlib.decompress(payload)
+        return payload
+
+    def _put_object(self, text: str) -> str:
+        data = text.encode("utf8")
+        digest = hashlib.sha1(data).hexdigest()
+        path = self._object_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            atomic_write(path, self._compress(data))
+        return digest
+
+    def _get_object(self, digest: str):
+        with open(self._object_path(digest), "rb") as f:
+            return json.loads(self._decompress(f.read()))
+
+    # 编码与还原
+
+    def _encode(self, value):
+        r"""
+        返回 (0, JSON文本) 表示可以内联，或 (1, 哈希) 表示已存为独立节点
+        """
+        if not isinstance(value, (dict, list)):
+            return 0, _dumps(value)
+        if len(value) <= SMALL_CONTAINER:
+            text = _dumps(value)
+            if len(text) < INLINE_SIZE:
+                return 0, text
+        if isinstance(value, dict):
+            entries = [(key, self._encode(child)) for key, child in value.items()]
+            if all(kind == 0 for _, (kind, _) in entries):
+                size = sum(len(text) for _, (_, text) in entries)
+                if size < INLINE_SIZE:
+                    items = (f"{_dumps(key)}:{text}" for key, (_, text) in entries)
+                    return 0, "{" + ",".join(items) + "}"
+            items = [
+                f"[{_dumps(key)},{kind},{_dumps(payload) if kind else payload}]"
+                for key, (kind, payload) in entries
+            ]
+            return 1, self._put_node("D", items)
+        entries = [self._encode(child) for child in value]
+        if all(kind == 0 for kind, _ in entries):
+            size = sum(len(text) for _, text in entries)
+            if size < INLINE_SIZE:
+                return 0, "[" + ",".join(text for _, text in entries) + "]"
+        items = [
+            f"[{kind},{_dumps(payload) if kind else payload}]"
+            for kind, payload in entries
+        ]
+        return 1, self._put_node("L", items)
+
+    def _put_node(self, node_type: str, items) -> str:
+        # 按内容切分块，块边界只取决于项本身
+        chunks = []
+        current = []
+        size = 0
+        for item in items:
+            current.append(item)
+            size += len(item)
+            boundary = zlib.crc32(item.encode("utf8")) & CHUNK_MASK == 0
+            if size >= CHUNK_MAX or (size >= CHUNK_MIN and boundary):
+                chunks.append(self._put_object("[" + ",".join(current) + "]"))
+                current = []
+                size = 0
+        if current or not chunks:
+            chunks.append(self._put_object("[" + ",".join(current) + "]"))
+        return self._put_object(_dumps([node_type] + chunks))
+
+    def _decode(self, digest: str):
+        node = self._get_object(digest)
+        node_type = node[0]
+        if node_type == "V":
+            return node[1]
+        if node_type == "D":
+            result = {}
+            for chunk in node[1:]:
+                for key, kind, payload in self._get_object(chunk):
+                    result[key] = self._decode(payload) if kind else payload
+            return result
+        result = []
+        for chunk in node[1:]:
+            for kind, payload in self._get_object(chunk):
+                result.append(self._decode(payload) if kind else payload)
+        return result
+
+    # 快照
+
+    def _manifest_dir(self, profile: str) -> str:
+        return os.path.join(self.root, "manifests", profile)
+
+    def _manifest_path(self, profile: str, name: str) -> str:
+        return os.path.join(self._manifest_dir(profile), f"{name}.json")
+
+    @staticmethod
+    def check_name(name: str):
+        r"""
+        快照名用作清单的文件名，不能为空，不能包含路径分隔符或是 ".."，否则抛出 ValueError
+        """
+        if name in ("", ".", "..") or "/" in name or "\\" in name:
+            raise ValueError(f"快照名不能为空或包含路径: {name!r}")
+
+    def put(self, profile: str, name: str, save_path: str, fs=local_fs) -> dict:
+        r"""
+        把存档保存为快照，返回快照清单；fs 为存档所在的文件系统
+        """
+        self.check_name(name)
+        start = time.perf_counter()
+        with fs.open(save_path, "r", encoding="utf8") as f:
+            save_data = json.load(f)
+        with self._lock:
+            manifest = self._put(profile, name, save_path, save_data, fs)
+        log.info(f"保存快照 {name}，耗时 {time.perf_counter() - start:.3f}s")
+        return manifest
+
+    def _put(self, profile: str, name: str, save_path: str, save_data, fs) -> dict:
+        # 持有锁时执行，从写入对象到写入清单之间不能进行垃圾回收
+        kind, payload = self._encode(save_data)
+        root = payload if kind else self._put_object(f'["V",{payload}]')
+        manifest = {
+            "name": name,
+            "source": os.path.basename(save_path),
+            "created": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "size": fs.stat(save_path).st_size,
+            "root": root,
+            "header": {
+                key: save_data[key]
+                for key in ("name", "difficulty", "round", "saveTime")
+                if key in save_data
+            },
+        }
+        os.makedirs(self._manifest_dir(profile), exist_ok=True)
+        atomic_write_json(self._manifest_path(profile, name), manifest)
+        return manifest
+
+    def list(self, profile: str) -> list:
+        r"""
+        列出快照清单，按创建时间倒序
+        """
+        manifest_dir = self._manifest_dir(profile)
+        if not os.path.isdir(manifest_dir):
+            return []
+        manifests = []
+        for file in os.listdir(manifest_dir):
+            if not file.endswith(".json"):
+                continue
+            with open(os.path.join(manifest_dir, file), "r", encoding="utf8") as f:
+                manifests.append(json.load(f))
+        manifests.sort(key=lambda x: x["created"], reverse=True)
+        return manifests
+
+    def load(self, profile: str, name: str):
+        r"""
+        还原快照，返回存档数据
+        """
+        with open(self._manifest_path(profile, name), "r", encoding="utf8") as f:
+            manifest = json.load(f)
+        return self._decode(manifest["root"])
+
+    def materialize(
+        self,
+        profile: str,
+        name: str,
+        dest_path: str,
+        fsync: bool = False,
+        fs=local_fs,
+    ) -> float:
+        r"""
+        把快照还原为存档文件，返回耗时（秒）
+        """
+        start = time.perf_counter()
+        save_data = self.load(profile, name)
+        fs.write_json(dest_path, save_data, fsync)
+        elapsed = time.perf_counter() - start
+        log.info(f"还原快照 {name} 到 {dest_path}，耗时 {elapsed:.3f}s")
+        return elapsed
+
+    def delete(self, profile: str, name: str):
+        os.remove(self._manifest_path(profile, name))
+
+    def _reachable(self) -> set:
+        reachable = set()
+        manifests_root = os.path.join(self.root, "manifests")
+        if not os.path.isdir(manifests_root):
+            return reachable
+        pending = []
+        for profile in os.listdir(manifests_root):
+            pending.extend(m["root"] for m in self.list(profile))
+        while pending:
+            digest = pending.pop()
+            if digest in reachable:
+                continue
+            reachable.add(digest)
+            node = self._get_object(digest)
+            if node[0] == "V":
+                continue
+            for chunk in node[1:]:
+                reachable.add(chunk)
+                entries = self._get_object(chunk)
+                pending.extend(entry[-1] for entry in entries if entry[-2])
+        return reachable
+
+    def gc(self) -> int:
+        r"""
+        删除不再被任何快照引用的对象，返回删除的数量
+        """
+        with self._lock:
+            removed = self._gc()
+        log.info(f"快照垃圾回收: 删除 {removed} 个对象")
+        return removed
+
+    def _gc(self) -> int:
+        reachable = self._reachable()
+        removed = 0
+        objects_root = os.path.join(self.root, "objects")
+        if not os.path.isdir(objects_root):
+            return removed
+        for prefix in os.listdir(objects_root):
+            for rest in os.listdir(os.path.join(objects_root, prefix)):
+                if rest.startswith("."):
+                    # 正在写入的临时文件（见 util.fileio），由写入方改名或删除
+                    continue
+                if prefix + rest not in reachable:
+                    os.remove(os.path.join(objects_root, prefix, rest))
+                    removed += 1
+        return removed
+
+    def stats(self) -> dict:
+        r"""
+        统计快照原始大小与实际占用，dedup_ratio 为两者之比
+        """
+        logical = 0
+        snapshots = 0
+        manifests_root = os.path.join(self.root, "manifests")
+        if os.path.isdir(manifests_root):
+            for profile in os.listdir(manifests_root):
+                for manifest in self.list(profile):
+                    logical += manifest["size"]
+                    snapshots += 1
+        stored = 0
+        objects = 0
+        objects_root = os.path.join(self.root, "objects")
+        if os.path.isdir(objects_root):
+            for prefix in os.listdir(objects_root):
+                with os.scandir(os.path.join(objects_root, prefix)) as it:
+                    for entry in it:
+                        if entry.name.startswith("."):
+                            continue
+                        stored += entry.stat().st_size
+                        objects += 1
+        return {
+            "snapshots": snapshots,
+            "objects": objects,
+            "logical_bytes": logical,
+            "stored_bytes": stored,
+            "dedup_ratio": logical / stored if stored else 0.0,
+        }